@@ -1,4 +1,5 @@
 import os
+import multiprocessing
 from flask import Flask
 from dotenv import load_dotenv
 
@@ -7,11 +8,12 @@ load_dotenv()
 
 # Importar Blueprints existentes
 from routes.app_inicio import inicio_bp
-from routes.app_chatbot import chatbot_bp
+from routes.app_chatbot import chatbot_bp, calentar_en_segundo_plano, CALENTAR_AL_INICIAR
 from routes.app_informacion import informacion_bp
 from routes.app_acercade import acercade_bp
 from routes.app_privacidad import privacidad_bp
 from routes.app_admin import admin_bp
+from routes.app_metricas import metricas_bp
 
 app = Flask(__name__)
 
@@ -25,6 +27,12 @@ app.register_blueprint(informacion_bp)
 app.register_blueprint(acercade_bp)
 app.register_blueprint(privacidad_bp)
 app.register_blueprint(admin_bp) 
+app.register_blueprint(metricas_bp)
+
+# Cargar caché semántico y LLM sin bloquear el arranque (ver /ready). No en los
+# procesos auxiliares ('spawn', p. ej. los lectores de PDFs), que importan este módulo
+if CALENTAR_AL_INICIAR and multiprocessing.parent_process() is None:
+    calentar_en_segundo_plano()
 
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port=5010, debug=True)
\ No newline at end of file
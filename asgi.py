@@ -0,0 +1,217 @@
+"""
+Punto de entrada ASGI (modo async).
+
+POST /api/chat se atiende con la cadena RAG async (ainvoke/astream): mientras
+Groq responde, el proceso sigue atendiendo otras peticiones, así que un solo
+worker sostiene cientos de preguntas en curso. Los aciertos del caché siguen
+costando lo mismo que en app.py. Todas las demás rutas pasan a la aplicación
+Flask de siempre (WsgiToAsgi).
+
+Límites (ver logic/seleccion_modelo.py):
+    LLM_MAX_CONCURRENTES  llamadas al LLM en curso por proceso (por defecto 256)
+    LLM_TIMEOUT           segundos máximos por respuesta del LLM (por defecto 60)
+
+Uso:
+    uvicorn asgi:app --host 0.0.0.0 --port 5010 [--workers 2]
+"""
+import json
+import uuid
+import asyncio
+from contextlib import aclosing
+
+from asgiref.wsgi import WsgiToAsgi
+from werkzeug.http import dump_cookie, parse_cookie
+
+from app import app as app_flask
+from routes import app_chatbot
+from routes.app_chatbot import (
+    conversaciones, formatear_historial, _preparar_pregunta, _respuesta_html,
+    _registrar_respuesta, _evento_sse,
+)
+from logic.formato import FormateadorIncremental
+from logic.metricas import observar
+from logic.seleccion_modelo import MENSAJE_TIMEOUT_LLM
+
+app_wsgi = WsgiToAsgi(app_flask)
+
+# --- SESIÓN (cookie de Flask) ---
+
+class SesionFlask:
+    """
+    Lee y escribe la cookie de sesión firmada de Flask, para que el modo
+    async comparta la conversación (chat_id) con las rutas de Flask.
+    """
+
+    def __init__(self, app, cabeceras):
+        self.app = app
+        self.interfaz = app.session_interface
+        self.serializador = self.interfaz.get_signing_serializer(app)
+        self.nombre = self.interfaz.get_cookie_name(app)
+        self.datos = {}
+        self.modificada = False
+        valor = parse_cookie(cabeceras.get(b'cookie', b'').decode('latin-1')).get(self.nombre)
+        if valor and self.serializador is not None:
+            try:
+                self.datos = self.serializador.loads(
+                    valor, max_age=int(app.permanent_session_lifetime.total_seconds()))
+            except Exception:
+                self.datos = {}
+
+    def id_sesion(self):
+        """Igual que app_chatbot.obtener_id_sesion()."""
+        if 'chat_id' not in self.datos:
+            self.datos['chat_id'] = uuid.uuid4().hex
+            self.modificada = True
+        return self.datos['chat_id']
+
+    def cabeceras(self):
+        """Set-Cookie si la sesión cambió (lista de cabeceras ASGI)."""
+        if not self.modificada or self.serializador is None:
+            return []
+        cookie = dump_cookie(
+            self.nombre, self.serializador.dumps(dict(self.datos)),
+            domain=self.interfaz.get_cookie_domain(self.app),
+            path=self.interfaz.get_cookie_path(self.app),
+            secure=self.interfaz.get_cookie_secure(self.app),
+            httponly=self.interfaz.get_cookie_httponly(self.app),
+            samesite=self.interfaz.get_cookie_samesite(self.app),
+        )
+        return [(b'set-cookie', cookie.encode('latin-1'))]
+
+# --- RESPUESTAS ASGI ---
+
+async def _leer_cuerpo(receive):
+    cuerpo = b''
+    while True:
+        mensaje = await receive()
+        cuerpo += mensaje.get('body', b'')
+        if not mensaje.get('more_body'):
+            return cuerpo
+
+async def _esperar_desconexion(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+async def _enviar_json(send, datos, estado=200, cabeceras=()):
+    cuerpo = json.dumps(datos).encode('utf-8')
+    await send({'type': 'http.response.start', 'status': estado,
+                'headers': [(b'content-type', b'application/json'),
+                            (b'content-length', str(len(cuerpo)).encode())] + list(cabeceras)})
+    await send({'type': 'http.response.body', 'body': cuerpo})
+
+# --- /api/chat (async) ---
+
+async def _generar_eventos(selector, id_sesion, estado, modo, pregunta_usuario, contexto_str, forzar_llm):
+    """Mismos eventos SSE que app_chatbot._responder_stream."""
+    fragmentos, fuente = await selector.aresponder_stream(pregunta_usuario, contexto_str, forzar_llm=forzar_llm)
+    yield _evento_sse({"model": fuente}, evento="meta")
+    if "KNN" in fuente:
+        # Acierto del caché: ya es HTML, llega completo en un solo fragmento
+        respuesta_html = "".join([f async for f in fragmentos])
+        yield _evento_sse({"delta": respuesta_html})
+        await asyncio.to_thread(_registrar_respuesta, id_sesion, estado, modo, pregunta_usuario,
+                                respuesta_html, respuesta_html, fuente)
+        yield _evento_sse({"reply": respuesta_html, "model": fuente}, evento="done")
+        return
+
+    formateador = FormateadorIncremental()
+    try:
+        async with aclosing(fragmentos):
+            async for fragmento in fragmentos:
+                html = formateador.agregar(fragmento)
+                if html:
+                    yield _evento_sse({"delta": html})
+        html = formateador.terminar()
+        if html:
+            yield _evento_sse({"delta": html})
+    except asyncio.TimeoutError:
+        yield _evento_sse({"error": MENSAJE_TIMEOUT_LLM}, evento="error")
+        return
+    except Exception as e:
+        print(f"Error RAG (stream): {e}")
+        yield _evento_sse({"error": "Error al generar respuesta con IA."}, evento="error")
+        return
+
+    observar('goit_etapa_segundos', formateador.segundos, etapa='html')
+    respuesta_html = formateador.html
+    await asyncio.to_thread(_registrar_respuesta, id_sesion, estado, modo, pregunta_usuario,
+                            formateador.texto_completo, respuesta_html, fuente)
+    yield _evento_sse({"reply": respuesta_html, "model": fuente}, evento="done")
+
+async def api_chat(scope, receive, send):
+    """Versión async de app_chatbot.api_chat (misma petición, misma respuesta)."""
+    sesion = SesionFlask(app_flask, dict(scope['headers']))
+    try:
+        data = json.loads(await _leer_cuerpo(receive) or b'null')
+    except ValueError:
+        data = None
+    if not isinstance(data, dict):
+        await _enviar_json(send, {"error": "JSON inválido"}, 400)
+        return
+
+    selector = app_chatbot.selector
+    id_sesion = sesion.id_sesion()
+    estado = await asyncio.to_thread(conversaciones.obtener, id_sesion)
+
+    # 1. Gestión de la pregunta
+    modo, pregunta_usuario, forzar_llm, error = _preparar_pregunta(data, estado)
+    if error:
+        await _enviar_json(send, {"error": error}, 400, sesion.cabeceras())
+        return
+
+    # 2. Generar respuesta
+    contexto_str = formatear_historial(estado["historial"])
+
+    if data.get('stream'):
+        await send({'type': 'http.response.start', 'status': 200,
+                    'headers': [(b'content-type', b'text/event-stream; charset=utf-8'),
+                                (b'cache-control', b'no-cache'),
+                                (b'x-accel-buffering', b'no')] + sesion.cabeceras()})
+        # Si el usuario cierra la conexión se deja de generar (y se libera el lugar del LLM):
+        # cada evento compite con el vigía, así que no se espera al siguiente token para enterarse
+        vigia = asyncio.ensure_future(_esperar_desconexion(receive))
+        try:
+            eventos = _generar_eventos(selector, id_sesion, estado, modo, pregunta_usuario,
+                                       contexto_str, forzar_llm)
+            async with aclosing(eventos):
+                while True:
+                    siguiente = asyncio.ensure_future(anext(eventos))
+                    await asyncio.wait({siguiente, vigia}, return_when=asyncio.FIRST_COMPLETED)
+                    if vigia.done():
+                        siguiente.cancel()
+                        await asyncio.wait({siguiente})
+                        return
+                    try:
+                        evento = siguiente.result()
+                    except StopAsyncIteration:
+                        break
+                    await send({'type': 'http.response.body', 'body': evento.encode('utf-8'),
+                                'more_body': True})
+            await send({'type': 'http.response.body', 'body': b''})
+        finally:
+            vigia.cancel()
+        return
+
+    respuesta_raw, fuente = await selector.aresponder(pregunta_usuario, contexto_str, forzar_llm=forzar_llm)
+    respuesta_html = _respuesta_html(respuesta_raw, fuente)
+    await asyncio.to_thread(_registrar_respuesta, id_sesion, estado, modo, pregunta_usuario,
+                            respuesta_raw, respuesta_html, fuente)
+    await _enviar_json(send, {"reply": respuesta_html, "model": fuente}, cabeceras=sesion.cabeceras())
+
+# --- APLICACIÓN ---
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        while True:
+            mensaje = await receive()
+            if mensaje['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif mensaje['type'] == 'lifespan.shutdown':
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    if (scope['type'] == 'http' and scope['method'] == 'POST' and scope['path'] == '/api/chat'
+            and app_chatbot.selector is not None):
+        await api_chat(scope, receive, send)
+        return
+    await app_wsgi(scope, receive, send)
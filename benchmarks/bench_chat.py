@@ -0,0 +1,465 @@
+"""
+Benchmark de carga y latencia del chat (caché semántico + RAG).
+
+Mide respuestas completas sin servicios externos: Groq se sustituye por un
+LLM local y Ollama por EmbeddingsFalsos, ambos con latencia configurable.
+La FAQ, la base vectorial y los cachés viven en un directorio temporal,
+así que los datos de data/ no se tocan.
+
+Modos:
+  directo  SelectorDeModelo.responder() desde varios hilos
+  flask    POST /api/chat con el cliente de pruebas de Flask (uno por hilo)
+  wsgi     POST /api/chat por HTTP contra un servidor WSGI real (werkzeug, con hilos)
+  asgi     POST /api/chat por HTTP contra asgi.py en uvicorn (LLM async, un solo proceso)
+
+Para cada modo, tamaño de FAQ y nivel de concurrencia reporta p50/p95/p99,
+throughput (respuestas/s) y la tasa de aciertos del caché semántico.
+Sirve para comparar antes y después de cada cambio de escalabilidad
+(--salida guarda los resultados en JSON).
+
+Uso:
+    python benchmarks/bench_chat.py [--modos directo,flask,wsgi,asgi] [--tamanos 300,10000,100000]
+        [--concurrencias 1,8,32] [--consultas 400] [--aciertos 0.8]
+        [--latencia-llm 0.8] [--latencia-token 0.0] [--latencia-embed 0.02]
+        [--backend knn|denso] [--salida resultados.json]
+"""
+import os
+import sys
+import csv
+import json
+import time
+import random
+import socket
+import asyncio
+import logging
+import shutil
+import tempfile
+import argparse
+import itertools
+import threading
+import http.client
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+# Antes de importar la aplicación: sin clave real de Groq ni servidor de Ollama,
+# y sin calentar el selector de la app (el benchmark usa el suyo)
+os.environ.setdefault("GROQ_API_KEY", "benchmark")
+os.environ.setdefault("EMBEDDINGS_BACKEND", "falso")
+os.environ.setdefault("CALENTAR_AL_INICIAR", "0")
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_community.vectorstores import Chroma
+
+from models import modelo_llm
+from models.modelo_knn import IndiceKNNIncremental
+from models.modelo_embeddings import EmbeddingsFalsos, EmbeddingsEnCache
+from data.almacen_faq import AlmacenFAQ
+from logic.seleccion_modelo import SelectorDeModelo
+from logic.metricas import metricas
+
+# --- Servicios simulados ---
+
+RESPUESTA_LLM = (
+    "Para realizar el trámite necesitas: - Generar tu orden de pago en el portal.\n"
+    "- Entregar tus documentos en la **Secretaría de la Facultad**.\n"
+    "### Fechas importantes\n"
+    "El periodo se publica en el calendario escolar. Revisa tu correo institucional. "
+    "Si tienes dudas acude a la coordinación de tu programa educativo.\n"
+)
+
+class LLMFalso(BaseChatModel):
+    """
+    Sustituto local de ChatGroq: espera `latencia` segundos (tiempo al primer
+    token) y `latencia_token` por cada token, y responde siempre `respuesta`.
+    """
+
+    respuesta: str = RESPUESTA_LLM
+    latencia: float = 0.8
+    latencia_token: float = 0.0
+
+    @property
+    def _llm_type(self):
+        return "llm-falso"
+
+    def _tokens(self):
+        return self.respuesta.split(' ')
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(self.latencia + self.latencia_token * len(self._tokens()))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self.respuesta))])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(self.latencia)
+        tokens = self._tokens()
+        for i, token in enumerate(tokens):
+            if self.latencia_token:
+                time.sleep(self.latencia_token)
+            texto = token if i == len(tokens) - 1 else token + ' '
+            yield ChatGenerationChunk(message=AIMessageChunk(content=texto))
+
+    # Versiones async (asgi.py): esperan sin ocupar un hilo, como el cliente HTTP de Groq
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        await asyncio.sleep(self.latencia + self.latencia_token * len(self._tokens()))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self.respuesta))])
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        await asyncio.sleep(self.latencia)
+        tokens = self._tokens()
+        for i, token in enumerate(tokens):
+            if self.latencia_token:
+                await asyncio.sleep(self.latencia_token)
+            texto = token if i == len(tokens) - 1 else token + ' '
+            yield ChatGenerationChunk(message=AIMessageChunk(content=texto))
+
+# --- Datos sintéticos ---
+
+TEMAS = [
+    'inscripción', 'reinscripción', 'baja temporal', 'baja definitiva', 'servicio social',
+    'titulación', 'beca', 'horario', 'credencial', 'kárdex', 'examen extraordinario',
+    'examen de última oportunidad', 'movilidad estudiantil', 'prácticas profesionales',
+    'constancia de estudios', 'cambio de programa', 'pago de arancel', 'tutoría',
+    'certificado', 'equivalencia de experiencias educativas',
+]
+# Todas usan los cuatro campos: 8 x 20 x 15 x 5 x 16 = 192 000 preguntas distintas
+PLANTILLAS = [
+    '¿Cómo solicito {tema} en {programa} del campus {campus} para {anio}?',
+    '¿Cuándo es el periodo de {tema} para {programa} en {campus} en {anio}?',
+    '¿Qué requisitos pide {tema} en {programa} del campus {campus} en {anio}?',
+    '¿Dónde tramito {tema} de {programa} en {campus} durante {anio}?',
+    '¿Cuánto cuesta {tema} en {programa} de {campus} para {anio}?',
+    '¿Quién autoriza {tema} en la facultad de {programa} en {campus} en {anio}?',
+    '¿Puedo hacer {tema} en línea si estudio {programa} en {campus} en {anio}?',
+    '¿Qué documentos necesito para {tema} de {programa} en {campus} en {anio}?',
+]
+PROGRAMAS = [
+    'Ingeniería de Software', 'Redes y Servicios de Cómputo', 'Estadística', 'Tecnologías Computacionales',
+    'Ciencias y Técnicas Estadísticas', 'Administración', 'Contaduría', 'Derecho', 'Medicina',
+    'Enfermería', 'Psicología', 'Arquitectura', 'Ingeniería Civil', 'Biología', 'Química Clínica',
+]
+CAMPUS = ['Xalapa', 'Veracruz', 'Orizaba', 'Poza Rica', 'Coatzacoalcos']
+ANIOS = [str(a) for a in range(2015, 2031)]
+
+def leer_faq_real(ruta):
+    if not os.path.exists(ruta):
+        return []
+    with open(ruta, newline='', encoding='utf-8') as f:
+        return [(r['Pregunta'], r['Respuesta']) for r in csv.DictReader(f)
+                if r.get('Pregunta') and r.get('Respuesta')]
+
+def generar_faq(tamano, faq_real, semilla=0):
+    """FAQ de `tamano` preguntas: primero las reales y después sintéticas (deterministas)."""
+    faq = faq_real[:tamano]
+    combinaciones = list(itertools.product(range(len(PLANTILLAS)), TEMAS, PROGRAMAS, CAMPUS, ANIOS))
+    random.Random(semilla).shuffle(combinaciones)
+    vistas = {p for p, _ in faq}
+    for plantilla, tema, programa, campus, anio in combinaciones:
+        if len(faq) >= tamano:
+            break
+        pregunta = PLANTILLAS[plantilla].format(tema=tema, programa=programa, campus=campus, anio=anio)
+        if pregunta in vistas:
+            continue
+        vistas.add(pregunta)
+        faq.append((pregunta, f"Respuesta sobre {tema} en {programa} ({campus}, {anio})."))
+    return faq
+
+def variante(pregunta, rng):
+    """La misma pregunta escrita como la teclearía otro usuario (sin signos, en minúsculas o en mayúsculas)."""
+    texto = pregunta.strip('¿?¡! ')
+    return rng.choice([texto.lower(), texto.upper() + '!!', f"¿{texto}?", texto + '??'])
+
+def palabra_inventada(rng):
+    return ''.join(rng.choice('bcdfghjklmnpqrstvxz') + rng.choice('aeiou') for _ in range(rng.randint(2, 4)))
+
+def generar_consultas(faq, cantidad, proporcion_aciertos, semilla=1):
+    """
+    Consultas en orden aleatorio: una fracción exacta repite preguntas de la FAQ
+    (deben ser aciertos del caché) y el resto son preguntas nuevas con
+    palabras inventadas (van al LLM).
+    """
+    rng = random.Random(semilla)
+    repetidas = round(cantidad * proporcion_aciertos)
+    consultas = [variante(rng.choice(faq)[0], rng) for _ in range(repetidas)]
+    consultas += ['¿' + ' '.join(palabra_inventada(rng) for _ in range(4)) + '?'
+                  for _ in range(cantidad - repetidas)]
+    rng.shuffle(consultas)
+    return consultas
+
+def generar_documentos(cantidad, semilla=2):
+    """Fragmentos para la base vectorial temporal (el RAG siempre recupera 5)."""
+    rng = random.Random(semilla)
+    return [
+        f"Reglamento de {rng.choice(TEMAS)} para {rng.choice(PROGRAMAS)}, campus {rng.choice(CAMPUS)}. "
+        + RESPUESTA_LLM.replace('\n', ' ')
+        for _ in range(cantidad)
+    ]
+
+# --- Entorno del benchmark ---
+
+class Entorno:
+    """
+    Selector con la FAQ sintética, el LLM falso y una base Chroma temporal.
+    Con `app` también se prepara la aplicación Flask para usar ese selector.
+    """
+
+    def __init__(self, directorio, faq, args, app=None):
+        self.directorio = directorio
+        embeddings = EmbeddingsEnCache(
+            EmbeddingsFalsos(dimension=args.dimension, latencia=args.latencia_embed, por_palabras=True),
+            'falso:bench', ruta_db=os.path.join(directorio, 'embeddings.sqlite3'),
+        )
+        ruta_chroma = os.path.join(directorio, 'chroma')
+        if not os.path.exists(ruta_chroma):
+            Chroma.from_texts(generar_documentos(args.documentos), embedding=embeddings,
+                              persist_directory=ruta_chroma)
+
+        llm = LLMFalso(latencia=args.latencia_llm, latencia_token=args.latencia_token)
+        # Los módulos de la aplicación toman estas dependencias al construir la cadena
+        modelo_llm.CHROMA_PATH = ruta_chroma
+        modelo_llm.ChatGroq = lambda **kwargs: llm
+        modelo_llm.obtener_embeddings = lambda modelo=None: embeddings
+        modelo_llm.cache_recuperacion.limpiar()
+
+        if args.backend == 'denso':
+            from models.cache_denso import IndiceDensoIncremental
+            indice = IndiceDensoIncremental(embeddings)
+        else:
+            indice = IndiceKNNIncremental()
+        inicio = time.perf_counter()
+        indice.cargar([p for p, _ in faq], [r for _, r in faq])
+        self.segundos_carga = time.perf_counter() - inicio
+        if hasattr(indice, 'iniciar_compactacion'):
+            indice.iniciar_compactacion()
+
+        self.selector = SelectorDeModelo(usar_knn=True, usar_llm=True, backend_cache=indice)
+
+        if app is not None:
+            from routes import app_chatbot
+            app_chatbot.selector = self.selector
+            # Las respuestas del LLM se guardan en una FAQ temporal
+            app_chatbot.almacen_faq = AlmacenFAQ(ruta_db=os.path.join(directorio, 'faq.sqlite3'),
+                                                 ruta_csv_inicial=None)
+
+# --- Clientes ---
+
+class ClienteDirecto:
+    def __init__(self, entorno):
+        self.selector = entorno.selector
+
+    def preguntar(self, pregunta):
+        _, fuente = self.selector.responder(pregunta, "")
+        return fuente
+
+class ClienteFlask:
+    """Cliente de pruebas de Flask; cada hilo tiene el suyo (y su propia sesión)."""
+
+    def __init__(self, app):
+        self.app = app
+        self._local = threading.local()
+
+    def preguntar(self, pregunta):
+        cliente = getattr(self._local, 'cliente', None)
+        if cliente is None:
+            cliente = self._local.cliente = self.app.test_client()
+        respuesta = cliente.post('/api/chat', json={"message": pregunta})
+        if respuesta.status_code != 200:
+            raise RuntimeError(f"HTTP {respuesta.status_code}")
+        return respuesta.get_json()["model"]
+
+class ClienteHTTP:
+    """Peticiones HTTP reales; cada hilo conserva su cookie de sesión."""
+
+    def __init__(self, host, puerto):
+        self.host = host
+        self.puerto = puerto
+        self._local = threading.local()
+
+    def preguntar(self, pregunta):
+        conexion = http.client.HTTPConnection(self.host, self.puerto, timeout=120)
+        cabeceras = {"Content-Type": "application/json"}
+        cookie = getattr(self._local, 'cookie', None)
+        if cookie:
+            cabeceras["Cookie"] = cookie
+        try:
+            conexion.request('POST', '/api/chat', body=json.dumps({"message": pregunta}), headers=cabeceras)
+            respuesta = conexion.getresponse()
+            cuerpo = respuesta.read()
+            if respuesta.status != 200:
+                raise RuntimeError(f"HTTP {respuesta.status}")
+            nueva_cookie = respuesta.getheader('Set-Cookie')
+            if nueva_cookie:
+                self._local.cookie = nueva_cookie.split(';', 1)[0]
+            return json.loads(cuerpo)["model"]
+        finally:
+            conexion.close()
+
+class ServidorWSGI:
+    """Servidor de werkzeug con un hilo por petición, en un puerto libre."""
+
+    def __init__(self, app):
+        from werkzeug.serving import make_server
+        # Sin una línea de log por petición
+        logging.getLogger('werkzeug').setLevel(logging.ERROR)
+        self.servidor = make_server('127.0.0.1', 0, app, threaded=True)
+        self.puerto = self.servidor.server_port
+        self.hilo = threading.Thread(target=self.servidor.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.hilo.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.servidor.shutdown()
+
+class ServidorASGI:
+    """asgi.py en uvicorn (un proceso, un event loop), en un puerto libre."""
+
+    def __init__(self):
+        import uvicorn
+        from asgi import app as app_asgi
+        with socket.socket() as s:
+            s.bind(('127.0.0.1', 0))
+            self.puerto = s.getsockname()[1]
+        self.servidor = uvicorn.Server(uvicorn.Config(
+            app_asgi, host='127.0.0.1', port=self.puerto, log_level='warning',
+            access_log=False, lifespan='off', backlog=4096))
+        self.hilo = threading.Thread(target=self.servidor.run, daemon=True)
+
+    def __enter__(self):
+        self.hilo.start()
+        while not self.servidor.started:
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc):
+        self.servidor.should_exit = True
+        self.hilo.join()
+
+# --- Medición ---
+
+def ejecutar(cliente, consultas, concurrencia):
+    """Lanza las consultas con `concurrencia` hilos. Retorna (latencias, fuentes, errores, segundos)."""
+    latencias = [None] * len(consultas)
+    fuentes = [None] * len(consultas)
+
+    def una(i):
+        inicio = time.perf_counter()
+        try:
+            fuentes[i] = cliente.preguntar(consultas[i])
+        except Exception as e:
+            fuentes[i] = f"error: {e}"
+        latencias[i] = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrencia) as pool:
+        list(pool.map(una, range(len(consultas))))
+    total = time.perf_counter() - inicio
+    errores = sum(1 for f in fuentes if f.startswith('error'))
+    return np.array(latencias), fuentes, errores, total
+
+def resumir(modo, tamano, concurrencia, latencias, fuentes, errores, segundos):
+    p50, p95, p99 = np.percentile(latencias, [50, 95, 99]) * 1000
+    aciertos = sum(1 for f in fuentes if f.startswith('KNN'))
+    etapa_knn = next((h for h in metricas.a_dict()["histogramas"]
+                      if h["nombre"] == 'goit_etapa_segundos' and h["etiquetas"].get("etapa") == 'knn'), None)
+    return {
+        "modo": modo,
+        "tamano_faq": tamano,
+        "concurrencia": concurrencia,
+        "consultas": len(latencias),
+        "errores": errores,
+        "p50_ms": round(p50, 2),
+        "p95_ms": round(p95, 2),
+        "p99_ms": round(p99, 2),
+        "respuestas_por_segundo": round(len(latencias) / segundos, 2),
+        "tasa_aciertos": round(aciertos / len(fuentes), 4),
+        "knn_p50_ms": round(etapa_knn["p50"] * 1000, 3) if etapa_knn else None,
+    }
+
+def imprimir_encabezado():
+    print(f"{'modo':<8} {'faq':>7} {'conc':>5} {'n':>6} {'err':>4} {'p50 ms':>9} {'p95 ms':>9} "
+          f"{'p99 ms':>9} {'resp/s':>8} {'aciertos':>9} {'knn p50':>9}")
+
+def imprimir_fila(r):
+    knn = f"{r['knn_p50_ms']:9.3f}" if r['knn_p50_ms'] is not None else f"{'-':>9}"
+    print(f"{r['modo']:<8} {r['tamano_faq']:>7} {r['concurrencia']:>5} {r['consultas']:>6} {r['errores']:>4} "
+          f"{r['p50_ms']:9.2f} {r['p95_ms']:9.2f} {r['p99_ms']:9.2f} {r['respuestas_por_segundo']:8.2f} "
+          f"{r['tasa_aciertos']:9.1%} {knn}")
+
+def lista_enteros(texto):
+    return [int(x) for x in texto.split(',') if x.strip()]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--modos', default='directo,flask,wsgi')
+    parser.add_argument('--tamanos', type=lista_enteros, default=[300, 10000, 100000])
+    parser.add_argument('--concurrencias', type=lista_enteros, default=[1, 8, 32])
+    parser.add_argument('--consultas', type=int, default=400, help='consultas medidas por combinación')
+    parser.add_argument('--calentamiento', type=int, default=20, help='consultas previas que no se miden')
+    parser.add_argument('--aciertos', type=float, default=0.8, help='fracción de consultas repetidas de la FAQ')
+    parser.add_argument('--latencia-llm', type=float, default=0.8, help='segundos hasta el primer token')
+    parser.add_argument('--latencia-token', type=float, default=0.0, help='segundos por token generado')
+    parser.add_argument('--latencia-embed', type=float, default=0.02, help='segundos por llamada a embeddings')
+    parser.add_argument('--dimension', type=int, default=768, help='dimensión de los embeddings falsos')
+    parser.add_argument('--documentos', type=int, default=200, help='fragmentos en la base vectorial')
+    parser.add_argument('--backend', choices=['knn', 'denso'], default='knn', help='caché semántico')
+    parser.add_argument('--faq', default=os.path.join(project_root, 'data', 'faq.csv'),
+                        help='preguntas reales con las que empieza la FAQ sintética')
+    parser.add_argument('--salida', help='archivo JSON con los resultados')
+    args = parser.parse_args()
+
+    modos = [m.strip() for m in args.modos.split(',') if m.strip()]
+    desconocidos = set(modos) - {'directo', 'flask', 'wsgi', 'asgi'}
+    if desconocidos:
+        parser.error(f"modos desconocidos: {', '.join(sorted(desconocidos))}")
+
+    app = None
+    if {'flask', 'wsgi', 'asgi'} & set(modos):
+        from app import app
+
+    faq_real = leer_faq_real(args.faq)
+    directorio = tempfile.mkdtemp(prefix='bench_chat_')
+    resultados = []
+    try:
+        for tamano in args.tamanos:
+            faq = generar_faq(tamano, faq_real)
+            entorno = Entorno(directorio, faq, args, app)
+            print(f"\nFAQ de {len(faq)} preguntas (índice {args.backend} cargado en {entorno.segundos_carga:.2f} s)")
+            imprimir_encabezado()
+            for modo in modos:
+                for concurrencia in args.concurrencias:
+                    # Consultas distintas por combinación: las preguntas nuevas no se repiten
+                    semilla = tamano * 1000 + modos.index(modo) * 100 + concurrencia
+                    calentamiento = generar_consultas(faq, args.calentamiento, args.aciertos, semilla + 1)
+                    consultas = generar_consultas(faq, args.consultas, args.aciertos, semilla)
+
+                    if modo in ('wsgi', 'asgi'):
+                        with (ServidorWSGI(app) if modo == 'wsgi' else ServidorASGI()) as servidor:
+                            cliente = ClienteHTTP('127.0.0.1', servidor.puerto)
+                            ejecutar(cliente, calentamiento, concurrencia)
+                            metricas.limpiar()
+                            medicion = ejecutar(cliente, consultas, concurrencia)
+                    else:
+                        cliente = ClienteFlask(app) if modo == 'flask' else ClienteDirecto(entorno)
+                        ejecutar(cliente, calentamiento, concurrencia)
+                        metricas.limpiar()
+                        medicion = ejecutar(cliente, consultas, concurrencia)
+
+                    resultado = resumir(modo, len(faq), concurrencia, *medicion)
+                    resultados.append(resultado)
+                    imprimir_fila(resultado)
+    finally:
+        shutil.rmtree(directorio, ignore_errors=True)
+
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as f:
+            json.dump({"parametros": vars(args), "resultados": resultados}, f, ensure_ascii=False, indent=2)
+        print(f"\nResultados guardados en {args.salida}")
+
+if __name__ == '__main__':
+    main()
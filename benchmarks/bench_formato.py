@@ -0,0 +1,132 @@
+"""
+Benchmark del formateador de respuestas (logic/formato.py).
+
+Compara la versión anterior de formatear_texto_html (seis regex sobre el
+texto completo, compiladas en cada llamada) contra la nueva (patrones
+precompilados, una pasada por renglón):
+
+  1. Costo por respuesta, de una sola vez: la respuesta completa del LLM.
+  2. Costo por respuesta en streaming: la versión anterior formateaba cada
+     bloque de renglones y al final volvía a formatear el texto completo; la
+     nueva convierte cada tramo de unas palabras una sola vez, sin esperar
+     el salto de línea.
+  3. Acierto del caché: antes se volvía a formatear la respuesta guardada;
+     ahora se sirve el HTML de la FAQ tal cual (costo cero).
+  4. Equivalencia: cuántas respuestas dan el mismo HTML en ambas versiones
+     (ignorando espacios y saltos de línea, que el chat no muestra).
+
+Las respuestas de data/faq.csv están guardadas en HTML; el benchmark las
+convierte de vuelta al Markdown que las generó (viñetas "- ", **negritas**).
+
+Uso:
+    python benchmarks/bench_formato.py [--faq data/faq.csv] [--repeticiones 20]
+"""
+import os
+import re
+import sys
+import csv
+import time
+import argparse
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from logic.formato import formatear_texto_html, FormateadorIncremental
+
+# --- Formateador anterior (referencia) ---
+
+def formatear_anterior(texto):
+    if not texto: return ""
+    texto = texto.strip()
+    texto = re.sub(r'\*\*(.*?)\*\*', r'<strong>\1</strong>', texto)
+    texto = re.sub(r'###\s*(.*?)(?:\n|$)', r'<br><span class="chat-title">\1</span><br>', texto)
+    texto = re.sub(r':\s*([\-\*•])', r':\n\1', texto)
+    texto = re.sub(r'(?m)^\s*[\-\*•]\s+(.*)', r'<br>• \1', texto)
+    texto = re.sub(r'(?m)^\s*(\d+)\.\s+(.*)', r'<br>\1. \2', texto)
+    texto = re.sub(r'(?<!\d)(?<!•)\.\s+(?=[A-Z¿¡])', '.<br><br>', texto)
+    return texto.strip()
+
+def stream_anterior(tokens):
+    """FormateadorIncremental anterior + el formateo final del texto completo."""
+    completo = pendiente = ""
+    for token in tokens:
+        completo += token
+        pendiente += token
+        corte = pendiente.rfind('\n')
+        if corte != -1:
+            bloque, pendiente = pendiente[:corte + 1], pendiente[corte + 1:]
+            "\n".join(formatear_anterior(linea) for linea in bloque.splitlines())
+    "\n".join(formatear_anterior(linea) for linea in pendiente.splitlines())
+    return formatear_anterior(completo)
+
+def stream_nuevo(tokens):
+    formateador = FormateadorIncremental()
+    for token in tokens:
+        formateador.agregar(token)
+    formateador.terminar()
+    return formateador.html
+
+# --- Respuestas de prueba ---
+
+def a_markdown(respuesta_html):
+    """Reconstruye el Markdown del LLM a partir del HTML guardado en la FAQ."""
+    texto = re.sub(r'</?strong>', '**', respuesta_html)
+    texto = re.sub(r'<span class="chat-title">(.*?)</span>', r'### \1', texto)
+    texto = texto.replace('<br>• ', '\n- ').replace('<br>', '\n')
+    return texto
+
+def tokenizar(texto):
+    """Fragmentos como los que entrega el LLM en streaming (palabras y espacios)."""
+    return re.findall(r'\S+|\s+', texto)
+
+def cargar_respuestas(ruta):
+    with open(ruta, newline='', encoding='utf-8') as f:
+        respuestas = [r['Respuesta'] for r in csv.DictReader(f) if r.get('Respuesta')]
+    return list(dict.fromkeys(respuestas))
+
+# --- Mediciones ---
+
+def medir_costo(funcion, entradas, repeticiones):
+    mejor = float('inf')
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        for entrada in entradas:
+            funcion(entrada)
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return mejor / len(entradas) * 1e6
+
+def sin_espacios(texto):
+    return re.sub(r'\s+', ' ', texto).strip()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--faq', default=os.path.join(project_root, 'data', 'faq.csv'))
+    parser.add_argument('--repeticiones', type=int, default=20)
+    args = parser.parse_args()
+
+    guardadas = cargar_respuestas(args.faq)
+    textos = [a_markdown(r) for r in guardadas]
+    flujos = [tokenizar(t) for t in textos]
+    print(f"FAQ: {len(textos)} respuestas, {sum(map(len, textos)) // len(textos)} caracteres "
+          f"y {sum(map(len, flujos)) // len(flujos)} fragmentos en promedio\n")
+
+    print("Costo por respuesta (µs, mejor de %d repeticiones)" % args.repeticiones)
+    costos = [
+        ("completa, anterior", medir_costo(formatear_anterior, textos, args.repeticiones)),
+        ("completa, nueva", medir_costo(formatear_texto_html, textos, args.repeticiones)),
+        ("streaming, anterior", medir_costo(stream_anterior, flujos, args.repeticiones)),
+        ("streaming, nueva", medir_costo(stream_nuevo, flujos, args.repeticiones)),
+        ("acierto, anterior", medir_costo(formatear_anterior, guardadas, args.repeticiones)),
+    ]
+    for nombre, costo in costos:
+        print(f"  {nombre:<22} {costo:8.2f}")
+    print(f"  {'acierto, nueva':<22} {0.0:8.2f}  (HTML guardado en la FAQ)")
+
+    iguales = sum(sin_espacios(formatear_anterior(t)) == sin_espacios(formatear_texto_html(t)) for t in textos)
+    incrementales = sum(stream_nuevo(f) == formatear_texto_html(t) for t, f in zip(textos, flujos))
+    print(f"\nMismo HTML que la versión anterior: {iguales}/{len(textos)}")
+    print(f"Streaming idéntico a la respuesta completa: {incrementales}/{len(textos)}")
+
+if __name__ == '__main__':
+    main()
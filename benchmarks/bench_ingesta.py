@@ -0,0 +1,294 @@
+"""
+Benchmark de la ingesta (data/admin_db.actualizar_base_datos_completa).
+
+Genera un corpus sintético (PDFs escritos a mano y páginas HTML servidas por
+un servidor HTTP local) y lo ingiere completo: carga -> división ->
+embedding -> escritura en Chroma. El embedder es EmbeddingsFalsos (latencia
+configurable), así que no se necesita Ollama. Todo vive en un directorio
+temporal; data/ no se toca.
+
+Cada combinación (número de fuentes x fragmentación) corre en un proceso
+nuevo para que el pico de memoria sea solo suyo. Reporta el tiempo de cada
+etapa, fragmentos/s, el pico de RSS del proceso y el de los procesos que
+leen los PDFs y, con --repetir, el costo de una segunda ingesta sin cambios.
+
+Uso:
+    python benchmarks/bench_ingesta.py [--fuentes 10,50,200] [--fraccion-pdf 0.5]
+        [--paginas-pdf 8] [--parrafos-web 30] [--fragmentaciones 1000:200,500:100,2000:400]
+        [--latencia-embed 0.0] [--hilos-embedding 4] [--repetir] [--salida resultados.json]
+"""
+import os
+import sys
+import json
+import time
+import random
+import warnings
+import contextlib
+import shutil
+import resource
+import tempfile
+import argparse
+import textwrap
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+# Las páginas sintéticas se piden a 127.0.0.1: nunca a través de un proxy
+os.environ["NO_PROXY"] = ",".join(filter(None, [os.environ.get("NO_PROXY"), "127.0.0.1", "localhost"]))
+os.environ.setdefault("USER_AGENT", "bench-ingesta")
+
+# --- Texto sintético ---
+
+PALABRAS = (
+    "estudiante programa educativo inscripción periodo escolar experiencia educativa crédito "
+    "facultad reglamento artículo trámite solicitud constancia baja temporal definitiva titulación "
+    "servicio social práctica profesional beca académico coordinación secretaría calendario "
+    "universidad veracruzana campus examen extraordinario calificación kárdex plan de estudios "
+    "requisito documento oficial pago arancel cuota semestre consejo técnico junta académica "
+    "movilidad tutoría certificado equivalencia revalidación dirección general administración"
+).split()
+
+def oracion(rng):
+    palabras = [rng.choice(PALABRAS) for _ in range(rng.randint(8, 18))]
+    return ' '.join(palabras).capitalize() + '.'
+
+def parrafo(rng):
+    return ' '.join(oracion(rng) for _ in range(rng.randint(3, 7)))
+
+# --- PDFs sintéticos ---
+
+def _escapar_pdf(texto):
+    return texto.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+def escribir_pdf(ruta, paginas):
+    """
+    PDF mínimo válido: una página por lista de líneas, en Helvetica con
+    WinAnsiEncoding (cubre los acentos del español). Sin dependencias.
+    """
+    n = len(paginas)
+    objetos = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        ("<< /Type /Pages /Kids [%s] /Count %d >>"
+         % (' '.join(f"{4 + 2 * i} 0 R" for i in range(n)), n)).encode('ascii'),
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+    ]
+    for i, lineas in enumerate(paginas):
+        contenido = ("BT /F1 9 Tf 11 TL 40 800 Td "
+                     + ' '.join(f"({_escapar_pdf(linea)}) Tj T*" for linea in lineas)
+                     + " ET").encode('cp1252', 'replace')
+        objetos.append((f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                        f"/Resources << /Font << /F1 3 0 R >> >> /Contents {5 + 2 * i} 0 R >>").encode('ascii'))
+        objetos.append(b"<< /Length %d >>\nstream\n" % len(contenido) + contenido + b"\nendstream")
+
+    salida = bytearray(b"%PDF-1.4\n")
+    posiciones = []
+    for numero, cuerpo in enumerate(objetos, 1):
+        posiciones.append(len(salida))
+        salida += b"%d 0 obj\n" % numero + cuerpo + b"\nendobj\n"
+    inicio_xref = len(salida)
+    salida += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objetos) + 1)
+    for posicion in posiciones:
+        salida += b"%010d 00000 n \n" % posicion
+    salida += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objetos) + 1, inicio_xref)
+    with open(ruta, 'wb') as f:
+        f.write(salida)
+
+def generar_pdf(ruta, numero_paginas, semilla):
+    """PDF de `numero_paginas` páginas de párrafos sintéticos (unas 60 líneas por página)."""
+    rng = random.Random(semilla)
+    paginas = []
+    for _ in range(numero_paginas):
+        lineas = []
+        while len(lineas) < 60:
+            lineas.extend(textwrap.wrap(parrafo(rng), 100))
+            lineas.append('')
+        paginas.append(lineas[:60])
+    escribir_pdf(ruta, paginas)
+
+# --- Sitio web sintético ---
+
+def pagina_html(numero, parrafos):
+    rng = random.Random(100000 + numero)
+    cuerpo = ''.join(f"<p>{parrafo(rng)}</p>\n" for _ in range(parrafos))
+    return (f"<!DOCTYPE html><html lang=\"es\"><head><meta charset=\"utf-8\">"
+            f"<title>Trámite {numero}</title></head><body><nav>Inicio | Estudiantes | Trámites</nav>"
+            f"<h1>Trámite escolar {numero}</h1>\n{cuerpo}<footer>Universidad Veracruzana</footer>"
+            f"</body></html>").encode('utf-8')
+
+class ServidorPaginas:
+    """Servidor HTTP local: /pagina/<n> responde una página sintética determinista."""
+
+    def __init__(self, parrafos):
+        class Manejador(BaseHTTPRequestHandler):
+            def do_GET(self):
+                try:
+                    numero = int(self.path.rstrip('/').rsplit('/', 1)[-1])
+                except ValueError:
+                    self.send_error(404)
+                    return
+                contenido = pagina_html(numero, parrafos)
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(contenido)))
+                self.end_headers()
+                self.wfile.write(contenido)
+
+            def log_message(self, *args):
+                pass
+
+        self.servidor = ThreadingHTTPServer(('127.0.0.1', 0), Manejador)
+        self.url_base = f"http://127.0.0.1:{self.servidor.server_port}"
+        self.hilo = threading.Thread(target=self.servidor.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.hilo.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.servidor.shutdown()
+
+# --- Medición (en un proceso aparte por combinación) ---
+
+def medir_ingesta(configuracion):
+    """
+    Ingiere el registry de `configuracion` en una base Chroma nueva y retorna
+    el resumen de admin_db más el pico de memoria. Corre en un proceso hijo.
+    """
+    from data import admin_db
+    from data.cache_pdfs import CachePDFs
+    from models.modelo_embeddings import EmbeddingsFalsos
+
+    directorio = configuracion["directorio"]
+    admin_db.CHROMA_PATH = os.path.join(directorio, 'chroma')
+    admin_db.cache_pdfs = CachePDFs(ruta=os.path.join(directorio, 'pdf_cache.json'))
+    admin_db.TAMANO_FRAGMENTO = configuracion["tamano_fragmento"]
+    admin_db.SOLAPAMIENTO_FRAGMENTO = configuracion["solapamiento"]
+    admin_db.HILOS_EMBEDDING = configuracion["hilos_embedding"]
+    embeddings = EmbeddingsFalsos(dimension=configuracion["dimension"], latencia=configuracion["latencia_embed"])
+
+    # Los mensajes por fuente de admin_db ensuciarían la tabla
+    warnings.simplefilter('ignore', DeprecationWarning)
+    with open(os.devnull, 'w') as nulo, contextlib.redirect_stdout(nulo):
+        inicio = time.perf_counter()
+        resumen = admin_db.actualizar_base_datos_completa(configuracion["registry"], embedding_function=embeddings)
+        resultado = {"resumen": resumen, "segundos": time.perf_counter() - inicio}
+
+        if configuracion["repetir"]:
+            inicio = time.perf_counter()
+            admin_db.actualizar_base_datos_completa(configuracion["registry"], embedding_function=embeddings)
+            resultado["segundos_repeticion"] = time.perf_counter() - inicio
+
+    # ru_maxrss está en KB en Linux (en bytes en macOS)
+    escala = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    resultado["rss_pico_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / escala
+    resultado["rss_pico_pdf_mb"] = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / escala
+    return resultado
+
+def ejecutar_en_proceso(configuracion):
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as proceso:
+        return proceso.submit(medir_ingesta, configuracion).result()
+
+# --- Reporte ---
+
+def imprimir_encabezado():
+    print(f"{'fuentes':>7} {'pdf':>4} {'web':>4} {'fragm.':>9} {'n frag':>7} {'total s':>8} {'carga':>7} "
+          f"{'división':>8} {'embed':>7} {'escrit.':>7} {'frag/s':>8} {'RSS MB':>7} {'RSS pdf':>7} {'repet. s':>8}")
+
+def imprimir_fila(r):
+    e = r["segundos_por_etapa"]
+    repeticion = f"{r['segundos_repeticion']:8.2f}" if r.get("segundos_repeticion") is not None else f"{'-':>8}"
+    print(f"{r['fuentes']:>7} {r['pdfs']:>4} {r['paginas_web']:>4} {r['fragmentacion']:>9} {r['fragmentos']:>7} "
+          f"{r['segundos']:8.2f} {e['carga']:7.2f} {e['division']:8.2f} {e['embedding']:7.2f} {e['escritura']:7.2f} "
+          f"{r['fragmentos_por_segundo']:8.1f} {r['rss_pico_mb']:7.0f} {r['rss_pico_pdf_mb']:7.0f} {repeticion}")
+
+def lista_enteros(texto):
+    return [int(x) for x in texto.split(',') if x.strip()]
+
+def lista_fragmentaciones(texto):
+    """'1000:200,500:100' -> [(1000, 200), (500, 100)]"""
+    return [tuple(int(v) for v in par.split(':')) for par in texto.split(',') if par.strip()]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--fuentes', type=lista_enteros, default=[10, 50, 200], help='fuentes por corpus')
+    parser.add_argument('--fraccion-pdf', type=float, default=0.5, help='fracción de las fuentes que son PDFs')
+    parser.add_argument('--paginas-pdf', type=int, default=8)
+    parser.add_argument('--parrafos-web', type=int, default=30)
+    parser.add_argument('--fragmentaciones', type=lista_fragmentaciones, default=[(1000, 200), (500, 100), (2000, 400)],
+                        help='pares tamaño:solapamiento separados por comas')
+    parser.add_argument('--latencia-embed', type=float, default=0.0, help='segundos por lote embebido')
+    parser.add_argument('--dimension', type=int, default=768, help='dimensión de los embeddings falsos')
+    parser.add_argument('--hilos-embedding', type=int, default=int(os.getenv("EMBEDDING_WORKERS", 4)))
+    parser.add_argument('--repetir', action='store_true', help='medir también una segunda ingesta sin cambios')
+    parser.add_argument('--salida', help='archivo JSON con los resultados')
+    args = parser.parse_args()
+
+    directorio = tempfile.mkdtemp(prefix='bench_ingesta_')
+    resultados = []
+    try:
+        # Los PDFs se generan una vez; cada corpus usa los primeros que necesita
+        ruta_pdfs = os.path.join(directorio, 'pdfs')
+        os.makedirs(ruta_pdfs)
+        total_pdfs = max(round(n * args.fraccion_pdf) for n in args.fuentes)
+        inicio = time.perf_counter()
+        for i in range(total_pdfs):
+            generar_pdf(os.path.join(ruta_pdfs, f"documento_{i:04d}.pdf"), args.paginas_pdf, semilla=i)
+        print(f"{total_pdfs} PDFs de {args.paginas_pdf} páginas generados en {time.perf_counter() - inicio:.2f} s")
+
+        with ServidorPaginas(args.parrafos_web) as servidor:
+            print(f"Páginas web sintéticas en {servidor.url_base}\n")
+            imprimir_encabezado()
+            for fuentes in args.fuentes:
+                pdfs = round(fuentes * args.fraccion_pdf)
+                registry = {
+                    "pdfs": [{"filename": f"documento_{i:04d}.pdf",
+                              "path": os.path.join(ruta_pdfs, f"documento_{i:04d}.pdf")} for i in range(pdfs)],
+                    "urls": [{"url": f"{servidor.url_base}/pagina/{i}"} for i in range(fuentes - pdfs)],
+                }
+                for tamano, solapamiento in args.fragmentaciones:
+                    trabajo = tempfile.mkdtemp(dir=directorio)
+                    medicion = ejecutar_en_proceso({
+                        "directorio": trabajo,
+                        "registry": registry,
+                        "tamano_fragmento": tamano,
+                        "solapamiento": solapamiento,
+                        "hilos_embedding": args.hilos_embedding,
+                        "dimension": args.dimension,
+                        "latencia_embed": args.latencia_embed,
+                        "repetir": args.repetir,
+                    })
+                    shutil.rmtree(trabajo, ignore_errors=True)
+
+                    resumen = medicion["resumen"]
+                    resultado = {
+                        "fuentes": fuentes,
+                        "pdfs": pdfs,
+                        "paginas_web": fuentes - pdfs,
+                        "fragmentacion": resumen["fragmentacion"],
+                        "fragmentos": resumen["fragmentos_escritos"],
+                        "segundos": round(medicion["segundos"], 3),
+                        "segundos_por_etapa": resumen["segundos_por_etapa"],
+                        # De punta a punta (incluye la carga), no solo embedding + escritura
+                        "fragmentos_por_segundo": round(resumen["fragmentos_escritos"] / medicion["segundos"], 1),
+                        "rss_pico_mb": round(medicion["rss_pico_mb"], 1),
+                        "rss_pico_pdf_mb": round(medicion["rss_pico_pdf_mb"], 1),
+                        "segundos_repeticion": (round(medicion["segundos_repeticion"], 3)
+                                                if "segundos_repeticion" in medicion else None),
+                    }
+                    resultados.append(resultado)
+                    imprimir_fila(resultado)
+    finally:
+        shutil.rmtree(directorio, ignore_errors=True)
+
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as f:
+            json.dump({"parametros": vars(args), "resultados": resultados}, f, ensure_ascii=False, indent=2)
+        print(f"\nResultados guardados en {args.salida}")
+
+if __name__ == '__main__':
+    main()
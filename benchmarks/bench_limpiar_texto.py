@@ -0,0 +1,131 @@
+"""
+Benchmark de la normalización de preguntas (logic/normalizacion.py).
+
+Compara la versión anterior de limpiar_texto (dos regex + filtro de stopwords)
+contra normalizar_texto (tabla de traducción + memo):
+
+  1. Costo por pregunta: anterior, nueva sin memo (frío) y nueva con memo.
+  2. Tasa de aciertos del caché semántico: cuántas variantes de las preguntas
+     de la FAQ (con acentos, mayúsculas, signos, plurales) caen bajo el umbral
+     de distancia del selector y encuentran la pregunta original.
+
+Uso:
+    python benchmarks/bench_limpiar_texto.py [--faq data/faq.csv] [--repeticiones 20]
+"""
+import os
+import re
+import sys
+import csv
+import time
+import argparse
+import numpy as np
+from sklearn.feature_extraction.text import HashingVectorizer
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from logic import normalizacion
+from logic.normalizacion import normalizar_texto, _stem_ligero
+from nltk.corpus import stopwords
+
+# Mismos parámetros que IndiceKNNIncremental y que el umbral por defecto del selector
+N_FEATURES = 2 ** 18
+UMBRAL_DISTANCIA = 0.2
+
+# --- Normalización anterior (referencia) ---
+_stopwords_anteriores = set(stopwords.words('spanish'))
+
+def limpiar_texto_anterior(texto):
+    if not isinstance(texto, str):
+        return ""
+    texto = texto.lower()
+    texto = re.sub(r'[^\w\s]', '', texto)
+    texto = re.sub(r'\s+', ' ', texto).strip()
+    return ' '.join(p for p in texto.split() if p not in _stopwords_anteriores)
+
+def normalizar_con_stemming(texto):
+    if normalizacion.STEMMING_LIGERO:
+        return normalizar_texto(texto)
+    return ' '.join(_stem_ligero(p) for p in normalizar_texto(texto).split())
+
+# --- Variantes de consulta ---
+ACENTOS = [
+    (r'cion\b', 'ción'), (r'\bque\b', 'qué'), (r'\bcual\b', 'cuál'), (r'\bcomo\b', 'cómo'),
+    (r'\bcuanto\b', 'cuánto'), (r'\bmas\b', 'más'), (r'fisica', 'física'), (r'cedula', 'cédula'),
+    (r'creditos', 'créditos'), (r'comite', 'comité'), (r'capitulo', 'capítulo'), (r'titulacion', 'titulación'),
+]
+
+def variantes(pregunta):
+    """Formas en que un usuario escribiría la misma pregunta."""
+    acentuada = pregunta
+    for patron, reemplazo in ACENTOS:
+        acentuada = re.sub(patron, reemplazo, acentuada)
+    plural = ' '.join(p + 's' if len(p) > 4 and p[-1] in 'aeo' else p for p in pregunta.split())
+    return [
+        acentuada,
+        f"¿{acentuada[:1].upper()}{acentuada[1:]}?",
+        pregunta.upper() + '!!',
+        plural,
+    ]
+
+def cargar_preguntas(ruta):
+    with open(ruta, newline='', encoding='utf-8') as f:
+        preguntas = [r['Pregunta'] for r in csv.DictReader(f) if r.get('Pregunta')]
+    return list(dict.fromkeys(preguntas))
+
+# --- Mediciones ---
+
+def medir_costo(funcion, textos, repeticiones, antes=None):
+    mejor = float('inf')
+    for _ in range(repeticiones):
+        if antes:
+            antes()
+        inicio = time.perf_counter()
+        for texto in textos:
+            funcion(texto)
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return mejor / len(textos) * 1e6
+
+def tasa_aciertos(normalizar, preguntas, consultas):
+    vectorizador = HashingVectorizer(n_features=N_FEATURES, alternate_sign=False, norm='l2')
+    claves = [normalizar(p) for p in preguntas]
+    matriz = vectorizador.transform(claves)
+    aciertos = 0
+    for origen, consulta in consultas:
+        vector = vectorizador.transform([normalizar(consulta)])
+        similitudes = (matriz @ vector.T).toarray().ravel()
+        mejor = int(np.argmax(similitudes))
+        if 1.0 - similitudes[mejor] < UMBRAL_DISTANCIA and claves[mejor] == claves[origen]:
+            aciertos += 1
+    return aciertos / len(consultas)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--faq', default=os.path.join(project_root, 'data', 'faq.csv'))
+    parser.add_argument('--repeticiones', type=int, default=20)
+    args = parser.parse_args()
+
+    preguntas = cargar_preguntas(args.faq)
+    consultas = [(i, v) for i, p in enumerate(preguntas) for v in variantes(p)]
+    textos = [v for _, v in consultas] + preguntas
+    print(f"FAQ: {len(preguntas)} preguntas, {len(consultas)} variantes de consulta\n")
+
+    print("Costo por pregunta (µs, mejor de %d repeticiones)" % args.repeticiones)
+    costos = [
+        ("anterior (regex)", medir_costo(limpiar_texto_anterior, textos, args.repeticiones)),
+        ("nueva, sin memo", medir_costo(normalizar_texto, textos, args.repeticiones,
+                                        antes=normalizacion._normalizar.cache_clear)),
+        ("nueva, con memo", medir_costo(normalizar_texto, textos, args.repeticiones)),
+    ]
+    for nombre, costo in costos:
+        print(f"  {nombre:<20} {costo:8.2f}")
+
+    print(f"\nAciertos del caché semántico (distancia < {UMBRAL_DISTANCIA})")
+    for nombre, funcion in [("anterior", limpiar_texto_anterior),
+                            ("nueva", normalizar_texto),
+                            ("nueva + stemming", normalizar_con_stemming)]:
+        print(f"  {nombre:<20} {tasa_aciertos(funcion, preguntas, consultas):7.1%}")
+
+if __name__ == '__main__':
+    main()
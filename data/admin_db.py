@@ -2,98 +2,449 @@ import os
 import shutil
 import time
 import gc
+import hashlib
+import uuid
+import multiprocessing
+import signal
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_community.document_loaders import WebBaseLoader, PyPDFLoader
 from langchain_community.vectorstores import Chroma
-from langchain_ollama import OllamaEmbeddings
+
+from logic.tareas_entrenamiento import ProgresoEntrenamiento
+from models.modelo_embeddings import obtener_embeddings
+from data.cache_pdfs import cache_pdfs
 
 # --- CONFIGURACIÓN ---
 CHROMA_PATH = "data/chroma_db_web"
 MODELO_EMBEDDING = "nomic-embed-text"
+# Fragmentos por llamada al modelo de embeddings y llamadas simultáneas
+TAMANO_LOTE_EMBEDDING = int(os.getenv("EMBEDDING_BATCH_SIZE", 32))
+HILOS_EMBEDDING = int(os.getenv("EMBEDDING_WORKERS", 4))
+# Fragmentos por escritura en Chroma (se acota al máximo que acepte el cliente)
+TAMANO_LOTE_ESCRITURA = 1000
+# Carga de documentos: descargas simultáneas y procesos para leer PDFs (CPU)
+HILOS_DESCARGA = int(os.getenv("URL_WORKERS", 8))
+PROCESOS_PDF = int(os.getenv("PDF_WORKERS", os.cpu_count() or 2))
+# Tiempo máximo (segundos) por fuente
+TIMEOUT_URL = 30
+TIMEOUT_PDF = 300
+# Tamaño y solapamiento (caracteres) de los fragmentos
+TAMANO_FRAGMENTO = int(os.getenv("CHUNK_SIZE", 1000))
+SOLAPAMIENTO_FRAGMENTO = int(os.getenv("CHUNK_OVERLAP", 200))
+# Fragmentación de los fragmentos guardados antes de registrarla en sus metadatos
+FRAGMENTACION_ANTERIOR = "1000:200"
+
+def fragmentacion_actual():
+    """Configuración de fragmentos vigente ('tamaño:solapamiento')."""
+    return f"{TAMANO_FRAGMENTO}:{SOLAPAMIENTO_FRAGMENTO}"
+
+def id_fuente(tipo, clave):
+    """Identificador estable de una fuente dentro de ChromaDB (ej. 'pdf:Estatuto.pdf')."""
+    return f"{tipo}:{clave}"
+
+def _hash_contenido(documentos):
+    """Huella del texto completo de una fuente; si no cambia, no se re-embebe."""
+    h = hashlib.sha256()
+    for doc in documentos:
+        h.update(doc.page_content.encode('utf-8'))
+        h.update(b'\x00')
+    return h.hexdigest()
+
+def _conectar_db(embedding_function=None):
+    """Conecta a la DB existente (o la crea si no existe)."""
+    return Chroma(
+        persist_directory=CHROMA_PATH,
+        embedding_function=embedding_function or obtener_embeddings(MODELO_EMBEDDING)
+    )
 
-def actualizar_base_datos_completa(registry_data):
+def _indexar_existentes(vector_db):
     """
-    Recibe el diccionario del registry.json con 'urls' y 'pdfs'.
-    Estrategia: Cargar documentos -> Conectar a DB -> Borrar datos viejos -> Insertar nuevos.
+    Agrupa los fragmentos guardados por fuente:
+    {source_id: {'hashes': {...}, 'fragmentaciones': {...}, 'ids': [...], 'total': n}}.
+    Los fragmentos sin source_id (formato anterior) quedan bajo la clave None.
     """
-    print("🚀 Iniciando proceso de entrenamiento con PDFs y URLs...")
-    
-    # 1. Preparar Documentos para RAG (URLs + PDFs)
-    todos_los_documentos = []
-    
-    # A) Procesar URLs
-    urls = [item['url'] for item in registry_data.get('urls', [])]
-    if urls:
-        print(f"📡 Descargando {len(urls)} URLs...")
-        try:
-            loader_web = WebBaseLoader(urls)
-            docs_web = loader_web.load()
-            todos_los_documentos.extend(docs_web)
-        except Exception as e:
-            print(f"⚠️ Error cargando URLs: {e}")
-
-    # B) Procesar PDFs
-    pdfs = registry_data.get('pdfs', [])
-    for pdf_item in pdfs:
-        path = pdf_item.get('path')
-        if os.path.exists(path):
-            print(f"📄 Procesando PDF: {pdf_item['filename']}")
+    existentes = {}
+    datos = vector_db.get(include=['metadatas'])
+    for id_frag, metadata in zip(datos['ids'], datos['metadatas']):
+        metadata = metadata or {}
+        fuente = existentes.setdefault(metadata.get('source_id'),
+                                       {'hashes': set(), 'fragmentaciones': set(), 'ids': [], 'total': None})
+        fuente['ids'].append(id_frag)
+        fuente['hashes'].add(metadata.get('content_hash'))
+        fuente['fragmentaciones'].add(metadata.get('fragmentacion', FRAGMENTACION_ANTERIOR))
+        fuente['total'] = metadata.get('chunk_total', fuente['total'])
+    return existentes
+
+def _sin_cambios(anterior, content_hash):
+    """
+    La fuente está completa en la DB con exactamente esta versión del contenido,
+    dividida con la fragmentación vigente (si cambia CHUNK_SIZE se vuelve a dividir).
+    """
+    return (anterior is not None
+            and anterior['hashes'] == {content_hash}
+            and anterior['fragmentaciones'] == {fragmentacion_actual()}
+            and anterior['total'] == len(anterior['ids']))
+
+def marcar_version_vector_store():
+    """
+    Avisa a los cachés de recuperación (modelo_llm) que la base vectorial
+    cambió: escribe un valor que nunca se repite (archivo temporal +
+    reemplazo, un lector nunca ve el archivo vacío).
+    """
+    os.makedirs(CHROMA_PATH, exist_ok=True)
+    ruta = os.path.join(CHROMA_PATH, '.version')
+    temporal = f"{ruta}.{os.getpid()}.tmp"
+    with open(temporal, 'w', encoding='utf-8') as f:
+        f.write(uuid.uuid4().hex)
+    os.replace(temporal, ruta)
+
+def _borrar_ids(vector_db, ids):
+    # Borramos en lotes para evitar sobrecarga si son muchos
+    batch_size = 5000
+    for i in range(0, len(ids), batch_size):
+        vector_db.delete(ids[i:i+batch_size])
+
+def _borrar_fuente(vector_db, source_id):
+    """Borra todos los fragmentos guardados con este source_id; retorna cuántos eran."""
+    ids = vector_db.get(where={'source_id': source_id})['ids']
+    _borrar_ids(vector_db, ids)
+    return len(ids)
+
+def eliminar_fuente(tipo, clave):
+    """Borra de ChromaDB todos los fragmentos de una fuente (al eliminar un PDF o URL)."""
+    borrados = _borrar_fuente(_conectar_db(), id_fuente(tipo, clave))
+    if borrados:
+        marcar_version_vector_store()
+        print(f"🧹 Eliminados {borrados} fragmentos de {clave}")
+    return borrados
+
+def _listar_fuentes(registry_data):
+    """Convierte el registry en una lista de (tipo, clave, item)."""
+    fuentes = [('url', item['url'], item) for item in registry_data.get('urls', [])]
+    fuentes += [('pdf', item['filename'], item) for item in registry_data.get('pdfs', [])]
+    return fuentes
+
+def _fuentes_vigentes(leer_registro, registry_data):
+    """source_id de las fuentes del registro actual (sin `leer_registro`, las del recibido)."""
+    registro = leer_registro() if leer_registro else registry_data
+    return {id_fuente(tipo, clave) for tipo, clave, _ in _listar_fuentes(registro)}
+
+def _cargar_url(url):
+    """Descarga una URL (se ejecuta en el pool de hilos)."""
+    return WebBaseLoader(url, requests_kwargs={'timeout': TIMEOUT_URL}, raise_for_status=True).load()
+
+def _cargar_pdf(path):
+    """Lee un PDF (se ejecuta en un proceso aparte: el parseo usa CPU)."""
+    # El registry puede traer rutas con separador de Windows
+    path = (path or '').replace('\\', '/')
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Archivo no encontrado: {path}")
+    return PyPDFLoader(path).load()
+
+def _reportar_pid(cola_pids):
+    """Inicializador de cada proceso lector: avisa su PID al pool que lo creó."""
+    cola_pids.put(os.getpid())
+
+class _PoolPDFs(ProcessPoolExecutor):
+    """
+    Procesos lectores de PDFs. Se crean con 'spawn', no con fork: un fork
+    desde el servidor copiaría sus hilos a medio trabajo y sus locks tomados.
+    Cada proceso reporta su PID al arrancar (antes de recibir trabajo), así
+    que terminar() puede matar a uno colgado en un PDF.
+    """
+
+    def __init__(self):
+        contexto = multiprocessing.get_context('spawn')
+        # SimpleQueue escribe directo al pipe: el PID llega aunque el proceso se cuelgue después
+        self._cola_pids = contexto.SimpleQueue()
+        self._pids_lectores = set()
+        super().__init__(max_workers=PROCESOS_PDF, mp_context=contexto,
+                         initializer=_reportar_pid, initargs=(self._cola_pids,))
+
+    def terminar(self):
+        """Detiene el pool matando sus procesos (un PDF colgado no termina solo)."""
+        while not self._cola_pids.empty():
+            self._pids_lectores.add(self._cola_pids.get())
+        for pid in self._pids_lectores:
             try:
-                loader_pdf = PyPDFLoader(path)
-                docs_pdf = loader_pdf.load()
-                todos_los_documentos.extend(docs_pdf)
-            except Exception as e:
-                print(f"⚠️ Error leyendo PDF {path}: {e}")
+                os.kill(pid, signal.SIGTERM)
+            except OSError:
+                pass   # Ya había terminado
+        self.shutdown(wait=False, cancel_futures=True)
+
+def _cargar_fuentes(fuentes):
+    """
+    Carga todas las fuentes en paralelo y las entrega conforme terminan:
+    genera (tipo, clave, item, documentos, error). Un error o timeout en una
+    fuente no afecta a las demás. Los PDFs sin cambios salen del caché de texto
+    extraído y no se vuelven a parsear.
+
+    Un PDF que agota su tiempo deja ocupado un proceso que no se puede
+    interrumpir: el pool se descarta (matando sus procesos) y los demás PDFs
+    pendientes se vuelven a encolar en uno nuevo, con su tiempo reiniciado.
+    """
+    en_cache = []
+    por_cargar = []
+    for tipo, clave, item in fuentes:
+        documentos = cache_pdfs.obtener(item.get('path')) if tipo == 'pdf' else None
+        if documentos is not None:
+            en_cache.append((tipo, clave, item, documentos))
         else:
-            print(f"⚠️ Archivo no encontrado: {path}")
-
-    # 2. Actualizar ChromaDB (Sin borrar la carpeta)
-    if todos_los_documentos:
-        print("🔪 Dividiendo texto en fragmentos...")
-        text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
-        chunks = text_splitter.split_documents(todos_los_documentos)
-        print(f"📊 Se generaron {len(chunks)} fragmentos de texto.")
-
-        print("🔄 Actualizando base de datos vectorial...")
-        
-        # Inicializamos el modelo de embeddings
-        embedding_function = OllamaEmbeddings(model=MODELO_EMBEDDING)
-        
-        # Conectamos a la DB existente (o se crea si no existe)
-        vector_db = Chroma(
-            persist_directory=CHROMA_PATH,
-            embedding_function=embedding_function
+            por_cargar.append((tipo, clave, item))
+
+    hilos = ThreadPoolExecutor(max_workers=HILOS_DESCARGA, thread_name_prefix="descargas")
+    procesos = _PoolPDFs() if any(t == 'pdf' for t, _, _ in por_cargar) else None
+    pendientes = {}
+    for tipo, clave, item in por_cargar:
+        if tipo == 'url':
+            futuro = hilos.submit(_cargar_url, item['url'])
+        else:
+            futuro = procesos.submit(_cargar_pdf, item.get('path'))
+        pendientes[futuro] = (tipo, clave, item)
+
+    # El timeout se cuenta desde que la fuente empieza a procesarse, no desde que entra a la cola
+    inicio_ejecucion = {}
+    try:
+        for tipo, clave, item, documentos in en_cache:
+            print(f"💾 PDF sin cambios (texto en caché): {clave}")
+            yield tipo, clave, item, documentos, None
+
+        while pendientes:
+            listos, _ = wait(pendientes, timeout=1, return_when=FIRST_COMPLETED)
+            for futuro in listos:
+                tipo, clave, item = pendientes.pop(futuro)
+                try:
+                    documentos = futuro.result()
+                except Exception as e:
+                    yield tipo, clave, item, None, e
+                    continue
+                if tipo == 'pdf':
+                    cache_pdfs.guardar(item.get('path'), documentos)
+                yield tipo, clave, item, documentos, None
+
+            ahora = time.monotonic()
+            pdf_colgado = False
+            for futuro, (tipo, clave, item) in list(pendientes.items()):
+                if futuro.running():
+                    inicio_ejecucion.setdefault(futuro, ahora)
+                    limite = TIMEOUT_URL * 2 if tipo == 'url' else TIMEOUT_PDF
+                    if ahora - inicio_ejecucion[futuro] > limite:
+                        del pendientes[futuro]
+                        pdf_colgado = pdf_colgado or tipo == 'pdf'
+                        yield tipo, clave, item, None, TimeoutError(f"Tiempo agotado ({limite}s)")
+
+            if pdf_colgado:
+                # Reciclar el pool: matar el proceso colgado y reencolar los PDFs que quedan
+                reencolar = [(f, fuente) for f, fuente in pendientes.items() if fuente[0] == 'pdf']
+                for futuro, _ in reencolar:
+                    del pendientes[futuro]
+                procesos.terminar()
+                procesos = _PoolPDFs()
+                for _, (tipo, clave, item) in reencolar:
+                    pendientes[procesos.submit(_cargar_pdf, item.get('path'))] = (tipo, clave, item)
+                if reencolar:
+                    print(f"♻️ Procesos de PDFs reiniciados; {len(reencolar)} PDFs se vuelven a encolar")
+    finally:
+        hilos.shutdown(wait=False, cancel_futures=True)
+        if procesos and any(t == 'pdf' for t, _, _ in pendientes.values()):
+            procesos.terminar()
+        elif procesos:
+            procesos.shutdown(wait=False, cancel_futures=True)
+        try:
+            cache_pdfs.persistir()
+        except Exception as e:
+            print(f"⚠️ No se pudo guardar el caché de PDFs: {e}")
+
+def _metadatos_simples(metadata):
+    """Chroma solo acepta valores escalares en los metadatos."""
+    return {k: v for k, v in metadata.items() if isinstance(v, (str, int, float, bool))}
+
+def _embeber_en_lotes(embedding_function, textos, executor, progreso):
+    """Embebe los textos en lotes repartidos en el pool; conserva el orden."""
+    lotes = [textos[i:i + TAMANO_LOTE_EMBEDDING] for i in range(0, len(textos), TAMANO_LOTE_EMBEDDING)]
+
+    def embeber(lote):
+        vectores = embedding_function.embed_documents(lote)
+        progreso.sumar('fragmentos_embebidos', len(lote))
+        return vectores
+
+    vectores = []
+    for resultado in executor.map(embeber, lotes):
+        vectores.extend(resultado)
+    return vectores
+
+def _escribir_fragmentos(vector_db, embedding_function, chunks, progreso, source_id, content_hash, executor):
+    """
+    Embebe (en paralelo) y guarda en bloque los fragmentos de una fuente.
+    Retorna los segundos de (embedding, escritura).
+    """
+    textos = [c.page_content for c in chunks]
+    inicio = time.perf_counter()
+    vectores = _embeber_en_lotes(embedding_function, textos, executor, progreso)
+    segundos_embedding = time.perf_counter() - inicio
+
+    metadatas = []
+    for c in chunks:
+        metadata = _metadatos_simples(c.metadata)
+        metadata.update(source_id=source_id, content_hash=content_hash,
+                        chunk_total=len(chunks), fragmentacion=fragmentacion_actual())
+        metadatas.append(metadata)
+    # IDs deterministas: re-escribir la misma versión no duplica fragmentos
+    ids = [f"{source_id}#{content_hash[:16]}#{i}" for i in range(len(chunks))]
+
+    coleccion = vector_db._collection
+    try:
+        tamano = min(TAMANO_LOTE_ESCRITURA, vector_db._client.get_max_batch_size())
+    except Exception:
+        tamano = TAMANO_LOTE_ESCRITURA
+    for i in range(0, len(chunks), tamano):
+        coleccion.upsert(
+            ids=ids[i:i + tamano],
+            embeddings=vectores[i:i + tamano],
+            documents=textos[i:i + tamano],
+            metadatas=metadatas[i:i + tamano],
         )
-        
-        # PASO CLAVE: Borrar contenido previo sin borrar carpeta
+        progreso.sumar('fragmentos_escritos', len(ids[i:i + tamano]))
+    return segundos_embedding, time.perf_counter() - inicio - segundos_embedding
+
+def _cronometrar(iterable, tiempos, etapa):
+    """Reenvía los elementos sumando en tiempos[etapa] lo que se espera por cada uno."""
+    iterador = iter(iterable)
+    while True:
+        inicio = time.perf_counter()
         try:
-            # Obtenemos todos los IDs actuales en la base de datos
-            existing_ids = vector_db.get()['ids']
-            if existing_ids:
-                print(f"🧹 Eliminando {len(existing_ids)} registros antiguos...")
-                # Borramos en lotes para evitar sobrecarga si son muchos
-                batch_size = 5000
-                for i in range(0, len(existing_ids), batch_size):
-                    vector_db.delete(existing_ids[i:i+batch_size])
+            elemento = next(iterador)
+        except StopIteration:
+            return
+        finally:
+            tiempos[etapa] += time.perf_counter() - inicio
+        yield elemento
+
+def actualizar_base_datos_completa(registry_data, progreso=None, embedding_function=None,
+                                   leer_registro=None):
+    """
+    Recibe el diccionario del registry.json con 'urls' y 'pdfs'.
+    Estrategia incremental: cada fragmento guarda source_id + content_hash, así que
+    solo se re-embeben las fuentes nuevas o modificadas, se omiten las que no cambiaron
+    y se borran los fragmentos de fuentes que ya no están en el registro.
+    El avance (y el estado de cada fuente) se reporta en `progreso`; `embedding_function`
+    permite sustituir Ollama (ej. EmbeddingsFalsos para pruebas offline).
+    `leer_registro()` retorna el registro vigente: una fuente que se elimina
+    mientras corre el entrenamiento no se vuelve a escribir (se consulta antes
+    y después de guardar cada fuente, y antes de borrar los huérfanos).
+    Retorna un resumen con el rendimiento de la ingesta.
+    """
+    progreso = progreso or ProgresoEntrenamiento()
+    print("🚀 Iniciando proceso de entrenamiento con PDFs y URLs...")
+
+    fuentes = _listar_fuentes(registry_data)
+    for tipo, clave, _ in fuentes:
+        progreso.marcar_fuente(tipo, clave, 'En espera')
+
+    # Embeddings con caché: los fragmentos ya vistos no vuelven a pasar por Ollama
+    embedding_function = embedding_function or obtener_embeddings(MODELO_EMBEDDING)
+    vector_db = _conectar_db(embedding_function)
+
+    try:
+        existentes = _indexar_existentes(vector_db)
+    except Exception as e:
+        print(f"⚠️ Advertencia al leer registros (puede ser base nueva): {e}")
+        existentes = {}
+
+    text_splitter = RecursiveCharacterTextSplitter(chunk_size=TAMANO_FRAGMENTO,
+                                                   chunk_overlap=SOLAPAMIENTO_FRAGMENTO)
+    executor = ThreadPoolExecutor(max_workers=HILOS_EMBEDDING, thread_name_prefix="embeddings")
+    inicio = time.perf_counter()
+    tiempo_escritura = 0.0
+    # Tiempo de cada etapa; 'carga' es lo que se esperó a que llegara la siguiente fuente
+    etapas = {'carga': 0.0, 'division': 0.0, 'embedding': 0.0, 'escritura': 0.0}
+
+    for tipo, clave, _ in fuentes:
+        progreso.marcar_fuente(tipo, clave, 'Procesando')
+
+    # Las fuentes se cargan en paralelo; cada una se procesa completa en cuanto llega
+    # (comparar hash -> dividir -> embeber -> guardar) para marcarla como terminada.
+    for tipo, clave, item, documentos, error in _cronometrar(_cargar_fuentes(fuentes), etapas, 'carga'):
+        source_id = id_fuente(tipo, clave)
+        try:
+            if error is not None:
+                raise error
+            print(f"{'📡' if tipo == 'url' else '📄'} Procesando {tipo.upper()}: {clave}")
+            progreso.sumar('documentos_cargados', len(documentos))
+
+            content_hash = _hash_contenido(documentos)
+            anterior = existentes.get(source_id)
+            if _sin_cambios(anterior, content_hash):
+                print(f"⏭️ Sin cambios: {clave}")
+                progreso.sumar('fuentes_sin_cambios')
+                progreso.marcar_fuente(tipo, clave, 'Activo')
+                continue
+
+            if source_id not in _fuentes_vigentes(leer_registro, registry_data):
+                print(f"🗑️ Eliminada durante el entrenamiento, no se escribe: {clave}")
+                progreso.marcar_fuente(tipo, clave, 'Eliminada')
+                continue
+
+            inicio_division = time.perf_counter()
+            chunks = text_splitter.split_documents(documentos)
+            etapas['division'] += time.perf_counter() - inicio_division
+            progreso.sumar('fragmentos_generados', len(chunks))
+
+            inicio_escritura = time.perf_counter()
+            segundos_embedding, segundos_escritura = _escribir_fragmentos(
+                vector_db, embedding_function, chunks, progreso, source_id, content_hash, executor)
+            tiempo_escritura += time.perf_counter() - inicio_escritura
+            etapas['embedding'] += segundos_embedding
+            etapas['escritura'] += segundos_escritura
+
+            # Si la borraron mientras se escribía, su eliminar_fuente() pudo correr antes del upsert
+            if source_id not in _fuentes_vigentes(leer_registro, registry_data):
+                progreso.sumar('fragmentos_eliminados', _borrar_fuente(vector_db, source_id))
+                progreso.marcar_fuente(tipo, clave, 'Eliminada')
+                continue
+
+            # La versión nueva ya está escrita: borrar los fragmentos de la anterior
+            if anterior:
+                nuevos = {f"{source_id}#{content_hash[:16]}#{i}" for i in range(len(chunks))}
+                obsoletos = [i for i in anterior['ids'] if i not in nuevos]
+                _borrar_ids(vector_db, obsoletos)
+                progreso.sumar('fragmentos_eliminados', len(obsoletos))
+            progreso.marcar_fuente(tipo, clave, 'Activo')
         except Exception as e:
-            print(f"⚠️ Advertencia al limpiar registros (puede ser base nueva): {e}")
-
-        # Insertamos los nuevos fragmentos
-        print("💾 Guardando nueva información...")
-        vector_db.add_documents(documents=chunks)
-        
-        print("✅ ChromaDB actualizada con éxito (URLs + PDFs).")
-    else:
+            # Si falla la carga se conservan los fragmentos anteriores de la fuente
+            print(f"⚠️ Error procesando {clave}: {e}")
+            progreso.marcar_fuente(tipo, clave, 'Error')
+
+    executor.shutdown(wait=True)
+
+    # Fuentes que ya no están en el registro (o fragmentos sin source_id del formato anterior)
+    vigentes = _fuentes_vigentes(leer_registro, registry_data)
+    huerfanos = [i for sid, datos in existentes.items() if sid not in vigentes for i in datos['ids']]
+    if huerfanos:
+        print(f"🧹 Eliminando {len(huerfanos)} fragmentos de fuentes eliminadas...")
+        _borrar_ids(vector_db, huerfanos)
+        progreso.sumar('fragmentos_eliminados', len(huerfanos))
+
+    escritos = progreso.contadores['fragmentos_escritos']
+    if escritos or progreso.contadores['fragmentos_eliminados']:
+        marcar_version_vector_store()
+    resumen = {
+        "fragmentos_escritos": escritos,
+        "segundos_totales": round(time.perf_counter() - inicio, 3),
+        "segundos_embedding_escritura": round(tiempo_escritura, 3),
+        "fragmentos_por_segundo": round(escritos / tiempo_escritura, 1) if tiempo_escritura else 0.0,
+        "segundos_por_etapa": {etapa: round(segundos, 3) for etapa, segundos in etapas.items()},
+        "fragmentacion": fragmentacion_actual(),
+    }
+    progreso.resumen = resumen
+
+    if not fuentes:
         print("⚠️ No hay documentos válidos (ni URLs ni PDFs) para entrenar.")
-        # Opcional: Si no hay documentos, podrías querer vaciar la DB también
-        try:
-             embedding_function = OllamaEmbeddings(model=MODELO_EMBEDDING)
-             vector_db = Chroma(persist_directory=CHROMA_PATH, embedding_function=embedding_function)
-             existing_ids = vector_db.get()['ids']
-             if existing_ids:
-                 vector_db.delete(existing_ids)
-                 print("🧹 Base de datos vaciada (no hay documentos origen).")
-        except:
-            pass
-
-    return True
\ No newline at end of file
+        return resumen
+
+    print(f"📊 Fragmentos escritos: {escritos} "
+          f"(fuentes sin cambios: {progreso.contadores['fuentes_sin_cambios']}, "
+          f"{resumen['fragmentos_por_segundo']} fragmentos/s)")
+    print("✅ ChromaDB actualizada con éxito (URLs + PDFs).")
+    return resumen
@@ -0,0 +1,281 @@
+import os
+import csv
+import io
+import queue
+import sqlite3
+import threading
+import time
+import atexit
+
+from logic.normalizacion import normalizar_texto, VERSION_NORMALIZACION
+
+# --- CONFIGURACIÓN ---
+DATA_DIR = os.path.dirname(os.path.abspath(__file__))
+RUTA_DB_FAQ = os.path.join(DATA_DIR, 'faq.sqlite3')
+# CSV original: se importa una sola vez si la base está vacía
+RUTA_CSV_FAQ = os.path.join(DATA_DIR, 'faq.csv')
+# El escritor agrupa lo que llegue en este intervalo (segundos) o hasta MAX_LOTE filas
+INTERVALO_ESCRITURA = 0.5
+MAX_LOTE = 200
+
+def normalizar_pregunta(pregunta):
+    """Clave de la FAQ: la misma normalización que usa el caché semántico."""
+    return normalizar_texto(pregunta) or str(pregunta).strip().lower()
+
+class AlmacenFAQ:
+    """
+    Preguntas frecuentes en SQLite (modo WAL), una fila por pregunta normalizada.
+    Cada fila guarda el texto de la respuesta y su HTML ya formateado, que es
+    lo que sirve el caché: un acierto nunca vuelve a pasar por el formateador.
+
+    Las escrituras se encolan y un hilo las aplica en lotes; dentro de un lote,
+    varias escrituras a la misma pregunta se fusionan y gana la última. Cada
+    upsert cuesta lo mismo sin importar el tamaño de la base, y varios
+    workers pueden escribir a la vez sin corromperla.
+
+    Cada fila escrita recibe un número de `secuencia` al confirmarse el lote
+    (no al encolarse): crece estrictamente entre lotes de todos los workers,
+    así que `modificadas_desde(marca)` nunca pierde un lote confirmado después
+    de leer `estado()`.
+    """
+
+    def __init__(self, ruta_db=RUTA_DB_FAQ, ruta_csv_inicial=RUTA_CSV_FAQ, normalizar=normalizar_pregunta,
+                 version_normalizacion=VERSION_NORMALIZACION):
+        self.ruta_db = ruta_db
+        self.ruta_csv_inicial = ruta_csv_inicial
+        self.normalizar = normalizar
+        self.version_normalizacion = version_normalizacion
+        self._cola = queue.Queue()
+        self._local = threading.local()
+        self._lock_inicio = threading.Lock()
+        self._hilo_escritor = None
+        self._inicializada = False
+
+    # --- Conexión y esquema ---
+
+    def _conexion(self):
+        conexion = getattr(self._local, 'conexion', None)
+        if conexion is None:
+            conexion = sqlite3.connect(self.ruta_db, timeout=30)
+            conexion.execute("PRAGMA journal_mode=WAL")
+            conexion.execute("PRAGMA synchronous=NORMAL")
+            self._local.conexion = conexion
+        return conexion
+
+    def _inicializar(self):
+        with self._lock_inicio:
+            if self._inicializada:
+                return
+            conexion = self._conexion()
+            conexion.execute(
+                "CREATE TABLE IF NOT EXISTS faq ("
+                "clave TEXT PRIMARY KEY, pregunta TEXT NOT NULL, "
+                "respuesta TEXT NOT NULL, actualizado REAL NOT NULL, respuesta_html TEXT, "
+                "secuencia INTEGER NOT NULL DEFAULT 0)"
+            )
+            conexion.execute("CREATE TABLE IF NOT EXISTS meta (clave TEXT PRIMARY KEY, valor TEXT)")
+            self._migrar_html(conexion)
+            self._migrar_secuencia(conexion)
+            conexion.execute("CREATE INDEX IF NOT EXISTS faq_secuencia ON faq (secuencia)")
+            conexion.commit()
+            vacia = conexion.execute("SELECT COUNT(*) FROM faq").fetchone()[0] == 0
+            if vacia and self.ruta_csv_inicial and os.path.exists(self.ruta_csv_inicial):
+                total = self.importar_csv(self.ruta_csv_inicial)
+                print(f"📥 FAQ: importadas {total} preguntas desde {self.ruta_csv_inicial}")
+            else:
+                fila = conexion.execute("SELECT valor FROM meta WHERE clave = 'version_normalizacion'").fetchone()
+                if not vacia and (fila is None or fila[0] != self.version_normalizacion):
+                    self._recalcular_claves()
+            self._guardar_version()
+            self._inicializada = True
+
+    @staticmethod
+    def _migrar_html(conexion):
+        """Bases anteriores a respuesta_html: sus respuestas ya se guardaban formateadas."""
+        columnas = [fila[1] for fila in conexion.execute("PRAGMA table_info(faq)")]
+        if 'respuesta_html' not in columnas:
+            conexion.execute("ALTER TABLE faq ADD COLUMN respuesta_html TEXT")
+            conexion.execute("UPDATE faq SET respuesta_html = respuesta")
+
+    @staticmethod
+    def _migrar_secuencia(conexion):
+        """Bases anteriores a secuencia: se numeran en el orden en que se actualizaron."""
+        columnas = [fila[1] for fila in conexion.execute("PRAGMA table_info(faq)")]
+        if 'secuencia' not in columnas:
+            conexion.execute("ALTER TABLE faq ADD COLUMN secuencia INTEGER NOT NULL DEFAULT 0")
+            filas = conexion.execute("SELECT rowid FROM faq ORDER BY actualizado, rowid").fetchall()
+            conexion.executemany(
+                "UPDATE faq SET secuencia = ? WHERE rowid = ?",
+                [(numero, rowid) for numero, (rowid,) in enumerate(filas, 1)]
+            )
+
+    def _guardar_version(self):
+        conexion = self._conexion()
+        conexion.execute(
+            "INSERT OR REPLACE INTO meta (clave, valor) VALUES ('version_normalizacion', ?)",
+            (self.version_normalizacion,)
+        )
+        conexion.commit()
+
+    def _recalcular_claves(self):
+        """
+        La normalización cambió (p. ej. ahora pliega acentos): se recalculan
+        las claves. Preguntas que antes eran distintas pueden coincidir ahora;
+        se queda la actualizada más recientemente. Cada fila conserva su
+        secuencia.
+        """
+        conexion = self._conexion()
+        filas = conexion.execute(
+            "SELECT pregunta, respuesta, actualizado, respuesta_html, secuencia FROM faq ORDER BY secuencia, rowid"
+        ).fetchall()
+        nuevas = {}
+        for pregunta, respuesta, actualizado, respuesta_html, secuencia in filas:
+            clave = self.normalizar(pregunta)
+            nuevas.pop(clave, None)  # Reinsertar al final conserva el orden por antigüedad
+            nuevas[clave] = (clave, pregunta, respuesta, actualizado, respuesta_html, secuencia)
+        with conexion:
+            conexion.execute("DELETE FROM faq")
+            conexion.executemany(
+                "INSERT INTO faq (clave, pregunta, respuesta, actualizado, respuesta_html, secuencia) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                list(nuevas.values())
+            )
+        print(f"🔁 FAQ: claves recalculadas con la normalización {self.version_normalizacion} "
+              f"({len(filas)} -> {len(nuevas)} preguntas)")
+
+    def _fila(self, pregunta, respuesta, respuesta_html=None):
+        if respuesta_html is None:
+            respuesta_html = respuesta
+        return (self.normalizar(pregunta), pregunta, respuesta, time.time(), respuesta_html)
+
+    def _escribir(self, filas):
+        conexion = self._conexion()
+        with conexion:
+            # BEGIN IMMEDIATE toma el lock de escritura antes de leer la última
+            # secuencia: ningún otro worker puede confirmar entre la lectura y el commit
+            conexion.execute("BEGIN IMMEDIATE")
+            ultima = conexion.execute("SELECT COALESCE(MAX(secuencia), 0) FROM faq").fetchone()[0]
+            conexion.executemany(
+                "INSERT INTO faq (clave, pregunta, respuesta, actualizado, respuesta_html, secuencia) "
+                "VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(clave) DO UPDATE SET pregunta = excluded.pregunta, "
+                "respuesta = excluded.respuesta, actualizado = excluded.actualizado, "
+                "respuesta_html = excluded.respuesta_html, secuencia = excluded.secuencia",
+                [fila + (ultima + numero,) for numero, fila in enumerate(filas, 1)]
+            )
+
+    def reiniciar_tras_fork(self):
+        """
+        En el proceso hijo de un fork (gunicorn --preload): los locks pudieron
+        copiarse tomados por un hilo que en el hijo no existe, y una conexión
+        SQLite no se comparte entre procesos. Se recrean; el hilo escritor se
+        vuelve a lanzar con la siguiente escritura (la cola del padre es suya).
+        """
+        self._cola = queue.Queue()
+        self._local = threading.local()
+        self._lock_inicio = threading.Lock()
+        self._hilo_escritor = None
+
+    # --- Escritura en segundo plano ---
+
+    def _iniciar_escritor(self):
+        with self._lock_inicio:
+            if self._hilo_escritor and self._hilo_escritor.is_alive():
+                return
+            self._hilo_escritor = threading.Thread(target=self._bucle_escritor, name="faq-escritor", daemon=True)
+            self._hilo_escritor.start()
+
+    def _bucle_escritor(self):
+        while True:
+            lote = [self._cola.get()]
+            limite = time.monotonic() + INTERVALO_ESCRITURA
+            while len(lote) < MAX_LOTE:
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    break
+                try:
+                    lote.append(self._cola.get(timeout=restante))
+                except queue.Empty:
+                    break
+
+            # Fusionar escrituras a la misma pregunta: gana la última
+            fusionadas = {}
+            for fila in lote:
+                fusionadas[fila[0]] = fila
+            try:
+                self._escribir(list(fusionadas.values()))
+            except Exception as e:
+                print(f"❌ Error guardando FAQ: {e}")
+            finally:
+                for _ in lote:
+                    self._cola.task_done()
+
+    # --- API pública ---
+
+    def upsert(self, pregunta, respuesta, respuesta_html=None):
+        """
+        Encola la pregunta/respuesta; la escribe el hilo de fondo. Sin
+        `respuesta_html`, la respuesta se toma como HTML ya formateado.
+        """
+        self._inicializar()
+        self._iniciar_escritor()
+        self._cola.put(self._fila(pregunta, respuesta, respuesta_html))
+
+    def vaciar_cola(self):
+        """Espera a que todas las escrituras pendientes estén en disco."""
+        if self._hilo_escritor and self._hilo_escritor.is_alive():
+            self._cola.join()
+
+    def todas(self):
+        """Lista de (pregunta, respuesta HTML) en orden de inserción."""
+        self._inicializar()
+        return self._conexion().execute(
+            "SELECT pregunta, respuesta_html FROM faq ORDER BY rowid"
+        ).fetchall()
+
+    def estado(self):
+        """(filas, secuencia de la última escritura confirmada): identifica una versión de la FAQ."""
+        self._inicializar()
+        filas, marca = self._conexion().execute("SELECT COUNT(*), MAX(secuencia) FROM faq").fetchone()
+        return filas, marca or 0
+
+    def modificadas_desde(self, marca):
+        """(pregunta, respuesta HTML) con secuencia mayor que `marca`, de la más vieja a la más nueva."""
+        self._inicializar()
+        return self._conexion().execute(
+            "SELECT pregunta, respuesta_html FROM faq WHERE secuencia > ? ORDER BY secuencia, rowid", (marca,)
+        ).fetchall()
+
+    def importar_csv(self, ruta):
+        """
+        Carga un CSV con columnas Pregunta,Respuesta (las filas posteriores
+        ganan). Las respuestas de faq.csv ya están en HTML.
+        """
+        with open(ruta, newline='', encoding='utf-8') as f:
+            filas = [self._fila(r['Pregunta'], r['Respuesta'])
+                     for r in csv.DictReader(f) if r.get('Pregunta') and r.get('Respuesta')]
+        self._escribir(filas)
+        return len(filas)
+
+    def exportar_csv(self, destino=None):
+        """Escribe la FAQ en formato faq.csv; sin destino, retorna el texto."""
+        self.vaciar_cola()
+        salida = io.StringIO() if destino is None else open(destino, 'w', newline='', encoding='utf-8')
+        try:
+            writer = csv.writer(salida)
+            writer.writerow(['Pregunta', 'Respuesta'])
+            writer.writerows(self.todas())
+            if destino is None:
+                return salida.getvalue()
+        finally:
+            if destino is not None:
+                salida.close()
+
+# Instancia compartida por el chat (escrituras) y el KNN (carga inicial)
+almacen_faq = AlmacenFAQ()
+
+# No perder escrituras encoladas al apagar el servidor
+atexit.register(almacen_faq.vaciar_cola)
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=almacen_faq.reiniciar_tras_fork)
@@ -0,0 +1,99 @@
+import os
+import json
+import hashlib
+import threading
+from langchain_core.documents import Document
+
+# --- CONFIGURACIÓN ---
+DATA_DIR = os.path.dirname(os.path.abspath(__file__))
+# Se guarda junto a registry.json
+RUTA_CACHE_PDFS = os.path.join(DATA_DIR, 'pdf_cache.json')
+
+def _normalizar_ruta(path):
+    # El registry puede traer rutas con separador de Windows
+    return (path or '').replace('\\', '/')
+
+def _sha256_archivo(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for bloque in iter(lambda: f.read(1 << 20), b''):
+            h.update(bloque)
+    return h.hexdigest()
+
+class CachePDFs:
+    """
+    Texto extraído de los PDFs, para no volver a parsear archivos sin cambios.
+
+    - 'indice': ruta -> {size, mtime, sha256}. Si tamaño y fecha coinciden,
+      ni siquiera se lee el archivo.
+    - 'archivos': sha256 -> páginas. Un PDF renombrado (edit_pdf) conserva su
+      contenido, así que se encuentra por hash sin re-parsear.
+    """
+
+    def __init__(self, ruta=RUTA_CACHE_PDFS):
+        self.ruta = ruta
+        self._lock = threading.Lock()
+        self._datos = None
+
+    def _cargar(self):
+        if self._datos is None:
+            try:
+                with open(self.ruta, 'r', encoding='utf-8') as f:
+                    self._datos = json.load(f)
+            except (FileNotFoundError, json.JSONDecodeError):
+                self._datos = {}
+            self._datos.setdefault('indice', {})
+            self._datos.setdefault('archivos', {})
+        return self._datos
+
+    def _hash_vigente(self, path):
+        """sha256 del archivo, usando tamaño + mtime para evitar leerlo si no cambió."""
+        st = os.stat(path)
+        entrada = self._cargar()['indice'].get(path)
+        if entrada and entrada['size'] == st.st_size and entrada['mtime'] == st.st_mtime_ns:
+            return entrada['sha256'], st
+        return _sha256_archivo(path), st
+
+    def obtener(self, path):
+        """Páginas del PDF como Documents, o None si hay que parsearlo."""
+        path = _normalizar_ruta(path)
+        if not os.path.exists(path):
+            return None
+        with self._lock:
+            sha, st = self._hash_vigente(path)
+            paginas = self._cargar()['archivos'].get(sha)
+            if paginas is None:
+                return None
+            self._datos['indice'][path] = {'size': st.st_size, 'mtime': st.st_mtime_ns, 'sha256': sha}
+        return [Document(page_content=p['page_content'], metadata={**p['metadata'], 'source': path})
+                for p in paginas]
+
+    def guardar(self, path, documentos):
+        """Registra las páginas recién parseadas de un PDF."""
+        path = _normalizar_ruta(path)
+        with self._lock:
+            sha, st = self._hash_vigente(path)
+            datos = self._cargar()
+            datos['archivos'][sha] = [
+                {'page_content': d.page_content,
+                 'metadata': {k: v for k, v in d.metadata.items()
+                              if isinstance(v, (str, int, float, bool)) or v is None}}
+                for d in documentos
+            ]
+            datos['indice'][path] = {'size': st.st_size, 'mtime': st.st_mtime_ns, 'sha256': sha}
+
+    def persistir(self):
+        """Escribe el caché a disco, descartando archivos que ya no existen."""
+        with self._lock:
+            datos = self._cargar()
+            datos['indice'] = {p: e for p, e in datos['indice'].items() if os.path.exists(p)}
+            vigentes = {e['sha256'] for e in datos['indice'].values()}
+            datos['archivos'] = {sha: p for sha, p in datos['archivos'].items() if sha in vigentes}
+
+            temporal = f"{self.ruta}.tmp"
+            with open(temporal, 'w', encoding='utf-8') as f:
+                json.dump(datos, f, ensure_ascii=False)
+            os.replace(temporal, self.ruta)
+
+# Instancia compartida por los entrenamientos
+cache_pdfs = CachePDFs()
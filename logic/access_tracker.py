@@ -1,22 +1,467 @@
 import os
+import io
 import csv
-import pandas as pd
+import json
+import queue
+import threading
+import time
+import atexit
 from datetime import datetime
+from itertools import groupby
+import pandas as pd
+
+from logic.cache_lru import CacheLRU
+from logic.bloqueo_archivo import BloqueoArchivo
+from logic.segmentos_accesos import (
+    archivar_segmento, listar_segmentos, leer_metadatos, leer_filas, leer_dataframe
+)
 
 # Definir ruta del archivo CSV
 current_dir = os.path.dirname(os.path.abspath(__file__))
 project_root = os.path.dirname(current_dir)
 DATA_DIR = os.path.join(project_root, 'data')
 CSV_FILE = os.path.join(DATA_DIR, 'access_log.csv')
+# Conteos agregados; se mantienen al escribir, así el dashboard no relee el CSV
+RESUMEN_FILE = os.path.join(DATA_DIR, 'access_stats.json')
+# Segmentos viejos del registro, compactados (ver logic/segmentos_accesos.py)
+SEGMENTOS_DIR = os.path.join(DATA_DIR, 'access_logs')
 
-def registrar_acceso(programa, ip, dispositivo):
+CABECERAS = ['Dia', 'Fecha', 'Hora', 'Programa', 'Dispositivo', 'IP']
+
+# --- CONFIGURACIÓN DEL BUFFER ---
+# Se escribe al juntar TAMANO_LOTE accesos o cada INTERVALO_VACIADO segundos
+TAMANO_LOTE = int(os.getenv("ACCESS_LOG_BATCH", 500))
+INTERVALO_VACIADO = float(os.getenv("ACCESS_LOG_FLUSH_SECONDS", 2.0))
+# Accesos en espera como máximo; si el disco no da abasto se descartan (y se cuentan)
+MAX_COLA = int(os.getenv("ACCESS_LOG_MAX_QUEUE", 50000))
+
+# --- ROTACIÓN ---
+# El CSV activo se archiva al cambiar de día o al pasar de este tamaño
+MAX_MB_SEGMENTO = float(os.getenv("ACCESS_LOG_MAX_MB", 16))
+# Segmentos archivados que se conservan descomprimidos en memoria para paginar
+SEGMENTOS_EN_MEMORIA = 4
+# Nombre del segmento activo en los cursores ("actual:<offset>")
+SEGMENTO_ACTUAL = 'actual'
+EXT_PENDIENTE = '.pendiente.csv'
+
+# Bloque de lectura al recorrer el CSV desde el final
+TAMANO_BLOQUE_LECTURA = 64 * 1024
+# Filas que revisa como máximo una página (acota el costo con filtros muy selectivos)
+MAX_FILAS_REVISADAS_POR_PAGINA = 100000
+
+def clasificar_dispositivo(user_agent):
+    """Clase de dispositivo a partir del User-Agent (para las estadísticas)."""
+    ua = (user_agent or '').lower()
+    if not ua:
+        return 'Desconocido'
+    if 'ipad' in ua or 'tablet' in ua or ('android' in ua and 'mobile' not in ua):
+        return 'Tablet'
+    if 'mobi' in ua or 'iphone' in ua or 'android' in ua:
+        return 'Móvil'
+    if 'bot' in ua or 'spider' in ua or 'crawl' in ua:
+        return 'Bot'
+    return 'Escritorio'
+
+def resumen_vacio():
+    return {
+        "total": 0,
+        "por_programa": {},
+        "por_dia": {},
+        "por_hora": {},
+        "por_dispositivo": {},
+        # Bytes del CSV activo ya contabilizados (permite ponerse al día tras un reinicio)
+        "offset": 0,
+        # Registros del CSV activo hasta `offset` (ubica un cursor si el CSV se archiva)
+        "filas_activo": 0,
+        # Segmentos archivados incluidos en los conteos
+        "segmentos": [],
+    }
+
+def _sumar_fila(resumen, fila):
+    """Suma la fila a los conteos; retorna False si no es un registro (cabecera o incompleta)."""
+    if len(fila) < 6 or fila == CABECERAS:
+        return False
+    _, fecha, hora, programa, dispositivo, _ = fila[:6]
+    resumen["total"] += 1
+    for campo, clave in (("por_programa", programa),
+                         ("por_dia", fecha),
+                         ("por_hora", hora[:2]),
+                         ("por_dispositivo", clasificar_dispositivo(dispositivo))):
+        conteos = resumen[campo]
+        conteos[clave] = conteos.get(clave, 0) + 1
+    return True
+
+class RegistradorAccesos:
     """
-    Guarda el registro de acceso en el CSV.
+    Registro de accesos con buffer: la petición solo encola la fila y un hilo
+    de fondo la escribe al CSV en lotes, con un solo open() por lote.
+    La cola es acotada; si se llena, el acceso se descarta y se cuenta en
+    `descartados` en lugar de frenar la petición.
+
+    El CSV activo rota cada día (o al pasar de MAX_MB_SEGMENTO) y el anterior
+    se compacta como segmento en `directorio_segmentos`.
+
+    Varios workers pueden compartir el CSV: la escritura, el resumen y la
+    rotación van bajo un lock de archivo ('<csv>.lock'), y el resumen se
+    relee de disco cada vez en lugar de confiar en la copia de este proceso.
     """
-    if not os.path.exists(DATA_DIR):
-        os.makedirs(DATA_DIR)
 
-    archivo_existe = os.path.exists(CSV_FILE)
+    def __init__(self, ruta_csv=CSV_FILE, ruta_resumen=RESUMEN_FILE, tamano_lote=TAMANO_LOTE,
+                 intervalo=INTERVALO_VACIADO, max_cola=MAX_COLA,
+                 directorio_segmentos=SEGMENTOS_DIR, max_mb_segmento=MAX_MB_SEGMENTO):
+        self.ruta_csv = ruta_csv
+        self.ruta_resumen = ruta_resumen
+        self.directorio_segmentos = directorio_segmentos
+        self.max_bytes_segmento = int(max_mb_segmento * 1024 * 1024)
+        self.tamano_lote = tamano_lote
+        self.intervalo = intervalo
+        self._cola = queue.Queue(maxsize=max_cola)
+        self._lock = threading.Lock()
+        # Serializa escritura al CSV y actualización del resumen (entre procesos)
+        self._lock_archivo = BloqueoArchivo(f"{ruta_csv}.lock")
+        self._filas_segmentos = CacheLRU(max_elementos=SEGMENTOS_EN_MEMORIA)
+        self._hilo = None
+        self.descartados = 0
+        self.escritos = 0
+
+    def _iniciar_hilo(self):
+        with self._lock:
+            if self._hilo and self._hilo.is_alive():
+                return
+            self._hilo = threading.Thread(target=self._bucle, name="registro-accesos", daemon=True)
+            self._hilo.start()
+
+    def _bucle(self):
+        while True:
+            lote = [self._cola.get()]
+            limite = time.monotonic() + self.intervalo
+            while len(lote) < self.tamano_lote:
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    break
+                try:
+                    lote.append(self._cola.get(timeout=restante))
+                except queue.Empty:
+                    break
+            try:
+                self._escribir(lote)
+            except Exception as e:
+                print(f"❌ Error registrando {len(lote)} accesos: {e}")
+            finally:
+                for _ in lote:
+                    self._cola.task_done()
+
+    def _escribir(self, filas):
+        with self._lock_archivo:
+            resumen = self._cargar_resumen()
+            os.makedirs(os.path.dirname(self.ruta_csv), exist_ok=True)
+            # Un lote puede cruzar la medianoche: cada día va a su propio segmento
+            for fecha, grupo in groupby(filas, key=lambda fila: fila[1]):
+                grupo = list(grupo)
+                if self._debe_rotar(fecha):
+                    self._rotar(resumen)
+                archivo_existe = os.path.exists(self.ruta_csv)
+                with open(self.ruta_csv, mode='a', newline='', encoding='utf-8') as f:
+                    writer = csv.writer(f)
+                    if not archivo_existe:
+                        writer.writerow(CABECERAS)
+                    writer.writerows(grupo)
+                    fin = f.tell()
+                for fila in grupo:
+                    if _sumar_fila(resumen, fila):
+                        resumen["filas_activo"] += 1
+                resumen["offset"] = fin
+            self._persistir_resumen(resumen)
+            self.escritos += len(filas)
+
+    # --- Rotación de segmentos ---
+
+    def _leer_fecha_activa(self):
+        """
+        Fecha del primer registro del CSV activo (None si no hay registros).
+        Se lee del archivo cada vez: otro worker pudo rotarlo.
+        """
+        try:
+            with open(self.ruta_csv, newline='', encoding='utf-8') as f:
+                for fila in csv.reader(f):
+                    if len(fila) >= 6 and fila != CABECERAS:
+                        return fila[1]
+        except FileNotFoundError:
+            pass
+        return None
+
+    def _debe_rotar(self, fecha):
+        """Con _lock_archivo tomado: ningún otro worker puede rotar entre esta revisión y _rotar()."""
+        if not os.path.exists(self.ruta_csv):
+            return False
+        fecha_activa = self._leer_fecha_activa()
+        if fecha_activa is None:
+            return False
+        return fecha_activa != fecha or os.path.getsize(self.ruta_csv) >= self.max_bytes_segmento
+
+    def _rotar(self, resumen):
+        """
+        Archiva el CSV activo como segmento y deja el activo vacío. Con
+        _lock_archivo tomado (otro worker pudo haberlo rotado ya).
+        """
+        if not os.path.exists(self.ruta_csv):
+            return
+        os.makedirs(self.directorio_segmentos, exist_ok=True)
+        base = os.path.join(self.directorio_segmentos, f"accesos_{datetime.now():%Y%m%d_%H%M%S_%f}")
+        # Primero se aparta el CSV (rename atómico); si el proceso cae a mitad,
+        # _completar_rotaciones() termina el trabajo al arrancar
+        pendiente = f"{base}{EXT_PENDIENTE}"
+        os.replace(self.ruta_csv, pendiente)
+        self._completar_rotacion(pendiente)
+        resumen["offset"] = 0
+        resumen["filas_activo"] = 0
+        resumen["segmentos"] = [os.path.basename(b) for b in listar_segmentos(self.directorio_segmentos)]
+        self._persistir_resumen(resumen)
+        print(f"🗄️ Registro de accesos archivado en {os.path.basename(base)}")
+
+    def _completar_rotacion(self, pendiente):
+        archivar_segmento(pendiente, pendiente[:-len(EXT_PENDIENTE)])
+        os.remove(pendiente)
+
+    def _completar_rotaciones(self):
+        if not os.path.isdir(self.directorio_segmentos):
+            return
+        for nombre in sorted(os.listdir(self.directorio_segmentos)):
+            if nombre.endswith(EXT_PENDIENTE):
+                print(f"🗄️ Completando archivado interrumpido: {nombre}")
+                self._completar_rotacion(os.path.join(self.directorio_segmentos, nombre))
+
+    # --- Resumen agregado ---
+
+    def _cargar_resumen(self):
+        """
+        Resumen leído de disco y puesto al día con el CSV: cuenta los bytes
+        entre el offset guardado y el final del archivo. Se llama con
+        _lock_archivo tomado.
+        """
+        try:
+            with open(self.ruta_resumen, 'r', encoding='utf-8') as f:
+                guardado = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            guardado = {}
+        resumen = {**resumen_vacio(), **guardado}
+
+        self._completar_rotaciones()
+        segmentos = [os.path.basename(b) for b in listar_segmentos(self.directorio_segmentos)]
+        tamano = os.path.getsize(self.ruta_csv) if os.path.exists(self.ruta_csv) else 0
+        if tamano < resumen["offset"] or segmentos != resumen["segmentos"] or "filas_activo" not in guardado:
+            # El CSV fue reemplazado, cambió el conjunto de segmentos o el resumen es de una
+            # versión anterior: se recalcula desde cero
+            resumen = resumen_vacio()
+            for nombre in segmentos:
+                for fila in leer_filas(os.path.join(self.directorio_segmentos, nombre)):
+                    _sumar_fila(resumen, fila)
+            resumen["segmentos"] = segmentos
+            if not tamano:
+                self._persistir_resumen(resumen)
+        if tamano > resumen["offset"]:
+            # Filas escritas sin contabilizar (CSV previo a este resumen o apagado abrupto)
+            with open(self.ruta_csv, 'rb') as f:
+                f.seek(resumen["offset"])
+                pendiente = f.read(tamano - resumen["offset"])
+            for fila in csv.reader(io.StringIO(pendiente.decode('utf-8', errors='replace'))):
+                if _sumar_fila(resumen, fila):
+                    resumen["filas_activo"] += 1
+            resumen["offset"] = tamano
+            self._persistir_resumen(resumen)
+            print(f"📊 Estadísticas de acceso recalculadas: {resumen['total']} registros")
+        return resumen
+
+    def _persistir_resumen(self, resumen):
+        temporal = f"{self.ruta_resumen}.tmp"
+        with open(temporal, 'w', encoding='utf-8') as f:
+            json.dump(resumen, f, ensure_ascii=False)
+        os.replace(temporal, self.ruta_resumen)
+
+    def resumen(self):
+        """Conteos agregados de todos los workers (el CSV solo se lee si quedó algo sin contar)."""
+        with self._lock_archivo:
+            return self._cargar_resumen()
+
+    # --- Lectura paginada (desde el final, a través de los segmentos) ---
+
+    def _recorrer_activo(self, fin):
+        """(fila, offset) del CSV activo, de la última a la primera, leyendo en bloques desde `fin`."""
+        if not os.path.exists(self.ruta_csv):
+            return
+        with open(self.ruta_csv, 'rb') as f:
+            posicion = min(fin, os.path.getsize(self.ruta_csv))
+            resto = b''
+            while posicion > 0:
+                inicio = max(0, posicion - TAMANO_BLOQUE_LECTURA)
+                f.seek(inicio)
+                bloque = f.read(posicion - inicio) + resto
+                lineas = bloque.split(b'\n')
+                # La primera línea puede estar cortada; se completa con el siguiente bloque
+                resto = lineas.pop(0) if inicio > 0 else b''
+                # Offset donde empieza cada línea del bloque
+                desplazamiento = inicio + len(resto) + (1 if inicio > 0 else 0)
+                inicios = []
+                for linea in lineas:
+                    inicios.append(desplazamiento)
+                    desplazamiento += len(linea) + 1
+                for linea, offset_linea in zip(reversed(lineas), reversed(inicios)):
+                    if not linea.strip():
+                        continue
+                    fila = next(csv.reader([linea.decode('utf-8', errors='replace')]), [])
+                    if fila == CABECERAS or len(fila) < 6:
+                        continue
+                    yield fila, offset_linea
+                posicion = inicio
+
+    def _recorrer_segmento(self, nombre, fin):
+        """(fila, índice) de un segmento archivado, de la última a la primera."""
+        filas = self._filas_segmentos.obtener(nombre)
+        if filas is None:
+            filas = leer_filas(os.path.join(self.directorio_segmentos, nombre))
+            self._filas_segmentos.guardar(nombre, filas)
+        for i in range(min(len(filas), len(filas) if fin is None else fin) - 1, -1, -1):
+            yield filas[i], i
+
+    def leer_registros(self, limite=50, cursor=None, desde=None, hasta=None, programa=None):
+        """
+        Hasta `limite` registros, del más nuevo al más viejo: primero el CSV
+        activo (leído desde el final en bloques) y luego los segmentos
+        archivados. `cursor` tiene la forma "segmento:posición" y marca dónde
+        termina la página (None = lo más reciente). Retorna
+        (registros, siguiente_cursor); siguiente_cursor es None cuando ya no
+        hay registros más viejos.
+
+        Un cursor del CSV activo ("actual:offset:fila:segmentos") recuerda
+        también el número de registro y cuántos segmentos había: si el CSV se
+        archivó entre una página y otra, se sigue en el segmento en que se
+        convirtió, en el mismo registro.
+
+        Filtros opcionales: `desde`/`hasta` (fechas 'YYYY-MM-DD', inclusivas) y
+        `programa`. El registro está en orden cronológico, así que al pasar de
+        `desde` se deja de leer. Cada página revisa como mucho
+        MAX_FILAS_REVISADAS_POR_PAGINA filas; con filtros muy selectivos puede
+        volver con menos registros y un cursor.
+        """
+        estado = self.resumen()
+        generacion = len(estado["segmentos"])
+        segmentos = [SEGMENTO_ACTUAL] + list(reversed(estado["segmentos"]))
+        # Registros del CSV activo antes de `posicion` (None si el cursor no lo dice)
+        filas_antes = None
+        if cursor is None:
+            nombre, posicion, filas_antes = SEGMENTO_ACTUAL, estado["offset"], estado["filas_activo"]
+        else:
+            partes = str(cursor).split(':')
+            try:
+                # Cursores viejos (solo el offset) apuntan al CSV activo
+                nombre = (partes[0] if len(partes) > 1 else '') or SEGMENTO_ACTUAL
+                posicion = int(partes[-1] if len(partes) < 3 else partes[1]) if partes[-1] else None
+                if nombre == SEGMENTO_ACTUAL and len(partes) == 4:
+                    filas_antes, generacion_cursor = int(partes[2]), int(partes[3])
+                    if generacion_cursor < generacion:
+                        # Ese CSV activo ya se archivó: es el segmento que se agregó después
+                        nombre, posicion = estado["segmentos"][generacion_cursor], filas_antes
+            except (ValueError, IndexError):
+                raise ValueError(f"Cursor inválido: {cursor}")
+            if nombre not in segmentos:
+                raise ValueError(f"Cursor inválido: {cursor}")
+
+        registros = []
+        revisadas = 0
+        pendientes = segmentos[segmentos.index(nombre):]
+        for n, nombre in enumerate(pendientes):
+            if nombre == SEGMENTO_ACTUAL:
+                filas = self._recorrer_activo(estado["offset"] if posicion is None else posicion)
+            else:
+                metadatos = leer_metadatos(os.path.join(self.directorio_segmentos, nombre))
+                if desde and metadatos["hasta"] and metadatos["hasta"] < desde:
+                    return registros, None
+                if hasta and metadatos["desde"] and metadatos["desde"] > hasta:
+                    posicion = None
+                    continue
+                filas = self._recorrer_segmento(nombre, posicion)
+
+            for fila, pos in filas:
+                revisadas += 1
+                if nombre == SEGMENTO_ACTUAL and filas_antes is not None:
+                    filas_antes -= 1
+                registro = dict(zip(CABECERAS, fila))
+                if desde and registro['Fecha'] < desde:
+                    # Todo lo anterior es más viejo: no hay más páginas
+                    return registros, None
+                if not (hasta and registro['Fecha'] > hasta) and not (programa and registro['Programa'] != programa):
+                    registros.append(registro)
+                if len(registros) >= limite or revisadas >= MAX_FILAS_REVISADAS_POR_PAGINA:
+                    if pos > 0:
+                        if nombre == SEGMENTO_ACTUAL and filas_antes is not None:
+                            return registros, f"{nombre}:{pos}:{filas_antes}:{generacion}"
+                        return registros, f"{nombre}:{pos}"
+                    siguiente = pendientes[n + 1] if n + 1 < len(pendientes) else None
+                    return registros, (f"{siguiente}:" if siguiente else None)
+            posicion = None
+        return registros, None
+
+    def leer_dataframe(self, desde=None, hasta=None):
+        """
+        Todo el registro (segmentos + CSV activo) como DataFrame, sin la columna
+        'Dia'. Los segmentos fuera del rango de fechas no se leen.
+        """
+        self.vaciar()
+        partes = []
+        for base in listar_segmentos(self.directorio_segmentos):
+            metadatos = leer_metadatos(base)
+            if (desde and metadatos["hasta"] and metadatos["hasta"] < desde) or \
+               (hasta and metadatos["desde"] and metadatos["desde"] > hasta):
+                continue
+            partes.append(leer_dataframe(base))
+        if os.path.exists(self.ruta_csv):
+            activo = pd.read_csv(self.ruta_csv, dtype=str, keep_default_na=False)
+            partes.append(activo.drop(columns=['Dia'], errors='ignore'))
+        if not partes:
+            return pd.DataFrame(columns=CABECERAS[1:])
+
+        df = pd.concat(partes, ignore_index=True)
+        for columna in ('Programa', 'Dispositivo'):
+            df[columna] = df[columna].astype('category')
+        if desde:
+            df = df[df['Fecha'] >= desde]
+        if hasta:
+            df = df[df['Fecha'] <= hasta]
+        return df.reset_index(drop=True)
+
+    def registrar(self, fila):
+        """Encola una fila; retorna False si la cola estaba llena y se descartó."""
+        self._iniciar_hilo()
+        try:
+            self._cola.put_nowait(fila)
+            return True
+        except queue.Full:
+            with self._lock:
+                self.descartados += 1
+            return False
+
+    def vaciar(self):
+        """Espera a que todo lo encolado esté escrito en disco."""
+        if self._hilo and self._hilo.is_alive():
+            self._cola.join()
+
+    def estado(self):
+        return {
+            "pendientes": self._cola.qsize(),
+            "escritos": self.escritos,
+            "descartados": self.descartados,
+        }
+
+# Instancia compartida del proceso
+registrador = RegistradorAccesos()
+
+# Al apagar el servidor se escribe lo que quede en la cola
+atexit.register(registrador.vaciar)
+
+def registrar_acceso(programa, ip, dispositivo):
+    """
+    Encola el registro de acceso; se escribe al CSV en segundo plano.
+    """
     ahora = datetime.now()
     
     datos = [
@@ -28,55 +473,26 @@ def registrar_acceso(programa, ip, dispositivo):
         ip                              # IP
     ]
     
-    cabeceras = ['Dia', 'Fecha', 'Hora', 'Programa', 'Dispositivo', 'IP']
-
-    try:
-        with open(CSV_FILE, mode='a', newline='', encoding='utf-8') as f:
-            writer = csv.writer(f)
-            if not archivo_existe:
-                writer.writerow(cabeceras)
-            writer.writerow(datos)
-        print(f"✅ Acceso registrado: {programa}")
-        return True
-    except Exception as e:
-        print(f"❌ Error registrando acceso: {e}")
-        return False
+    return registrador.registrar(datos)
 
 def obtener_estadisticas_diarias():
-    """Devuelve el conteo para las gráficas."""
-    if not os.path.exists(CSV_FILE):
-        return {}
+    """Devuelve el conteo por programa para las gráficas (de mayor a menor)."""
     try:
-        df = pd.read_csv(CSV_FILE)
-        if df.empty: return {}
-        return df['Programa'].value_counts().to_dict()
+        conteos = registrador.resumen()["por_programa"]
+        return dict(sorted(conteos.items(), key=lambda par: par[1], reverse=True))
     except Exception as e:
+        print(f"❌ Error leyendo estadísticas de acceso: {e}")
         return {}
 
-def obtener_todos_los_registros():
-    """
-    Lee el CSV completo y lo devuelve como una lista de diccionarios
-    para mostrar en la tabla detallada.
-    """
-    if not os.path.exists(CSV_FILE):
-        return []
-        
-    try:
-        # Leemos el CSV
-        df = pd.read_csv(CSV_FILE)
-        
-        # Ordenamos por fecha y hora descendente (lo más nuevo primero)
-        # Si da error al ordenar (por formatos), simplemente lo devolvemos tal cual
-        try:
-            df = df.sort_values(by=['Fecha', 'Hora'], ascending=False)
-        except:
-            pass
-            
-        # Reemplazamos valores vacíos (NaN) por texto vacío para que no rompa el HTML
-        df = df.fillna('')
-        
-        # Convertimos a lista de diccionarios
-        return df.to_dict('records')
-    except Exception as e:
-        print(f"❌ Error leyendo registros detallados: {e}")
-        return []
\ No newline at end of file
+def obtener_resumen_accesos():
+    """Conteos agregados completos: total, por programa, día, hora y tipo de dispositivo."""
+    return registrador.resumen()
+
+def obtener_registros_paginados(limite=50, cursor=None, desde=None, hasta=None, programa=None):
+    """Una página del registro detallado (lo más nuevo primero) y el cursor de la siguiente."""
+    return registrador.leer_registros(limite=limite, cursor=cursor,
+                                      desde=desde, hasta=hasta, programa=programa)
+
+def obtener_dataframe_accesos(desde=None, hasta=None):
+    """Registro histórico completo (todos los segmentos) como DataFrame de pandas."""
+    return registrador.leer_dataframe(desde=desde, hasta=hasta)
@@ -0,0 +1,64 @@
+# --- bloqueo_archivo.py ---
+import os
+import time
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+class BloqueoArchivo:
+    """
+    Lock exclusivo entre procesos sobre un archivo auxiliar (p. ej.
+    'access_log.csv.lock'): los workers de gunicorn que comparten un archivo
+    se turnan con él. También excluye a los hilos del mismo proceso.
+    No es reentrante.
+
+        with bloqueo:
+            ...
+    """
+
+    def __init__(self, ruta):
+        self.ruta = ruta
+        self._lock_hilos = threading.Lock()
+        self._archivo = None
+
+    def __enter__(self):
+        self._lock_hilos.acquire()
+        try:
+            os.makedirs(os.path.dirname(self.ruta) or '.', exist_ok=True)
+            archivo = open(self.ruta, 'a+b')
+            try:
+                if fcntl is not None:
+                    fcntl.flock(archivo.fileno(), fcntl.LOCK_EX)
+                else:
+                    archivo.seek(0)
+                    while True:
+                        try:
+                            msvcrt.locking(archivo.fileno(), msvcrt.LK_LOCK, 1)
+                            break
+                        except OSError:
+                            # LK_LOCK se rinde tras ~10 s: se vuelve a intentar
+                            time.sleep(0.1)
+            except BaseException:
+                archivo.close()
+                raise
+            self._archivo = archivo
+        except BaseException:
+            self._lock_hilos.release()
+            raise
+        return self
+
+    def __exit__(self, *exc):
+        archivo, self._archivo = self._archivo, None
+        try:
+            if fcntl is not None:
+                fcntl.flock(archivo.fileno(), fcntl.LOCK_UN)
+            else:
+                archivo.seek(0)
+                msvcrt.locking(archivo.fileno(), msvcrt.LK_UNLCK, 1)
+        finally:
+            archivo.close()
+            self._lock_hilos.release()
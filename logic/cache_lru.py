@@ -0,0 +1,52 @@
+# --- cache_lru.py ---
+import threading
+import time
+from collections import OrderedDict
+
+_FALTANTE = object()
+
+class CacheLRU:
+    """
+    Caché en memoria acotado (LRU), seguro entre hilos.
+    Si se indica `ttl` (segundos), las entradas también expiran por antigüedad;
+    con `renovar_ttl=True` el plazo cuenta desde el último acceso (inactividad).
+    """
+
+    def __init__(self, max_elementos=1024, ttl=None, renovar_ttl=False):
+        self.max_elementos = max_elementos
+        self.ttl = ttl
+        self.renovar_ttl = renovar_ttl
+        self._datos = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._datos)
+
+    def obtener(self, clave, defecto=None):
+        with self._lock:
+            entrada = self._datos.get(clave, _FALTANTE)
+            if entrada is _FALTANTE:
+                return defecto
+            valor, creado = entrada
+            if self.ttl is not None and time.monotonic() - creado > self.ttl:
+                del self._datos[clave]
+                return defecto
+            if self.renovar_ttl:
+                self._datos[clave] = (valor, time.monotonic())
+            self._datos.move_to_end(clave)
+            return valor
+
+    def guardar(self, clave, valor):
+        with self._lock:
+            self._datos[clave] = (valor, time.monotonic())
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.max_elementos:
+                self._datos.popitem(last=False)
+
+    def eliminar(self, clave):
+        with self._lock:
+            self._datos.pop(clave, None)
+
+    def limpiar(self):
+        with self._lock:
+            self._datos.clear()
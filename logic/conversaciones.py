@@ -0,0 +1,118 @@
+# --- conversaciones.py ---
+import os
+import copy
+import json
+import sqlite3
+import threading
+import time
+
+from logic.cache_lru import CacheLRU
+
+# --- CONFIGURACIÓN ---
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+RUTA_DB_CONVERSACIONES = os.path.join(project_root, 'data', 'conversaciones.sqlite3')
+
+# 'memoria' (por proceso) o 'sqlite' (compartido entre workers del mismo servidor)
+BACKEND_CONVERSACIONES = os.getenv("CONVERSACIONES_BACKEND", "memoria")
+MAX_SESIONES = 5000
+TTL_INACTIVIDAD = 2 * 60 * 60   # segundos sin actividad antes de descartar la sesión
+MAX_MENSAJES_SESION = 20        # el prompt solo usa los últimos 5
+
+def estado_vacio():
+    return {"historial": [], "ultima_pregunta": ""}
+
+class BackendMemoria:
+    """
+    Sesiones en memoria del proceso, con desalojo LRU y expiración por inactividad.
+    Como en SQLite, se entregan y se guardan copias: los cambios de una
+    petición solo cuentan si llega a guardar() (una respuesta fallida no deja
+    la conversación a medias).
+    """
+
+    def __init__(self, max_sesiones=MAX_SESIONES, ttl=TTL_INACTIVIDAD):
+        self._cache = CacheLRU(max_elementos=max_sesiones, ttl=ttl, renovar_ttl=True)
+
+    def obtener(self, id_sesion):
+        return copy.deepcopy(self._cache.obtener(id_sesion))
+
+    def guardar(self, id_sesion, estado):
+        self._cache.guardar(id_sesion, copy.deepcopy(estado))
+
+    def eliminar(self, id_sesion):
+        self._cache.eliminar(id_sesion)
+
+class BackendSQLite:
+    """Sesiones en un archivo SQLite local, visibles para todos los workers."""
+
+    def __init__(self, ruta=RUTA_DB_CONVERSACIONES, ttl=TTL_INACTIVIDAD):
+        self.ruta = ruta
+        self.ttl = ttl
+        self._local = threading.local()
+        self._ultima_purga = 0.0
+
+    def _conexion(self):
+        conexion = getattr(self._local, 'conexion', None)
+        if conexion is None:
+            conexion = sqlite3.connect(self.ruta, timeout=30)
+            conexion.execute("PRAGMA journal_mode=WAL")
+            conexion.execute(
+                "CREATE TABLE IF NOT EXISTS conversaciones "
+                "(id TEXT PRIMARY KEY, datos TEXT NOT NULL, actualizado REAL NOT NULL)"
+            )
+            conexion.commit()
+            self._local.conexion = conexion
+        return conexion
+
+    def obtener(self, id_sesion):
+        fila = self._conexion().execute(
+            "SELECT datos, actualizado FROM conversaciones WHERE id = ?", (id_sesion,)
+        ).fetchone()
+        if fila is None or time.time() - fila[1] > self.ttl:
+            return None
+        return json.loads(fila[0])
+
+    def guardar(self, id_sesion, estado):
+        conexion = self._conexion()
+        conexion.execute(
+            "INSERT INTO conversaciones (id, datos, actualizado) VALUES (?, ?, ?) "
+            "ON CONFLICT(id) DO UPDATE SET datos = excluded.datos, actualizado = excluded.actualizado",
+            (id_sesion, json.dumps(estado, ensure_ascii=False), time.time())
+        )
+        # Limpieza ocasional de sesiones inactivas
+        if time.time() - self._ultima_purga > 600:
+            conexion.execute("DELETE FROM conversaciones WHERE actualizado < ?", (time.time() - self.ttl,))
+            self._ultima_purga = time.time()
+        conexion.commit()
+
+    def eliminar(self, id_sesion):
+        conexion = self._conexion()
+        conexion.execute("DELETE FROM conversaciones WHERE id = ?", (id_sesion,))
+        conexion.commit()
+
+class AlmacenConversaciones:
+    """
+    Historial y última pregunta de cada usuario, separados por id de sesión.
+    El historial se recorta a `max_mensajes` para acotar la memoria por sesión.
+    obtener() retorna una copia de trabajo: nada cambia hasta guardar().
+    """
+
+    def __init__(self, backend=None, max_mensajes=MAX_MENSAJES_SESION):
+        self.backend = backend or BackendMemoria()
+        self.max_mensajes = max_mensajes
+
+    def obtener(self, id_sesion):
+        return self.backend.obtener(id_sesion) or estado_vacio()
+
+    def guardar(self, id_sesion, estado):
+        estado["historial"] = estado["historial"][-self.max_mensajes:]
+        self.backend.guardar(id_sesion, estado)
+
+    def reiniciar(self, id_sesion):
+        self.backend.eliminar(id_sesion)
+
+def crear_almacen_conversaciones():
+    """Almacén configurado según CONVERSACIONES_BACKEND."""
+    if BACKEND_CONVERSACIONES == "sqlite":
+        return AlmacenConversaciones(BackendSQLite())
+    return AlmacenConversaciones(BackendMemoria())
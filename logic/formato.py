@@ -0,0 +1,187 @@
+# --- formato.py ---
+import re
+import html
+import time
+
+# --- PATRONES (compilados una sola vez) ---
+_NEGRITA = re.compile(r'\*\*(.*?)\*\*')
+_TITULO = re.compile(r'###\s*(.*)')
+# Viñeta pegada a unos dos puntos ("necesario: - Generar"): el renglón se parte antes de la viñeta
+_VINETA_TRAS_DOS_PUNTOS = re.compile(r'(?<=:)\s*(?=[\-\*•])')
+# Inicio de renglón de lista: viñeta (-, * o •) o número ("1.")
+_INICIO_LISTA = re.compile(r'\s*(?:[\-\*•]\s+|(\d+)\.\s+)')
+# Punto y aparte dentro del renglón (no en "1." ni tras una viñeta)
+_PUNTO_Y_APARTE = re.compile(r'(?<!\d)(?<!•)\.\s+(?=[A-Z¿¡])')
+_EMPIEZA_ORACION = re.compile(r'[A-Z¿¡]')
+_ESPACIO = re.compile(r'\s')
+# Un renglón incompleto se convierte por tramos de al menos estos caracteres (unas palabras)
+ADELANTO_MINIMO = 32
+# Posibles cortes de un renglón incompleto: justo antes de un espacio que sigue a texto
+_CORTE = re.compile(r'(?<=\S)\s')
+
+_MD_NEGRITA = re.compile(r'\*\*(.*?)\*\*')
+_MD_ITALICA = re.compile(r'\*(.*?)\*')
+_MD_VINETA = re.compile(r'^\s*[\+\-\*]\s+', flags=re.MULTILINE)
+
+def limpiar_texto_markdown(texto):
+    """Quita la sintaxis Markdown (negritas, itálicas, bloques de código) y unifica viñetas."""
+    if not texto: return ""
+    texto = _MD_NEGRITA.sub(r'\1', texto)
+    texto = _MD_ITALICA.sub(r'\1', texto)
+    texto = _MD_VINETA.sub('• ', texto)
+    return texto.replace('```', '').strip()
+
+class FormateadorIncremental:
+    """
+    Convierte a HTML seguro el Markdown que genera el LLM conforme llegan los
+    tokens. Un renglón no espera a su salto de línea: se convierte hasta la
+    última palabra que ya no puede cambiar de formato (ver _corte_seguro);
+    lo que retornan agregar() y terminar(), concatenado, es exactamente
+    formatear_texto_html() del texto completo.
+
+    Reglas (las mismas del formateador anterior, en una sola pasada):
+    - El texto se escapa: el HTML que escriba el modelo se muestra como texto.
+    - **negrita** -> <strong>; ### título -> <span class="chat-title">.
+    - Una viñeta pegada a unos dos puntos ("necesario: - Generar") pasa a su propio renglón.
+    - Viñetas (-, *, •) -> "<br>• "; listas numeradas -> "<br>1. ".
+    - Punto y aparte seguido de mayúscula (en el renglón o en el siguiente) -> "<br><br>".
+    """
+
+    def __init__(self):
+        self._recibido = []
+        self._pendiente = []          # Tokens del renglón incompleto que aún no se convierten
+        self._largo_pendiente = 0
+        self._continua = False        # Ya se entregó el principio del renglón incompleto
+        self._html = []
+        self._inicio = True           # Aún no se escribe ningún renglón
+        self._renglones_vacios = 0    # Vacíos desde el último renglón escrito
+        self._fin_de_oracion = False  # El último renglón escrito termina en punto
+        self._tras_titulo = False     # El último renglón escrito es un título (ya cierra con <br>)
+        self.segundos = 0.0           # Tiempo total formateando (métrica 'html')
+
+    @property
+    def texto_completo(self):
+        return ''.join(self._recibido)
+
+    @property
+    def html(self):
+        """Todo el HTML entregado hasta ahora."""
+        return ''.join(self._html)
+
+    def agregar(self, fragmento):
+        """Recibe un token y retorna el HTML listo para mostrar (puede ser "")."""
+        self._recibido.append(fragmento)
+        self._pendiente.append(fragmento)
+        self._largo_pendiente += len(fragmento)
+        # Sin espacios no aparece ningún corte nuevo; sin salto de línea se esperan unas palabras
+        if '\n' not in fragmento and (
+                self._largo_pendiente < ADELANTO_MINIMO or not _ESPACIO.search(fragmento)):
+            return ""
+        inicio = time.perf_counter()
+        renglones = ''.join(self._pendiente).split('\n')
+        resto = renglones.pop()
+        partes = []
+        for renglon in renglones:
+            partes.append(self._renglon(renglon, continua=self._continua))
+            self._continua = False
+        corte = self._corte_seguro(resto)
+        if corte:
+            partes.append(self._renglon(resto[:corte], continua=self._continua))
+            self._continua = True
+            resto = resto[corte:]
+        self._pendiente = [resto]
+        self._largo_pendiente = len(resto)
+        salida = ''.join(partes)
+        self._html.append(salida)
+        self.segundos += time.perf_counter() - inicio
+        return salida
+
+    def terminar(self):
+        """HTML de lo que quedó pendiente del último renglón."""
+        inicio = time.perf_counter()
+        salida = self._renglon(''.join(self._pendiente), continua=self._continua)
+        self._pendiente = []
+        self._largo_pendiente = 0
+        self._continua = False
+        self._html.append(salida)
+        self.segundos += time.perf_counter() - inicio
+        return salida
+
+    def _corte_seguro(self, texto):
+        """
+        Posición hasta la que el renglón incompleto `texto` se puede convertir
+        ya (0 si todavía no): antes de un espacio, sin una negrita abierta,
+        sin terminar en un punto (el aparte depende de lo que sigue) ni en dos
+        puntos (podría seguir una viñeta), y con la viñeta o el número de
+        lista, si lo hay, ya seguido de texto. Un renglón con ### espera su
+        salto de línea: el título abarca hasta el final.
+        """
+        if '###' in texto:
+            return 0
+        for espacio in reversed(list(_CORTE.finditer(texto))):
+            corte = espacio.start()
+            previo = texto[:corte]
+            if previo[-1] in '.:' or previo.count('**') % 2:
+                continue
+            piezas = _VINETA_TRAS_DOS_PUNTOS.split(previo) if ':' in previo else (previo,)
+            if (len(piezas) > 1 or not self._continua) and not _ESPACIO.search(piezas[-1].lstrip()):
+                continue
+            return corte
+        return 0
+
+    def _renglon(self, crudo, continua=False):
+        """
+        HTML de un renglón, o de una parte si `continua` (sigue a la parte ya
+        entregada del mismo renglón, sin separador ni inicio de lista).
+        """
+        linea = crudo.rstrip()
+        if not linea or linea.isspace():
+            if not self._inicio and not continua:
+                self._renglones_vacios += 1
+            return ""
+        if self._inicio:
+            linea = linea.lstrip()
+
+        # Se escapa primero: las etiquetas que se agregan después son las únicas
+        linea = html.escape(linea, quote=False)
+        if '**' in linea:
+            linea = _NEGRITA.sub(r'<strong>\1</strong>', linea)
+        if '###' in linea:
+            linea = _TITULO.sub(r'<br><span class="chat-title">\1</span><br>', linea, count=1)
+        piezas = _VINETA_TRAS_DOS_PUNTOS.split(linea) if ':' in linea else (linea,)
+
+        salida = []
+        for numero_pieza, pieza in enumerate(piezas):
+            sigue = continua and numero_pieza == 0
+            lista = None if sigue else _INICIO_LISTA.match(pieza)
+            if lista:
+                numero = lista.group(1)
+                pieza = (f"<br>{numero}. " if numero else "<br>• ") + pieza[lista.end():]
+            if '.' in pieza:
+                pieza = _PUNTO_Y_APARTE.sub('.<br><br>', pieza)
+
+            # Separador con el renglón anterior
+            if sigue:
+                separador = ""
+            elif self._inicio or self._tras_titulo:
+                separador = ""
+            elif self._fin_de_oracion and _EMPIEZA_ORACION.match(pieza.lstrip()):
+                separador, pieza = "<br><br>", pieza.lstrip()
+            else:
+                separador = "\n" * (self._renglones_vacios + 1)
+            self._inicio = False
+            self._renglones_vacios = 0
+            self._tras_titulo = pieza.endswith('</span><br>')
+            self._fin_de_oracion = pieza.endswith('.') and not (
+                len(pieza) > 1 and (pieza[-2].isdigit() or pieza[-2] == '•'))
+            salida.append(separador + pieza)
+        return ''.join(salida)
+
+def formatear_texto_html(texto):
+    """
+    Convierte la respuesta del LLM (Markdown) a HTML seguro para el chat:
+    viñetas unificadas (•), negritas, títulos y párrafos (ver FormateadorIncremental).
+    """
+    if not texto: return ""
+    formateador = FormateadorIncremental()
+    return formateador.agregar(texto) + formateador.terminar()
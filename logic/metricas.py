@@ -0,0 +1,179 @@
+# --- metricas.py ---
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# --- CONFIGURACIÓN ---
+# Límites (segundos) de los histogramas de latencia
+LIMITES_LATENCIA = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                    0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Límites de la distancia coseno del mejor vecino del caché semántico
+LIMITES_DISTANCIA = tuple(round(0.05 * i, 2) for i in range(1, 21))
+
+# Etapas de una respuesta que se miden con medir()
+ETAPAS = ('normalize', 'knn', 'embed', 'vector_search', 'llm', 'html')
+
+# Tipo y descripción de cada métrica (para /metrics)
+DESCRIPCIONES = {
+    'goit_etapa_segundos': ('histogram', 'Duración de cada etapa de una respuesta'),
+    'goit_respuesta_segundos': ('histogram', 'Duración total de una respuesta, por fuente'),
+    'goit_primer_fragmento_segundos': ('histogram', 'Tiempo hasta el primer fragmento en streaming'),
+    'goit_cache_distancia': ('histogram', 'Distancia coseno del vecino más cercano en el caché semántico'),
+    'goit_respuestas_total': ('counter', 'Respuestas entregadas, por fuente'),
+    'goit_cache_consultas_total': ('counter', 'Consultas al caché semántico, por resultado'),
+    'goit_cache_recuperacion_total': ('counter', 'Consultas al caché de documentos recuperados, por resultado'),
+    'goit_embeddings_total': ('counter', 'Textos embebidos, por origen (memoria, disco o modelo)'),
+    'goit_llm_timeouts_total': ('counter', 'Llamadas al LLM canceladas por tiempo de espera (modo async)'),
+}
+
+class Histograma:
+    """Conteos acumulables por intervalo, como los histogramas de Prometheus."""
+
+    def __init__(self, limites):
+        self.limites = limites
+        self.conteos = [0] * (len(limites) + 1)   # El último es +Inf
+        self.suma = 0.0
+        self.total = 0
+
+    def observar(self, valor):
+        self.conteos[bisect_left(self.limites, valor)] += 1
+        self.suma += valor
+        self.total += 1
+
+    def percentil(self, p):
+        """Estimación del percentil p (0-100) interpolando dentro del intervalo."""
+        if not self.total:
+            return None
+        objetivo = self.total * p / 100.0
+        acumulado = 0
+        for i, conteo in enumerate(self.conteos):
+            if acumulado + conteo >= objetivo and conteo:
+                inferior = self.limites[i - 1] if i > 0 else 0.0
+                if i >= len(self.limites):
+                    return inferior
+                return inferior + (self.limites[i] - inferior) * (objetivo - acumulado) / conteo
+            acumulado += conteo
+        return self.limites[-1]
+
+class RegistroMetricas:
+    """
+    Contadores e histogramas en memoria del proceso, con etiquetas.
+    Se exportan en formato Prometheus (/metrics) o como diccionario (dashboard).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._contadores = {}
+        self._histogramas = {}
+        self.iniciado = time.time()
+
+    @staticmethod
+    def _clave(nombre, etiquetas):
+        return nombre, tuple(sorted(etiquetas.items()))
+
+    def incrementar(self, nombre, cantidad=1, **etiquetas):
+        clave = self._clave(nombre, etiquetas)
+        with self._lock:
+            self._contadores[clave] = self._contadores.get(clave, 0) + cantidad
+
+    def observar(self, nombre, valor, limites=LIMITES_LATENCIA, **etiquetas):
+        clave = self._clave(nombre, etiquetas)
+        with self._lock:
+            histograma = self._histogramas.get(clave)
+            if histograma is None:
+                histograma = self._histogramas[clave] = Histograma(limites)
+            histograma.observar(valor)
+
+    def contador(self, nombre):
+        """Valores de un contador: {etiquetas (tupla ordenada): valor}."""
+        with self._lock:
+            return {e: v for (n, e), v in self._contadores.items() if n == nombre}
+
+    @contextmanager
+    def medir(self, etapa):
+        """Mide la duración del bloque como una etapa ('knn', 'llm', ...)."""
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observar('goit_etapa_segundos', time.perf_counter() - inicio, etapa=etapa)
+
+    def limpiar(self):
+        with self._lock:
+            self._contadores.clear()
+            self._histogramas.clear()
+            self.iniciado = time.time()
+
+    # --- Exportación ---
+
+    def a_prometheus(self):
+        """Texto en el formato de exposición de Prometheus (0.0.4)."""
+        def etiquetas_texto(etiquetas, extra=()):
+            pares = list(etiquetas) + list(extra)
+            if not pares:
+                return ''
+            return '{' + ','.join(f'{k}="{str(v)}"' for k, v in pares) + '}'
+
+        with self._lock:
+            contadores = dict(self._contadores)
+            histogramas = {clave: (h.limites, list(h.conteos), h.suma, h.total)
+                           for clave, h in self._histogramas.items()}
+
+        lineas = []
+        for nombre in sorted({n for n, _ in contadores} | {n for n, _ in histogramas}):
+            tipo, ayuda = DESCRIPCIONES.get(nombre, ('untyped', nombre))
+            lineas.append(f"# HELP {nombre} {ayuda}")
+            lineas.append(f"# TYPE {nombre} {tipo}")
+            for (n, etiquetas), valor in sorted(contadores.items()):
+                if n == nombre:
+                    lineas.append(f"{nombre}{etiquetas_texto(etiquetas)} {valor}")
+            for (n, etiquetas), (limites, conteos, suma, total) in sorted(histogramas.items()):
+                if n != nombre:
+                    continue
+                acumulado = 0
+                for limite, conteo in zip(list(limites) + ['+Inf'], conteos):
+                    acumulado += conteo
+                    lineas.append(f"{nombre}_bucket{etiquetas_texto(etiquetas, [('le', limite)])} {acumulado}")
+                lineas.append(f"{nombre}_sum{etiquetas_texto(etiquetas)} {suma}")
+                lineas.append(f"{nombre}_count{etiquetas_texto(etiquetas)} {total}")
+        return "\n".join(lineas) + "\n"
+
+    def a_dict(self):
+        """Resumen legible: contadores, y por histograma total, promedio y p50/p95/p99."""
+        with self._lock:
+            contadores = [
+                {"nombre": n, "etiquetas": dict(e), "valor": v}
+                for (n, e), v in sorted(self._contadores.items())
+            ]
+            histogramas = [
+                {
+                    "nombre": n,
+                    "etiquetas": dict(e),
+                    "total": h.total,
+                    "promedio": h.suma / h.total if h.total else None,
+                    "p50": h.percentil(50),
+                    "p95": h.percentil(95),
+                    "p99": h.percentil(99),
+                }
+                for (n, e), h in sorted(self._histogramas.items())
+            ]
+        return {"desde": self.iniciado, "contadores": contadores, "histogramas": histogramas}
+
+# Registro compartido por toda la aplicación
+metricas = RegistroMetricas()
+
+def medir(etapa):
+    return metricas.medir(etapa)
+
+def incrementar(nombre, cantidad=1, **etiquetas):
+    metricas.incrementar(nombre, cantidad, **etiquetas)
+
+def observar(nombre, valor, limites=LIMITES_LATENCIA, **etiquetas):
+    metricas.observar(nombre, valor, limites, **etiquetas)
+
+def tasa_aciertos_cache():
+    """Fracción de consultas al caché semántico que fueron acierto (None sin datos)."""
+    conteos = metricas.contador('goit_cache_consultas_total')
+    total = sum(conteos.values())
+    return conteos.get((('resultado', 'acierto'),), 0) / total if total else None
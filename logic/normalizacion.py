@@ -0,0 +1,112 @@
+# --- normalizacion.py ---
+import os
+import sys
+import unicodedata
+from functools import lru_cache
+
+# --- CONFIGURACIÓN ---
+# Stemming ligero (plurales) al normalizar: "inscripciones" -> "inscripcion"
+STEMMING_LIGERO = os.getenv("NORMALIZACION_STEMMING", "0") == "1"
+# Textos normalizados que se recuerdan (las preguntas se repiten mucho)
+TAMANO_MEMO = 8192
+# Cambia cuando cambia el resultado de normalizar_texto(); quien guarde
+# textos normalizados (FAQ, índices en disco) debe recalcularlos si no coincide
+VERSION_NORMALIZACION = "3" + ("+stem" if STEMMING_LIGERO else "")
+
+# Hasta dónde se precalcula la tabla (latín, griego, cirílico y puntuación general)
+_LIMITE_TABLA = 0x2070
+
+class _TablaPlegado(dict):
+    """
+    Los caracteres fuera de la tabla precalculada (emoji, símbolos, letras
+    de ancho completo) se resuelven la primera vez que aparecen y se
+    recuerdan: los símbolos se quitan y las letras se pliegan con NFKD
+    ("Ａ" -> "a", "ﬁ" -> "fi").
+    """
+
+    def __missing__(self, codigo):
+        c = chr(codigo)
+        if codigo < _LIMITE_TABLA:
+            valor = c   # Dentro de la tabla, lo que no está no cambia (ej. la ñ)
+        elif c.isspace():
+            valor = ' '
+        elif not (c.isalnum() or c == '_'):
+            valor = None
+        else:
+            valor = ''.join(x for x in unicodedata.normalize('NFKD', c)
+                            if x.isalnum() or x == '_').lower() or None
+        self[codigo] = valor
+        return valor
+
+def _construir_tabla():
+    """
+    Tabla para str.translate que en una sola pasada quita la puntuación
+    (como el antiguo re.sub(r'[^\\w\\s]', '')), pliega los acentos (á -> a, ü -> u)
+    y convierte todo espacio en ' '. La ñ se conserva.
+    """
+    tabla = _TablaPlegado()
+    for codigo in range(_LIMITE_TABLA):
+        c = chr(codigo)
+        if c.isspace():
+            tabla[codigo] = ' '
+        elif not (c.isalnum() or c == '_'):
+            tabla[codigo] = None
+        elif c not in 'ñÑ':
+            base = ''.join(x for x in unicodedata.normalize('NFD', c) if not unicodedata.combining(x))
+            if base and base != c:
+                tabla[codigo] = base
+    return tabla
+
+_TABLA = _construir_tabla()
+
+def plegar_acentos(texto):
+    """Minúsculas, sin puntuación ni acentos (conserva la ñ)."""
+    return texto.lower().translate(_TABLA)
+
+# --- STOPWORDS ---
+
+@lru_cache(maxsize=1)
+def obtener_stopwords():
+    """
+    Stopwords en español, plegadas igual que el texto ("qué" y "que" se
+    filtran por igual). Se cargan (y se descargan si faltan) al primer uso,
+    no al importar el módulo; importar nltk también tarda.
+    """
+    import nltk
+    from nltk.corpus import stopwords
+    try:
+        nltk.data.find('corpora/stopwords')
+    except LookupError:
+        nltk.download('stopwords')
+    return frozenset(plegar_acentos(p).strip() for p in stopwords.words('spanish'))
+
+def _stem_ligero(palabra):
+    """Quita plurales comunes sin tocar palabras cortas ("luces" -> "luz", "becas" -> "beca")."""
+    if len(palabra) <= 4:
+        return palabra
+    if palabra.endswith('ces'):
+        return palabra[:-3] + 'z'
+    if palabra.endswith('es') and palabra[-3] in 'lrnd':
+        return palabra[:-2]
+    if palabra.endswith('s') and palabra[-2] in 'aeiou':
+        return palabra[:-1]
+    return palabra
+
+@lru_cache(maxsize=TAMANO_MEMO)
+def _normalizar(texto):
+    excluidas = obtener_stopwords()
+    palabras = [p for p in plegar_acentos(texto).split() if p not in excluidas]
+    if STEMMING_LIGERO:
+        palabras = [_stem_ligero(p) for p in palabras]
+    # Los textos se guardan como claves en caché: se comparte una sola copia
+    return sys.intern(' '.join(palabras))
+
+def normalizar_texto(texto):
+    """
+    Normaliza una pregunta para compararla: minúsculas, sin puntuación, sin
+    acentos, sin stopwords y opcionalmente con stemming ligero. Lo usan el
+    caché semántico (KNN), la FAQ y el caché de recuperación del RAG.
+    """
+    if not isinstance(texto, str):
+        return ""
+    return _normalizar(texto)
@@ -0,0 +1,114 @@
+# --- segmentos_accesos.py ---
+import os
+import csv
+import gzip
+import json
+from datetime import datetime
+from functools import lru_cache
+import pandas as pd
+
+# Columnas de un segmento archivado. 'Dia' no se guarda: se deriva de 'Fecha'.
+COLUMNAS_SEGMENTO = ['Fecha', 'Hora', 'Programa', 'Dispositivo', 'IP']
+# Columnas que se guardan como índice a un diccionario (valores muy repetidos)
+COLUMNAS_INTERNADAS = ('Programa', 'Dispositivo')
+
+EXT_DATOS = '.csv.gz'
+EXT_DICCIONARIO = '.dict.json'
+
+def rutas_segmento(base):
+    """(datos, diccionario) de un segmento a partir de su ruta base."""
+    return f"{base}{EXT_DATOS}", f"{base}{EXT_DICCIONARIO}"
+
+@lru_cache(maxsize=4096)
+def dia_semana(fecha):
+    """Nombre del día ('Monday', ...) como lo escribe el registro activo."""
+    try:
+        return datetime.strptime(fecha, '%Y-%m-%d').strftime('%A')
+    except ValueError:
+        return ''
+
+def listar_segmentos(directorio):
+    """
+    Rutas base de los segmentos archivados, del más viejo al más nuevo.
+    El diccionario se escribe al final, así que solo cuentan los segmentos completos.
+    """
+    if not os.path.isdir(directorio):
+        return []
+    return sorted(
+        os.path.join(directorio, nombre[:-len(EXT_DICCIONARIO)])
+        for nombre in os.listdir(directorio) if nombre.endswith(EXT_DICCIONARIO)
+    )
+
+def archivar_segmento(ruta_csv, base):
+    """
+    Compacta un CSV del registro (Dia, Fecha, Hora, Programa, Dispositivo, IP)
+    en un segmento: CSV comprimido con Programa/Dispositivo como enteros y un
+    JSON con los diccionarios y el rango de fechas. Retorna los metadatos.
+    """
+    diccionarios = {columna: {} for columna in COLUMNAS_INTERNADAS}
+    ruta_datos, ruta_diccionario = rutas_segmento(base)
+    filas, desde, hasta = 0, None, None
+
+    with open(ruta_csv, newline='', encoding='utf-8') as origen, \
+         gzip.open(f"{ruta_datos}.tmp", 'wt', newline='', encoding='utf-8') as destino:
+        writer = csv.writer(destino)
+        writer.writerow(COLUMNAS_SEGMENTO)
+        for registro in csv.DictReader(origen):
+            if not registro.get('Fecha'):
+                continue
+            fila = []
+            for columna in COLUMNAS_SEGMENTO:
+                valor = registro.get(columna) or ''
+                if columna in diccionarios:
+                    valor = diccionarios[columna].setdefault(valor, len(diccionarios[columna]))
+                fila.append(valor)
+            writer.writerow(fila)
+            filas += 1
+            desde = registro['Fecha'] if desde is None else min(desde, registro['Fecha'])
+            hasta = registro['Fecha'] if hasta is None else max(hasta, registro['Fecha'])
+    os.replace(f"{ruta_datos}.tmp", ruta_datos)
+
+    metadatos = {
+        "filas": filas,
+        "desde": desde,
+        "hasta": hasta,
+        # Cada diccionario es una lista: el índice es el código guardado en el CSV
+        "diccionarios": {columna: list(valores) for columna, valores in diccionarios.items()},
+    }
+    with open(f"{ruta_diccionario}.tmp", 'w', encoding='utf-8') as f:
+        json.dump(metadatos, f, ensure_ascii=False)
+    os.replace(f"{ruta_diccionario}.tmp", ruta_diccionario)
+    return metadatos
+
+def leer_metadatos(base):
+    with open(rutas_segmento(base)[1], 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def leer_filas(base):
+    """Filas del segmento en el formato del registro activo (con 'Dia'), en orden cronológico."""
+    metadatos = leer_metadatos(base)
+    programas = metadatos["diccionarios"]["Programa"]
+    dispositivos = metadatos["diccionarios"]["Dispositivo"]
+    filas = []
+    with gzip.open(rutas_segmento(base)[0], 'rt', newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        next(reader, None)
+        for fecha, hora, programa, dispositivo, ip in reader:
+            filas.append([dia_semana(fecha), fecha, hora,
+                          programas[int(programa)], dispositivos[int(dispositivo)], ip])
+    return filas
+
+def leer_dataframe(base):
+    """
+    Segmento como DataFrame. Programa y Dispositivo quedan como categóricas
+    construidas directo de los códigos, sin parsear los textos fila por fila.
+    """
+    metadatos = leer_metadatos(base)
+    df = pd.read_csv(
+        rutas_segmento(base)[0],
+        dtype={'Fecha': str, 'Hora': str, 'IP': str, 'Programa': 'int32', 'Dispositivo': 'int32'},
+        keep_default_na=False,
+    )
+    for columna in COLUMNAS_INTERNADAS:
+        df[columna] = pd.Categorical.from_codes(df[columna], categories=metadatos["diccionarios"][columna])
+    return df
@@ -1,37 +1,237 @@
 # --- seleccion_modelo.py ---
-from models.modelo_knn import obtener_respuesta_knn
+import os
+import time
+import asyncio
+import weakref
+import threading
+from contextlib import aclosing
+from models.modelo_knn import obtener_indice_knn
+from logic.metricas import incrementar, observar, LIMITES_DISTANCIA
 from models.modelo_llm import obtener_cadena_rag
 
+# Caché semántico por defecto: 'knn' (hashing de palabras) o 'denso' (embeddings)
+BACKEND_CACHE = os.getenv("CACHE_BACKEND", "knn")
+UMBRAL_DISTANCIA_KNN = 0.2
+# Modo async (asgi.py): llamadas al LLM simultáneas por proceso y tiempo máximo
+# por respuesta, contando la espera por un lugar libre
+MAX_LLM_CONCURRENTES = int(os.getenv("LLM_MAX_CONCURRENTES", 256))
+TIMEOUT_LLM = float(os.getenv("LLM_TIMEOUT", 60))
+MENSAJE_TIMEOUT_LLM = "La respuesta tardó demasiado. Intenta de nuevo en unos momentos."
+
+# Etiqueta corta de cada fuente para las métricas
+ETIQUETAS_FUENTE = {
+    "KNN (Caché Semántico)": "cache",
+    "LLM (RAG Generativo)": "llm",
+    "Error": "error",
+    "Nulo": "nulo",
+}
+
+def _registrar_respuesta(fuente, inicio):
+    etiqueta = ETIQUETAS_FUENTE.get(fuente, fuente)
+    incrementar('goit_respuestas_total', fuente=etiqueta)
+    observar('goit_respuesta_segundos', time.perf_counter() - inicio, fuente=etiqueta)
+
+def _medir_stream(fragmentos, fuente, inicio):
+    """Reenvía los fragmentos y registra el tiempo al primero y al último."""
+    primero = True
+    try:
+        for fragmento in fragmentos:
+            if primero:
+                observar('goit_primer_fragmento_segundos', time.perf_counter() - inicio,
+                         fuente=ETIQUETAS_FUENTE.get(fuente, fuente))
+                primero = False
+            yield fragmento
+    except Exception:
+        _registrar_respuesta("Error", inicio)
+        raise
+    _registrar_respuesta(fuente, inicio)
+
+async def _amedir_stream(fragmentos, fuente, inicio):
+    """
+    Versión async de _medir_stream(). Si se abandona a medias (el cliente se
+    desconectó), aclosing cierra el stream del LLM y libera su lugar.
+    """
+    primero = True
+    try:
+        async with aclosing(fragmentos):
+            async for fragmento in fragmentos:
+                if primero:
+                    observar('goit_primer_fragmento_segundos', time.perf_counter() - inicio,
+                             fuente=ETIQUETAS_FUENTE.get(fuente, fuente))
+                    primero = False
+                yield fragmento
+    except Exception:
+        _registrar_respuesta("Error", inicio)
+        raise
+    _registrar_respuesta(fuente, inicio)
+
+async def _un_fragmento(texto):
+    yield texto
+
+def obtener_cache_semantico(backend_cache=BACKEND_CACHE, embeddings=None):
+    """
+    Índice del caché semántico. `backend_cache` es 'knn', 'denso' o un índice
+    ya construido (cualquier objeto con buscar/add/replace).
+    """
+    if backend_cache == 'knn':
+        return obtener_indice_knn()
+    if backend_cache == 'denso':
+        # Import local: solo carga el índice denso si se usa
+        from models.cache_denso import obtener_indice_denso
+        return obtener_indice_denso(embeddings)
+    if isinstance(backend_cache, str):
+        raise ValueError(f"Backend de caché desconocido: {backend_cache}")
+    return backend_cache
+
 class SelectorDeModelo:
-    def __init__(self, usar_knn=True, usar_llm=True, umbral_distancia=0.2):
+    def __init__(self, usar_knn=True, usar_llm=True, umbral_distancia=None, margen_minimo=0.0,
+                 backend_cache=BACKEND_CACHE, embeddings=None):
+        """
+        `backend_cache` elige el caché semántico ('knn' o 'denso'); `embeddings`
+        sustituye al modelo de embeddings del caché denso (p. ej. EmbeddingsFalsos
+        en pruebas). Sin `umbral_distancia` se usa el del backend elegido.
+
+        Construir el selector no carga nada: el caché y la cadena RAG se
+        preparan con calentar() o, si no se llamó, con la primera pregunta.
+        """
         self.usar_knn = usar_knn
         self.usar_llm = usar_llm
+        self.backend_cache = backend_cache
+        self.embeddings = embeddings
+        self.cache = None
+        if umbral_distancia is None:
+            if backend_cache == 'denso':
+                from models.cache_denso import UMBRAL_DISTANCIA_DENSO
+                umbral_distancia = UMBRAL_DISTANCIA_DENSO
+            else:
+                umbral_distancia = UMBRAL_DISTANCIA_KNN
         self.UMBRAL_DISTANCIA_COSINE = umbral_distancia
+        # Diferencia mínima de distancia entre el mejor y el segundo vecino
+        # para confiar en el caché (0.0 = no se exige margen)
+        self.MARGEN_MINIMO = margen_minimo
         self.rag_chain = None
-        
-        if self.usar_llm:
+        self.listo = False
+        self._lock_inicio = threading.Lock()
+        # Modo async: limita las llamadas al LLM en curso (las demás esperan turno)
+        self.max_llm_concurrentes = MAX_LLM_CONCURRENTES
+        self.timeout_llm = TIMEOUT_LLM
+        self._limite_llm = asyncio.Semaphore(MAX_LLM_CONCURRENTES)
+        if hasattr(os, 'register_at_fork'):
+            # Referencia débil: el hook no mantiene vivo al selector
+            reiniciar = weakref.WeakMethod(self._reiniciar_tras_fork)
+            os.register_at_fork(after_in_child=lambda: reiniciar() and reiniciar()())
+
+    def _reiniciar_tras_fork(self):
+        """
+        En el proceso hijo de un fork (gunicorn --preload): si el padre estaba
+        en _inicializar(), el lock se copió tomado por un hilo que en el hijo
+        no existe. Se recrea; si no había terminado, el hijo la repite.
+        """
+        self._lock_inicio = threading.Lock()
+
+    def _inicializar(self):
+        """Construye (una sola vez) el caché semántico y la cadena RAG."""
+        if self.listo:
+            return
+        with self._lock_inicio:
+            if self.listo:
+                return
+            if self.usar_knn:
+                try:
+                    self.cache = obtener_cache_semantico(self.backend_cache, self.embeddings)
+                except Exception as e:
+                    print(f"❌ Error caché semántico: {e}")
+                    self.usar_knn = False
+
+            if self.usar_llm:
+                try:
+                    print("Iniciando y cargando el modelo LLM (RAG)...")
+                    self.rag_chain = obtener_cadena_rag() 
+                    print("✅ Modelo LLM listo.")
+                except Exception as e:
+                    print(f"❌ Error LLM: {e}")
+                    self.usar_llm = False
+            self.listo = True
+
+    def calentar(self):
+        """
+        Prepara todo antes de la primera pregunta: carga el caché y la cadena
+        RAG y hace una consulta de prueba al caché (stopwords, primera
+        multiplicación), para que ningún usuario pague el arranque.
+        """
+        inicio = time.perf_counter()
+        self._inicializar()
+        if self.cache is not None:
             try:
-                print("Iniciando y cargando el modelo LLM (RAG)...")
-                self.rag_chain = obtener_cadena_rag() 
-                print("✅ Modelo LLM listo.")
+                self.cache.buscar(["calentamiento"], k=1)
             except Exception as e:
-                print(f"❌ Error LLM: {e}")
-                self.usar_llm = False
+                print(f"⚠️ Error calentando caché semántico: {e}")
+        print(f"🔥 Selector listo en {time.perf_counter() - inicio:.2f} s")
+
+    def _es_acierto_cache(self, respuestas, distancias):
+        """
+        Decide si el vecino más cercano es confiable:
+        debe estar bajo el umbral y, si hay un segundo vecino con otra
+        respuesta, separarse de él al menos MARGEN_MINIMO.
+        """
+        if not respuestas[0] or distancias[0] > self.UMBRAL_DISTANCIA_COSINE:
+            return False
+        if len(distancias) > 1 and respuestas[1] != respuestas[0]:
+            return (distancias[1] - distancias[0]) >= self.MARGEN_MINIMO
+        return True
+
+    def _buscar_en_cache(self, pregunta):
+        """Respuesta del caché semántico si hay un acierto confiable, si no None."""
+        try:
+            respuestas, distancias = self.cache.buscar([pregunta], k=2)
+        except Exception as e:
+            print(f"Error consultando caché semántico: {e}")
+            return None
+        if respuestas.shape[1] > 0:
+            # Distribución de distancias: sirve para ajustar umbral_distancia con datos reales
+            observar('goit_cache_distancia', float(distancias[0, 0]), LIMITES_DISTANCIA)
+            if self._es_acierto_cache(respuestas[0], distancias[0]):
+                incrementar('goit_cache_consultas_total', resultado='acierto')
+                return respuestas[0, 0]
+        incrementar('goit_cache_consultas_total', resultado='fallo')
+        return None
+
+    def aprender(self, pregunta, respuesta, reemplazar=False):
+        """
+        Actualiza el caché semántico con una respuesta del LLM: la agrega
+        o, si `reemplazar` (respuesta regenerada), sustituye la anterior.
+        """
+        self._inicializar()
+        if self.cache is None:
+            return
+        try:
+            if reemplazar:
+                self.cache.replace(pregunta, respuesta)
+            else:
+                self.cache.add(pregunta, respuesta)
+        except Exception as e:
+            print(f"Error actualizando caché semántico: {e}")
 
     def responder(self, pregunta, historial="", forzar_llm=False):
+        """Responde la pregunta (ver _responder) y registra su duración por fuente."""
+        inicio = time.perf_counter()
+        respuesta, fuente = self._responder(pregunta, historial, forzar_llm)
+        _registrar_respuesta(fuente, inicio)
+        return respuesta, fuente
+
+    def _responder(self, pregunta, historial="", forzar_llm=False):
         """
         Lógica híbrida:
         1. Si forzar_llm es True -> Salta KNN y usa LLM directo.
         2. Si no, intenta KNN (Caché semántico).
         3. Si KNN falla o la distancia es alta -> Fallback a LLM.
         """
+        self._inicializar()
         
         # 1. Intentar KNN (Solo si NO estamos forzando LLM)
         if self.usar_knn and not forzar_llm:
-            respuesta_knn, distancia = obtener_respuesta_knn(pregunta)
-            
-            # Si hay respuesta y es muy similar (distancia baja)
-            if respuesta_knn and distancia <= self.UMBRAL_DISTANCIA_COSINE:
+            respuesta_knn = self._buscar_en_cache(pregunta)
+            if respuesta_knn:
                 # Retornamos respuesta de caché
                 return respuesta_knn, "KNN (Caché Semántico)"
 
@@ -48,4 +248,126 @@ class SelectorDeModelo:
                 print(f"Error RAG: {e}")
                 return "Error al generar respuesta con IA.", "Error"
         
-        return "Lo siento, no tengo información sobre eso.", "Nulo"
\ No newline at end of file
+        return "Lo siento, no tengo información sobre eso.", "Nulo"
+
+    def responder_stream(self, pregunta, historial="", forzar_llm=False):
+        """Como _responder_stream(), midiendo el primer fragmento y la duración total."""
+        inicio = time.perf_counter()
+        fragmentos, fuente = self._responder_stream(pregunta, historial, forzar_llm)
+        return _medir_stream(fragmentos, fuente, inicio), fuente
+
+    def _responder_stream(self, pregunta, historial="", forzar_llm=False):
+        """
+        Igual que responder(), pero retorna (generador de fragmentos de texto, fuente).
+        Un acierto del caché se entrega completo en un solo fragmento; el LLM
+        entrega los tokens conforme los genera. Los errores del LLM se
+        propagan al consumir el generador.
+        """
+        self._inicializar()
+        if self.usar_knn and not forzar_llm:
+            respuesta_knn = self._buscar_en_cache(pregunta)
+            if respuesta_knn:
+                return iter([respuesta_knn]), "KNN (Caché Semántico)"
+
+        if self.usar_llm and self.rag_chain:
+            fragmentos = self.rag_chain.stream({
+                "question": pregunta,
+                "history": historial
+            })
+            return fragmentos, "LLM (RAG Generativo)"
+
+        return iter(["Lo siento, no tengo información sobre eso."]), "Nulo"
+
+    # --- Modo async (asgi.py) ---
+    # Un proceso atiende cientos de preguntas a la vez: mientras el LLM
+    # responde, el event loop sigue con las demás. El caché y la carga inicial
+    # se ejecutan en hilos para no bloquearlo.
+
+    async def _ainicializar(self):
+        if not self.listo:
+            await asyncio.to_thread(self._inicializar)
+
+    async def _abuscar_en_cache(self, pregunta, forzar_llm):
+        if self.usar_knn and not forzar_llm:
+            return await asyncio.to_thread(self._buscar_en_cache, pregunta)
+        return None
+
+    async def aresponder(self, pregunta, historial="", forzar_llm=False):
+        """Versión async de responder(): usa rag_chain.ainvoke con límite de concurrencia y timeout."""
+        inicio = time.perf_counter()
+        respuesta, fuente = await self._aresponder(pregunta, historial, forzar_llm)
+        _registrar_respuesta(fuente, inicio)
+        return respuesta, fuente
+
+    async def _aresponder(self, pregunta, historial="", forzar_llm=False):
+        await self._ainicializar()
+        respuesta_knn = await self._abuscar_en_cache(pregunta, forzar_llm)
+        if respuesta_knn:
+            return respuesta_knn, "KNN (Caché Semántico)"
+
+        if self.usar_llm and self.rag_chain:
+            async def invocar():
+                async with self._limite_llm:
+                    return await self.rag_chain.ainvoke({"question": pregunta, "history": historial})
+            try:
+                respuesta_llm = await asyncio.wait_for(invocar(), self.timeout_llm)
+                return respuesta_llm, "LLM (RAG Generativo)"
+            except asyncio.TimeoutError:
+                print(f"⏱️ LLM sin respuesta en {self.timeout_llm:g} s")
+                incrementar('goit_llm_timeouts_total')
+                return MENSAJE_TIMEOUT_LLM, "Error"
+            except Exception as e:
+                print(f"Error RAG: {e}")
+                return "Error al generar respuesta con IA.", "Error"
+
+        return "Lo siento, no tengo información sobre eso.", "Nulo"
+
+    async def aresponder_stream(self, pregunta, historial="", forzar_llm=False):
+        """Versión async de responder_stream(): (generador async de fragmentos, fuente)."""
+        inicio = time.perf_counter()
+        fragmentos, fuente = await self._aresponder_stream(pregunta, historial, forzar_llm)
+        return _amedir_stream(fragmentos, fuente, inicio), fuente
+
+    async def _aresponder_stream(self, pregunta, historial="", forzar_llm=False):
+        await self._ainicializar()
+        respuesta_knn = await self._abuscar_en_cache(pregunta, forzar_llm)
+        if respuesta_knn:
+            return _un_fragmento(respuesta_knn), "KNN (Caché Semántico)"
+
+        if self.usar_llm and self.rag_chain:
+            return self._astream_llm(pregunta, historial), "LLM (RAG Generativo)"
+
+        return _un_fragmento("Lo siento, no tengo información sobre eso."), "Nulo"
+
+    async def _astream_llm(self, pregunta, historial):
+        """
+        Tokens de rag_chain.astream. El timeout cubre la respuesta completa
+        (espera por turno incluida); al vencer se lanza asyncio.TimeoutError.
+        """
+        loop = asyncio.get_running_loop()
+        limite = loop.time() + self.timeout_llm
+
+        def restante():
+            return max(limite - loop.time(), 0)
+
+        tokens = None
+        adquirido = False
+        try:
+            await asyncio.wait_for(self._limite_llm.acquire(), restante())
+            adquirido = True
+            tokens = self.rag_chain.astream({"question": pregunta, "history": historial})
+            while True:
+                try:
+                    fragmento = await asyncio.wait_for(tokens.__anext__(), restante())
+                except StopAsyncIteration:
+                    break
+                yield fragmento
+        except asyncio.TimeoutError:
+            print(f"⏱️ LLM sin respuesta en {self.timeout_llm:g} s")
+            incrementar('goit_llm_timeouts_total')
+            raise
+        finally:
+            if tokens is not None:
+                await tokens.aclose()
+            if adquirido:
+                self._limite_llm.release()
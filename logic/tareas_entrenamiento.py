@@ -0,0 +1,196 @@
+# --- tareas_entrenamiento.py ---
+import os
+import json
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from logic.bloqueo_archivo import BloqueoArchivo
+
+# --- CONFIGURACIÓN ---
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Estado de los trabajos en disco (junto a registry.json): cualquier worker
+# responde /admin/train/status, sin importar cuál aceptó el entrenamiento
+RUTA_TRABAJOS = os.path.join(project_root, 'data', 'entrenamientos.json')
+# Lock entre procesos: un solo entrenamiento a la vez sobre la base vectorial,
+# aunque lo acepten workers distintos (los demás esperan 'En cola')
+RUTA_BLOQUEO_ENTRENAMIENTO = os.path.join(project_root, 'data', 'entrenamiento.lock')
+# Cada cuántos segundos, como máximo, se escribe en disco el avance de un trabajo
+INTERVALO_PUBLICACION = 1.0
+
+# Un solo hilo de trabajo por proceso: los entrenamientos se encolan y se ejecutan en orden
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="entrenamiento")
+_lock = threading.Lock()
+_bloqueos = {}
+
+# Cuántos trabajos terminados se conservan para consulta
+MAX_TRABAJOS_GUARDADOS = 20
+
+def _bloqueo(ruta):
+    """Un BloqueoArchivo por ruta dentro del proceso (también excluye a sus hilos)."""
+    with _lock:
+        return _bloqueos.setdefault(ruta, BloqueoArchivo(ruta))
+
+class ProgresoEntrenamiento:
+    """
+    Estado observable de un entrenamiento: contadores de avance y
+    estado por fuente. Es seguro actualizarlo desde el hilo de trabajo
+    mientras las rutas lo consultan. Con `al_publicar`, cada cambio se
+    entrega (a lo más cada INTERVALO_PUBLICACION segundos) como a_dict().
+    """
+
+    CONTADORES = (
+        'documentos_cargados',
+        'fragmentos_generados',
+        'fragmentos_embebidos',
+        'fragmentos_escritos',
+        'fragmentos_eliminados',
+        'fuentes_sin_cambios',
+    )
+
+    def __init__(self, id_trabajo=None, al_actualizar_fuente=None, al_publicar=None):
+        self.id = id_trabajo or uuid.uuid4().hex
+        self.pid = os.getpid()
+        self.estado = 'En cola'
+        self.error = None
+        self.creado = time.time()
+        self.iniciado = None
+        self.terminado = None
+        self.contadores = {nombre: 0 for nombre in self.CONTADORES}
+        self.fuentes = {}
+        self.resumen = None
+        self._al_actualizar_fuente = al_actualizar_fuente
+        self._al_publicar = al_publicar
+        self._ultima_publicacion = 0.0
+        self._lock = threading.Lock()
+
+    def sumar(self, contador, cantidad=1):
+        with self._lock:
+            self.contadores[contador] = self.contadores.get(contador, 0) + cantidad
+        self.publicar(forzar=False)
+
+    def marcar_fuente(self, tipo, clave, estado):
+        """Actualiza el estado de una fuente ('url' o 'pdf') y lo propaga al registro."""
+        with self._lock:
+            self.fuentes[f"{tipo}:{clave}"] = estado
+        if self._al_actualizar_fuente:
+            try:
+                self._al_actualizar_fuente(tipo, clave, estado)
+            except Exception as e:
+                print(f"⚠️ No se pudo actualizar el estado de {clave}: {e}")
+        self.publicar(forzar=False)
+
+    def publicar(self, forzar=True):
+        """Entrega el estado a `al_publicar` (sin `forzar`, solo si pasó el intervalo)."""
+        if self._al_publicar is None:
+            return
+        ahora = time.monotonic()
+        with self._lock:
+            if not forzar and ahora - self._ultima_publicacion < INTERVALO_PUBLICACION:
+                return
+            self._ultima_publicacion = ahora
+        try:
+            self._al_publicar(self.a_dict())
+        except Exception as e:
+            print(f"⚠️ No se pudo guardar el estado del entrenamiento {self.id[:8]}: {e}")
+
+    def a_dict(self):
+        with self._lock:
+            return {
+                "id": self.id,
+                "pid": self.pid,
+                "estado": self.estado,
+                "error": self.error,
+                "creado": self.creado,
+                "iniciado": self.iniciado,
+                "terminado": self.terminado,
+                "contadores": dict(self.contadores),
+                "fuentes": dict(self.fuentes),
+                "resumen": self.resumen,
+            }
+
+# --- Estado de los trabajos en disco ---
+
+def _leer_trabajos():
+    try:
+        with open(RUTA_TRABAJOS, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+def _purgar_trabajos_viejos(trabajos):
+    terminados = [t for t in trabajos.values() if t.get("terminado")]
+    terminados.sort(key=lambda t: t["terminado"])
+    for trabajo in terminados[:-MAX_TRABAJOS_GUARDADOS]:
+        trabajos.pop(trabajo["id"], None)
+
+def _guardar_trabajo(datos):
+    """Escribe el estado de un trabajo (archivo temporal + reemplazo: los lectores no toman el lock)."""
+    with _bloqueo(f"{RUTA_TRABAJOS}.lock"):
+        trabajos = _leer_trabajos()
+        trabajos[datos["id"]] = datos
+        _purgar_trabajos_viejos(trabajos)
+        temporal = f"{RUTA_TRABAJOS}.{os.getpid()}.tmp"
+        with open(temporal, 'w', encoding='utf-8') as f:
+            json.dump(trabajos, f, ensure_ascii=False)
+        os.replace(temporal, RUTA_TRABAJOS)
+
+def _proceso_vivo(pid):
+    if not pid or os.name == 'nt':   # En Windows os.kill terminaría el proceso
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+def _con_estado_real(datos):
+    """Un trabajo sin terminar cuyo proceso ya no existe (worker reiniciado) se reporta como error."""
+    if datos.get("terminado") is None and not _proceso_vivo(datos.get("pid")):
+        return {**datos, "estado": 'Error', "error": "El proceso que lo ejecutaba terminó antes de completarlo"}
+    return datos
+
+# --- Ejecución ---
+
+def _ejecutar(progreso, funcion_entrenamiento, registry):
+    # Si otro worker está entrenando, este trabajo espera aquí (sigue 'En cola')
+    with _bloqueo(RUTA_BLOQUEO_ENTRENAMIENTO):
+        progreso.estado = 'En proceso'
+        progreso.iniciado = time.time()
+        progreso.publicar()
+        try:
+            funcion_entrenamiento(registry, progreso=progreso)
+            progreso.estado = 'Completado'
+            print(f"✅ Entrenamiento {progreso.id[:8]} completado.")
+        except Exception as e:
+            progreso.estado = 'Error'
+            progreso.error = str(e)
+            print(f"❌ Error en entrenamiento {progreso.id[:8]}: {e}")
+        finally:
+            progreso.terminado = time.time()
+            progreso.publicar()
+
+def iniciar_entrenamiento(registry, funcion_entrenamiento, al_actualizar_fuente=None):
+    """
+    Encola un entrenamiento en segundo plano y retorna su id de inmediato.
+    `funcion_entrenamiento(registry, progreso=...)` se ejecuta en el hilo de trabajo.
+    """
+    progreso = ProgresoEntrenamiento(al_actualizar_fuente=al_actualizar_fuente, al_publicar=_guardar_trabajo)
+    progreso.publicar()
+    _executor.submit(_ejecutar, progreso, funcion_entrenamiento, registry)
+    return progreso.id
+
+def obtener_trabajo(id_trabajo):
+    """Estado de un trabajo como diccionario (None si no existe)."""
+    trabajo = _leer_trabajos().get(id_trabajo)
+    return _con_estado_real(trabajo) if trabajo else None
+
+def obtener_ultimo_trabajo():
+    """Estado del trabajo más reciente (None si nunca se ha entrenado)."""
+    trabajos = _leer_trabajos()
+    if not trabajos:
+        return None
+    return _con_estado_real(max(trabajos.values(), key=lambda t: t["creado"]))
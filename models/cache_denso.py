@@ -0,0 +1,194 @@
+# --- cache_denso.py ---
+import os
+import threading
+import numpy as np
+
+from data.almacen_faq import almacen_faq
+from logic.normalizacion import normalizar_texto
+from logic.metricas import medir
+from models.modelo_embeddings import obtener_embeddings, MODELO_EMBEDDING
+from models.modelo_knn import k_vecinos
+
+# --- CONFIGURACIÓN ---
+# 'float16' reduce la memoria a la mitad; la similitud se calcula en float32 de todos modos
+DTYPE_CACHE_DENSO = os.getenv("CACHE_DENSO_DTYPE", "float32")
+# Filas reservadas al inicio; al llenarse, la matriz duplica su capacidad
+CAPACIDAD_INICIAL = 1024
+# Filas por bloque al buscar (acota la memoria temporal con float16)
+FILAS_POR_BLOQUE = 16384
+# Los embeddings densos dan similitudes más altas que el hashing: umbral propio
+UMBRAL_DISTANCIA_DENSO = float(os.getenv("CACHE_DENSO_UMBRAL", 0.12))
+
+class InstantaneaDensa:
+    """
+    Vista inmutable del índice: las primeras `n` filas de `matriz` y sus
+    respuestas. Agregar una fila escribe más allá de `n`, así que las
+    instantáneas anteriores no la ven; reemplazar una respuesta publica una
+    instantánea con una copia de `respuestas` (la anterior no cambia).
+    """
+
+    __slots__ = ('matriz', 'n', 'respuestas')
+
+    def __init__(self, matriz, n, respuestas):
+        self.matriz = matriz            # (capacidad, dimensión), filas normalizadas (L2)
+        self.n = n
+        self.respuestas = respuestas    # list; solo crece más allá de `n`
+
+class IndiceDensoIncremental:
+    """
+    Caché semántico sobre embeddings densos (el mismo espacio que la
+    recuperación del RAG). Encuentra paráfrasis que no comparten palabras,
+    donde el índice de hashing falla.
+
+    Misma interfaz que IndiceKNNIncremental (cargar, add, replace, buscar).
+    Búsqueda exacta por fuerza bruta: una multiplicación matriz-vector por
+    bloque, suficiente para el tamaño de una FAQ. Las lecturas no toman locks.
+    """
+
+    def __init__(self, embeddings, dtype=DTYPE_CACHE_DENSO, capacidad_inicial=CAPACIDAD_INICIAL):
+        self.embeddings = embeddings
+        self.dtype = np.dtype(dtype)
+        self.capacidad_inicial = capacidad_inicial
+        self._instantanea = InstantaneaDensa(None, 0, [])
+        # Solo serializa a los escritores; los lectores nunca lo toman
+        self._lock_escritura = threading.Lock()
+        self._posiciones = {}   # Pregunta normalizada -> fila (solo escritores)
+
+    def __len__(self):
+        return self._instantanea.n
+
+    @staticmethod
+    def _clave(pregunta):
+        return normalizar_texto(pregunta) or str(pregunta).strip().lower()
+
+    def _embeber(self, textos):
+        # Se embebe el texto original: el modelo denso aprovecha lo que la normalización quita
+        vectores = np.asarray(self.embeddings.embed_documents([str(t).strip() for t in textos]),
+                              dtype=np.float32)
+        normas = np.linalg.norm(vectores, axis=1, keepdims=True)
+        return vectores / np.maximum(normas, 1e-12)
+
+    def cargar(self, preguntas, respuestas):
+        """Reconstruye el índice completo (carga inicial desde la FAQ)."""
+        posiciones = {}
+        textos = []
+        respuestas_unicas = []
+        for pregunta, respuesta in zip(preguntas, respuestas):
+            clave = self._clave(str(pregunta))
+            if clave in posiciones:
+                # Las filas posteriores sustituyen a las anteriores
+                respuestas_unicas[posiciones[clave]] = respuesta
+                continue
+            posiciones[clave] = len(textos)
+            textos.append(pregunta)
+            respuestas_unicas.append(respuesta)
+
+        matriz = None
+        if textos:
+            vectores = self._embeber(textos)
+            capacidad = max(self.capacidad_inicial, len(textos))
+            matriz = np.zeros((capacidad, vectores.shape[1]), dtype=self.dtype)
+            matriz[:len(textos)] = vectores
+
+        nueva = InstantaneaDensa(matriz, len(textos), respuestas_unicas)
+        with self._lock_escritura:
+            self._posiciones = posiciones
+            self._instantanea = nueva
+
+    def _reemplazar_respuesta(self, posicion, respuesta):
+        """Publica una instantánea con la respuesta cambiada (requiere _lock_escritura)."""
+        actual = self._instantanea
+        respuestas = actual.respuestas[:actual.n]
+        respuestas[posicion] = respuesta
+        self._instantanea = InstantaneaDensa(actual.matriz, actual.n, respuestas)
+
+    def add(self, pregunta, respuesta):
+        """Agrega una pregunta al caché (si ya existe, actualiza su respuesta)."""
+        clave = self._clave(pregunta)
+        with self._lock_escritura:
+            if clave in self._posiciones:
+                self._reemplazar_respuesta(self._posiciones[clave], respuesta)
+                return
+
+        # El embedding puede tardar (servidor remoto): se calcula fuera del lock
+        vector = self._embeber([pregunta])[0]
+
+        with self._lock_escritura:
+            if clave in self._posiciones:
+                self._reemplazar_respuesta(self._posiciones[clave], respuesta)
+                return
+            actual = self._instantanea
+            matriz = actual.matriz
+            if matriz is None:
+                matriz = np.zeros((self.capacidad_inicial, vector.shape[0]), dtype=self.dtype)
+            elif actual.n == matriz.shape[0]:
+                # Matriz llena: se duplica en una copia nueva; los lectores siguen con la anterior
+                ampliada = np.zeros((2 * matriz.shape[0], matriz.shape[1]), dtype=self.dtype)
+                ampliada[:actual.n] = matriz[:actual.n]
+                matriz = ampliada
+            matriz[actual.n] = vector
+            actual.respuestas.append(respuesta)
+            self._posiciones[clave] = actual.n
+            self._instantanea = InstantaneaDensa(matriz, actual.n + 1, actual.respuestas)
+
+    def replace(self, pregunta, respuesta):
+        """Reemplaza la respuesta de una pregunta (si no existe, la agrega)."""
+        self.add(pregunta, respuesta)
+
+    def buscar(self, preguntas, k=1):
+        """
+        k vecinos más cercanos de varias preguntas (sin normalizar).
+        Retorna dos arreglos (n, k): respuestas (dtype object) y distancias
+        coseno de menor a mayor, igual que IndiceKNNIncremental.consultar_lote().
+        """
+        preguntas = list(preguntas)
+        if not preguntas:
+            return np.empty((0, 0), dtype=object), np.empty((0, 0))
+
+        instantanea = self._instantanea   # Una sola lectura: todo lo demás sale de aquí
+        k = min(k, instantanea.n)
+        if k <= 0:
+            return np.empty((len(preguntas), 0), dtype=object), np.empty((len(preguntas), 0))
+
+        # El tiempo del modelo de embeddings se mide aparte (etapa 'embed')
+        consultas = self._embeber(preguntas)
+        with medir('knn'):
+            similitudes = np.empty((len(preguntas), instantanea.n), dtype=np.float32)
+            for inicio in range(0, instantanea.n, FILAS_POR_BLOQUE):
+                bloque = instantanea.matriz[inicio:min(inicio + FILAS_POR_BLOQUE, instantanea.n)]
+                similitudes[:, inicio:inicio + len(bloque)] = consultas @ bloque.astype(np.float32, copy=False).T
+            indices, distancias = k_vecinos(similitudes, k)
+
+        respuestas = np.empty(indices.shape, dtype=object)
+        for fila, columna in np.ndindex(indices.shape):
+            respuestas[fila, columna] = instantanea.respuestas[int(indices[fila, columna])]
+        return respuestas, distancias
+
+    def consultar_lote(self, preguntas, k=1):
+        return self.buscar(preguntas, k=k)
+
+def crear_indice_denso(embeddings):
+    """Índice denso nuevo, cargado con las preguntas del almacén FAQ."""
+    indice = IndiceDensoIncremental(embeddings)
+    filas = almacen_faq.todas()
+    print(f"🔄 (Denso) Embebiendo {len(filas)} preguntas de la FAQ...")
+    indice.cargar([p for p, _ in filas], [r for _, r in filas])
+    print(f"✅ Caché denso listo. Total de conocimientos en caché: {len(indice)}")
+    return indice
+
+# Índice compartido (con las embeddings de la aplicación), creado al primer uso
+_indice_denso = None
+_lock_indice = threading.Lock()
+
+def obtener_indice_denso(embeddings=None):
+    """
+    Índice denso de la aplicación. Con `embeddings` explícitas (p. ej.
+    EmbeddingsFalsos en pruebas) se crea uno nuevo para quien lo pide.
+    """
+    global _indice_denso
+    if embeddings is not None:
+        return crear_indice_denso(embeddings)
+    with _lock_indice:
+        if _indice_denso is None:
+            _indice_denso = crear_indice_denso(obtener_embeddings(MODELO_EMBEDDING))
+        return _indice_denso
@@ -0,0 +1,174 @@
+# --- modelo_embeddings.py ---
+import os
+import re
+import hashlib
+import sqlite3
+import threading
+import time
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_ollama import OllamaEmbeddings
+
+from logic.cache_lru import CacheLRU
+from logic.metricas import medir, incrementar
+
+# --- CONFIGURACIÓN ---
+MODELO_EMBEDDING = "nomic-embed-text"
+script_dir = os.path.dirname(os.path.abspath(__file__))
+RUTA_CACHE_EMBEDDINGS = os.path.join(os.path.dirname(script_dir), 'data', 'embeddings_cache.sqlite3')
+# Vectores que se conservan en memoria delante de SQLite
+TAMANO_LRU = 4096
+# 'ollama' en producción; 'falso' usa EmbeddingsFalsos (pruebas y benchmarks sin servidor)
+EMBEDDINGS_BACKEND = os.getenv("EMBEDDINGS_BACKEND", "ollama")
+
+class EmbeddingsFalsos(Embeddings):
+    """
+    Embeddings locales y deterministas (derivados del sha256 del texto).
+    Sustituyen a Ollama en pruebas offline; `latencia` simula el tiempo
+    de respuesta del servidor por llamada.
+
+    Con `por_palabras=True` el vector es la suma de un vector por palabra:
+    textos que comparten palabras quedan cerca, como con un modelo real
+    (útil para probar el caché semántico denso).
+    """
+
+    def __init__(self, dimension=768, latencia=0.0, por_palabras=False):
+        self.dimension = dimension
+        self.latencia = latencia
+        self.por_palabras = por_palabras
+
+    def _aleatorio(self, texto):
+        semilla = int.from_bytes(hashlib.sha256(texto.encode('utf-8')).digest()[:8], 'little')
+        return np.random.default_rng(semilla).standard_normal(self.dimension)
+
+    def _vector(self, texto):
+        if self.por_palabras:
+            palabras = re.findall(r'\w+', texto.lower()) or [texto]
+            vector = sum(self._aleatorio(p) for p in palabras)
+        else:
+            vector = self._aleatorio(texto)
+        return (vector / np.linalg.norm(vector)).tolist()
+
+    def embed_documents(self, texts):
+        if self.latencia:
+            time.sleep(self.latencia)
+        return [self._vector(t) for t in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+class EmbeddingsEnCache(Embeddings):
+    """
+    Envuelve un modelo de embeddings con un caché persistente en SQLite
+    (clave: sha256 del modelo + texto) y una capa LRU en memoria.
+    Los textos ya vistos, tanto al entrenar como al consultar, no vuelven
+    a llegar al servidor de embeddings.
+    """
+
+    def __init__(self, base, nombre_modelo, ruta_db=RUTA_CACHE_EMBEDDINGS, tamano_lru=TAMANO_LRU):
+        self.base = base
+        self.nombre_modelo = nombre_modelo
+        self.ruta_db = ruta_db
+        self._memoria = CacheLRU(max_elementos=tamano_lru)
+        self._lock = threading.Lock()
+        self._conexion = None
+
+    # --- Almacenamiento ---
+
+    def _conectar(self):
+        if self._conexion is None:
+            os.makedirs(os.path.dirname(self.ruta_db), exist_ok=True)
+            self._conexion = sqlite3.connect(self.ruta_db, check_same_thread=False, timeout=30)
+            self._conexion.execute("PRAGMA journal_mode=WAL")
+            self._conexion.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings (clave TEXT PRIMARY KEY, vector BLOB NOT NULL)"
+            )
+            self._conexion.commit()
+        return self._conexion
+
+    def _clave(self, texto, tipo):
+        # 'doc' y 'query' por separado: algunos modelos embeben distinto cada caso
+        contenido = f"{self.nombre_modelo}\x00{tipo}\x00{texto}".encode('utf-8')
+        return hashlib.sha256(contenido).hexdigest()
+
+    def _leer_disco(self, claves):
+        encontrados = {}
+        with self._lock:
+            conexion = self._conectar()
+            # SQLite limita el número de parámetros por consulta
+            for i in range(0, len(claves), 500):
+                lote = claves[i:i + 500]
+                marcadores = ','.join('?' * len(lote))
+                filas = conexion.execute(
+                    f"SELECT clave, vector FROM embeddings WHERE clave IN ({marcadores})", lote
+                ).fetchall()
+                for clave, blob in filas:
+                    encontrados[clave] = np.frombuffer(blob, dtype=np.float32).tolist()
+        return encontrados
+
+    def _escribir_disco(self, pares):
+        with self._lock:
+            conexion = self._conectar()
+            conexion.executemany(
+                "INSERT OR REPLACE INTO embeddings (clave, vector) VALUES (?, ?)",
+                [(clave, np.asarray(vector, dtype=np.float32).tobytes()) for clave, vector in pares]
+            )
+            conexion.commit()
+
+    # --- Búsqueda en capas: memoria -> SQLite -> modelo ---
+
+    def _embeber(self, textos, tipo, calcular):
+        claves = [self._clave(t, tipo) for t in textos]
+        vectores = {}
+        for clave in claves:
+            vector = self._memoria.obtener(clave)
+            if vector is not None:
+                vectores[clave] = vector
+
+        incrementar('goit_embeddings_total', len(vectores), origen='memoria')
+
+        faltantes = [c for c in dict.fromkeys(claves) if c not in vectores]
+        if faltantes:
+            en_disco = self._leer_disco(faltantes)
+            incrementar('goit_embeddings_total', len(en_disco), origen='disco')
+            for clave, vector in en_disco.items():
+                vectores[clave] = vector
+                self._memoria.guardar(clave, vector)
+
+        # Solo los textos nunca vistos llegan al servidor de embeddings
+        por_calcular = {}
+        for texto, clave in zip(textos, claves):
+            if clave not in vectores:
+                por_calcular.setdefault(clave, texto)
+        if por_calcular:
+            incrementar('goit_embeddings_total', len(por_calcular), origen='modelo')
+            with medir('embed'):
+                nuevos = calcular(list(por_calcular.values()))
+            pares = list(zip(por_calcular.keys(), nuevos))
+            self._escribir_disco(pares)
+            for clave, vector in pares:
+                vectores[clave] = vector
+                self._memoria.guardar(clave, vector)
+
+        return [vectores[c] for c in claves]
+
+    def embed_documents(self, texts):
+        return self._embeber(list(texts), 'doc', self.base.embed_documents)
+
+    def embed_query(self, text):
+        return self._embeber([text], 'query', lambda ts: [self.base.embed_query(ts[0])])[0]
+
+# Una instancia por modelo y proceso, para compartir la capa en memoria
+_instancias = {}
+_instancias_lock = threading.Lock()
+
+def obtener_embeddings(modelo=MODELO_EMBEDDING):
+    """Función de embeddings (Ollama) con caché, compartida por ingesta y consultas."""
+    with _instancias_lock:
+        if modelo not in _instancias:
+            if EMBEDDINGS_BACKEND == "falso":
+                base, nombre = EmbeddingsFalsos(), f"falso:{modelo}"
+            else:
+                base, nombre = OllamaEmbeddings(model=modelo), modelo
+            _instancias[modelo] = EmbeddingsEnCache(base, nombre)
+        return _instancias[modelo]
@@ -1,94 +1,474 @@
-import pandas as pd
-import re
 import os
-import nltk
-from nltk.corpus import stopwords
-from sklearn.feature_extraction.text import CountVectorizer
-from sklearn.neighbors import NearestNeighbors
-
-# --- INICIALIZACIÓN GLOBAL ---
-
-try:
-    nltk.data.find('corpora/stopwords')
-except LookupError:
-    nltk.download('stopwords')
-
-stop_words_global = set(stopwords.words('spanish'))
-
-# Variables globales
-knn_model = None
-vectorizer = None
-respuestas_knn = []
-
-def limpiar_texto(texto):
-    """Limpia y preprocesa una cadena de texto."""
-    if not isinstance(texto, str):
-        return ""
-    texto = texto.lower()
-    texto = re.sub(r'[^\w\s]', '', texto)
-    texto = re.sub(r'\s+', ' ', texto).strip()
-    palabras = texto.split()
-    palabras_filtradas = [p for p in palabras if p not in stop_words_global]
-    return ' '.join(palabras_filtradas)
-
-def inicializar_knn():
+import json
+import time
+import atexit
+import threading
+import numpy as np
+import scipy.sparse as sp
+
+from data.almacen_faq import almacen_faq
+from logic.normalizacion import normalizar_texto, VERSION_NORMALIZACION
+from logic.metricas import medir
+
+# --- CONFIGURACIÓN DEL ÍNDICE ---
+# Vocabulario fijo por hashing: agregar preguntas nuevas no requiere re-entrenar.
+N_FEATURES = 2 ** 18
+# Cada cuántos segundos se fusionan las filas pendientes con la matriz principal
+INTERVALO_COMPACTACION = 60
+# Si se acumulan más filas pendientes que esto, se adelanta la compactación
+MAX_PENDIENTES = 256
+# Índice ya construido en disco: al iniciar se carga en milisegundos y solo se
+# aplican los cambios de la FAQ posteriores (si son muchos, se reconstruye)
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RUTA_INSTANTANEA_KNN = os.path.join(project_root, 'data', 'knn_snapshot.npz')
+MAX_CAMBIOS_INSTANTANEA = MAX_PENDIENTES
+
+# Normalización compartida con la FAQ y el RAG (ver logic/normalizacion.py);
+# se conserva el nombre histórico para quien lo importe desde aquí
+limpiar_texto = normalizar_texto
+
+def k_vecinos(similitudes, k):
     """
-    Carga los datos y entrena (o re-entrena) el modelo KNN.
-    Esta función se llamará al inicio y cada vez que actualicemos el CSV.
+    Índices (n, k) de las k columnas más similares por fila, de mayor a menor
+    similitud, y sus distancias coseno. Lo comparten los cachés semánticos.
     """
-    global knn_model, vectorizer, respuestas_knn
-    
+    n_consultas = similitudes.shape[0]
+    if k < similitudes.shape[1]:
+        candidatos = np.argpartition(-similitudes, k - 1, axis=1)[:, :k]
+    else:
+        candidatos = np.tile(np.arange(similitudes.shape[1]), (n_consultas, 1))
+    sim_candidatos = np.take_along_axis(similitudes, candidatos, axis=1)
+    orden = np.argsort(-sim_candidatos, axis=1, kind='stable')
+    indices = np.take_along_axis(candidatos, orden, axis=1)
+    distancias = np.clip(1.0 - np.take_along_axis(sim_candidatos, orden, axis=1), 0.0, 1.0)
+    return indices, distancias
+
+class InstantaneaKNN:
+    """
+    Estado inmutable del índice en un momento dado. Los lectores toman una
+    referencia y trabajan con ella completa (vectores y respuestas siempre
+    coinciden); los escritores construyen otra y la publican de un golpe.
+    """
+
+    __slots__ = ('matriz', 'respuestas', 'matriz_pendientes', 'respuestas_pendientes', 'reemplazos')
+
+    def __init__(self, matriz, respuestas, matriz_pendientes=None,
+                 respuestas_pendientes=(), reemplazos=None):
+        self.matriz = matriz                            # Filas compactadas (CSR)
+        self.respuestas = respuestas                    # tuple, una por fila de `matriz`
+        self.matriz_pendientes = matriz_pendientes      # Filas agregadas desde la última compactación
+        self.respuestas_pendientes = respuestas_pendientes
+        self.reemplazos = reemplazos or {}              # índice -> respuesta nueva (sin compactar)
+
+    def __len__(self):
+        return len(self.respuestas) + len(self.respuestas_pendientes)
+
+    def respuesta(self, indice):
+        if indice in self.reemplazos:
+            return self.reemplazos[indice]
+        if indice < len(self.respuestas):
+            return self.respuestas[indice]
+        return self.respuestas_pendientes[indice - len(self.respuestas)]
+
+class IndiceKNNIncremental:
+    """
+    Caché semántico incremental (similitud coseno sobre vectores de hashing).
+
+    Las preguntas nuevas se vectorizan con un vocabulario fijo y se agregan
+    como filas pendientes; un hilo en segundo plano las fusiona periódicamente
+    con la matriz principal, así que una escritura nunca re-entrena el índice.
+
+    Las consultas leen una InstantaneaKNN sin tomar ningún lock: cada cambio
+    crea una instantánea nueva a un lado y la publica reemplazando la referencia.
+    """
+
+    def __init__(self, n_features=N_FEATURES):
+        self.n_features = n_features
+        self._vectorizer = None
+        self._instantanea = InstantaneaKNN(sp.csr_matrix((0, n_features)), ())
+        # Solo serializa a los escritores; los lectores nunca lo toman
+        self._lock_escritura = threading.RLock()
+        self._posiciones = {}   # Pregunta limpia -> índice de fila (solo escritores)
+        self._evento_compactar = threading.Event()
+        self._hilo_compactacion = None
+        self._intervalo_compactacion = None   # Se fija con iniciar_compactacion()
+        self._sincronizar = None              # Se llama en cada vuelta del hilo, antes de compactar
+
+    def __len__(self):
+        return len(self._instantanea)
+
+    @property
+    def vectorizer(self):
+        # Import diferido: sklearn tarda más de un segundo en importarse
+        if self._vectorizer is None:
+            from sklearn.feature_extraction.text import HashingVectorizer
+            self._vectorizer = HashingVectorizer(
+                n_features=self.n_features, alternate_sign=False, norm='l2'
+            )
+        return self._vectorizer
+
+    def _vectorizar(self, preguntas_limpias):
+        return self.vectorizer.transform(preguntas_limpias)
+
+    def cargar(self, preguntas, respuestas):
+        """Reconstruye el índice completo (carga inicial desde faq.csv)."""
+        posiciones = {}
+        preguntas_unicas = []
+        respuestas_unicas = []
+        for pregunta, respuesta in zip(preguntas, respuestas):
+            limpia = limpiar_texto(str(pregunta))
+            if limpia in posiciones:
+                # Las filas posteriores del CSV sustituyen a las anteriores
+                respuestas_unicas[posiciones[limpia]] = respuesta
+                continue
+            posiciones[limpia] = len(preguntas_unicas)
+            preguntas_unicas.append(limpia)
+            respuestas_unicas.append(respuesta)
+
+        # Se construye a un lado; las consultas en curso siguen con la instantánea anterior
+        nueva = InstantaneaKNN(self._vectorizar(preguntas_unicas).tocsr(), tuple(respuestas_unicas))
+        with self._lock_escritura:
+            self._posiciones = posiciones
+            self._instantanea = nueva
+
+    def add(self, pregunta, respuesta):
+        """Agrega una pregunta al caché (si ya existe, actualiza su respuesta)."""
+        limpia = limpiar_texto(pregunta)
+        with self._lock_escritura:
+            if limpia in self._posiciones:
+                self._reemplazar_en(self._posiciones[limpia], respuesta)
+                return
+            actual = self._instantanea
+            fila = self._vectorizar([limpia])
+            if actual.matriz_pendientes is None:
+                pendientes = fila.tocsr()
+            else:
+                pendientes = sp.vstack([actual.matriz_pendientes, fila], format='csr')
+            self._posiciones[limpia] = len(actual)
+            self._instantanea = InstantaneaKNN(
+                actual.matriz, actual.respuestas, pendientes,
+                actual.respuestas_pendientes + (respuesta,), actual.reemplazos
+            )
+            self._asegurar_compactacion()
+            if pendientes.shape[0] >= MAX_PENDIENTES:
+                self._evento_compactar.set()
+
+    def replace(self, pregunta, respuesta):
+        """Reemplaza la respuesta de una pregunta (si no existe, la agrega)."""
+        limpia = limpiar_texto(pregunta)
+        with self._lock_escritura:
+            if limpia not in self._posiciones:
+                self.add(pregunta, respuesta)
+                return
+            self._reemplazar_en(self._posiciones[limpia], respuesta)
+
+    def _reemplazar_en(self, indice, respuesta):
+        actual = self._instantanea
+        self._instantanea = InstantaneaKNN(
+            actual.matriz, actual.respuestas, actual.matriz_pendientes,
+            actual.respuestas_pendientes, {**actual.reemplazos, indice: respuesta}
+        )
+
+    def compactar(self):
+        """Fusiona filas pendientes y reemplazos en una instantánea compacta."""
+        with self._lock_escritura:
+            actual = self._instantanea
+            if actual.matriz_pendientes is None and not actual.reemplazos:
+                return
+            matriz = actual.matriz
+            if actual.matriz_pendientes is not None:
+                matriz = sp.vstack([matriz, actual.matriz_pendientes], format='csr')
+            respuestas = tuple(actual.respuesta(i) for i in range(len(actual)))
+            self._instantanea = InstantaneaKNN(matriz, respuestas)
+
+    def consultar(self, pregunta_limpia):
+        """Devuelve (respuesta, distancia coseno) del vecino más cercano."""
+        respuestas, distancias = self.consultar_lote([pregunta_limpia], k=1)
+        if respuestas.shape[1] == 0:
+            return None, 1.0
+        return respuestas[0, 0], float(distancias[0, 0])
+
+    def consultar_lote(self, preguntas_limpias, k=1):
+        """
+        Busca los k vecinos más cercanos de varias preguntas a la vez.
+        Retorna dos arreglos (n, k): respuestas (dtype object) y distancias
+        coseno ordenadas de menor a mayor. Las filas ya están normalizadas
+        (L2), así que todo el lote se resuelve con una sola multiplicación
+        dispersa por bloque de la instantánea.
+        """
+        preguntas_limpias = list(preguntas_limpias)
+        if not preguntas_limpias:
+            return np.empty((0, 0), dtype=object), np.empty((0, 0))
+
+        X_consultas = self._vectorizar(preguntas_limpias)
+        instantanea = self._instantanea   # Una sola lectura: todo lo demás sale de aquí
+
+        n_consultas = X_consultas.shape[0]
+        k = min(k, len(instantanea))
+        if k <= 0:
+            return np.empty((n_consultas, 0), dtype=object), np.empty((n_consultas, 0))
+
+        similitudes = (X_consultas @ instantanea.matriz.T).toarray()
+        if instantanea.matriz_pendientes is not None:
+            similitudes = np.hstack(
+                [similitudes, (X_consultas @ instantanea.matriz_pendientes.T).toarray()]
+            )
+        indices, distancias = k_vecinos(similitudes, k)
+
+        respuestas = np.empty(indices.shape, dtype=object)
+        for fila, columna in np.ndindex(indices.shape):
+            respuestas[fila, columna] = instantanea.respuesta(int(indices[fila, columna]))
+        return respuestas, distancias
+
+    def buscar(self, preguntas, k=1):
+        """consultar_lote() a partir de las preguntas tal como las escribió el usuario."""
+        with medir('normalize'):
+            preguntas_limpias = [limpiar_texto(p) for p in preguntas]
+        with medir('knn'):
+            return self.consultar_lote(preguntas_limpias, k=k)
+
+    # --- Persistencia ---
+
+    def guardar(self, ruta, metadatos):
+        """
+        Guarda la instantánea compactada (matriz CSR, preguntas limpias y
+        respuestas) en un .npz, sin pickle. Se escribe a un lado y se
+        reemplaza, así que un proceso que lee nunca ve un archivo a medias.
+        """
+        # Compactar y leer bajo el mismo lock: un add() intermedio dejaría una
+        # pregunta en _posiciones sin su fila en la matriz compactada
+        with self._lock_escritura:
+            self.compactar()
+            instantanea = self._instantanea
+            preguntas = list(self._posiciones)   # En orden de fila
+        matriz = instantanea.matriz.tocsr()
+        metadatos = {**metadatos, "n_features": matriz.shape[1], "filas": matriz.shape[0]}
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        # Temporal por proceso: varios workers pueden guardar a la vez al apagarse
+        temporal = f"{ruta}.{os.getpid()}.tmp"
+        with open(temporal, 'wb') as f:
+            np.savez(
+                f,
+                data=matriz.data, indices=matriz.indices, indptr=matriz.indptr,
+                preguntas=np.array(json.dumps(preguntas, ensure_ascii=False)),
+                respuestas=np.array(json.dumps(list(instantanea.respuestas), ensure_ascii=False)),
+                metadatos=np.array(json.dumps(metadatos)),
+            )
+        os.replace(temporal, ruta)
+
+    def cargar_guardado(self, ruta):
+        """
+        Reemplaza el índice por la instantánea guardada en `ruta`.
+        Retorna sus metadatos, o None si no existe o no es compatible
+        (otro número de features).
+        """
+        if not os.path.exists(ruta):
+            return None
+        with np.load(ruta, allow_pickle=False) as datos:
+            metadatos = json.loads(str(datos['metadatos']))
+            if metadatos.get("n_features") != self.n_features:
+                return None
+            matriz = sp.csr_matrix((datos['data'], datos['indices'], datos['indptr']),
+                                   shape=(metadatos["filas"], metadatos["n_features"]))
+            preguntas = json.loads(str(datos['preguntas']))
+            respuestas = json.loads(str(datos['respuestas']))
+        if not (len(preguntas) == len(respuestas) == matriz.shape[0]):
+            return None
+
+        nueva = InstantaneaKNN(matriz, tuple(respuestas))
+        with self._lock_escritura:
+            self._posiciones = {pregunta: i for i, pregunta in enumerate(preguntas)}
+            self._instantanea = nueva
+        return metadatos
+
+    def iniciar_compactacion(self, intervalo=INTERVALO_COMPACTACION, sincronizar=None):
+        """
+        Arranca (una sola vez) el hilo de compactación en segundo plano.
+        `sincronizar`, si se da, se llama en cada vuelta antes de compactar
+        (p. ej. para aplicar lo que otros workers escribieron en la FAQ).
+        """
+        with self._lock_escritura:
+            self._intervalo_compactacion = intervalo
+            if sincronizar is not None:
+                self._sincronizar = sincronizar
+            if self._hilo_compactacion and self._hilo_compactacion.is_alive():
+                return
+            self._hilo_compactacion = threading.Thread(
+                target=self._bucle_compactacion, args=(intervalo,),
+                name="knn-compactacion", daemon=True
+            )
+            self._hilo_compactacion.start()
+
+    def _asegurar_compactacion(self):
+        """Relanza el hilo de compactación si se había iniciado y ya no existe (p. ej. tras un fork)."""
+        if (self._intervalo_compactacion is not None
+                and not (self._hilo_compactacion and self._hilo_compactacion.is_alive())):
+            self.iniciar_compactacion(self._intervalo_compactacion)
+
+    def reiniciar_tras_fork(self):
+        """
+        En el proceso hijo de un fork (gunicorn --preload): el lock pudo copiarse
+        tomado por un hilo que en el hijo no existe. El hilo de compactación
+        tampoco sobrevive; add() lo vuelve a lanzar.
+        """
+        self._lock_escritura = threading.RLock()
+        self._evento_compactar = threading.Event()
+
+    def _bucle_compactacion(self, intervalo):
+        while True:
+            self._evento_compactar.wait(timeout=intervalo)
+            self._evento_compactar.clear()
+            try:
+                if self._sincronizar is not None:
+                    self._sincronizar()
+                self.compactar()
+            except Exception as e:
+                print(f"❌ Error compactando índice KNN: {e}")
+
+# Índice global compartido por la aplicación; se carga al primer uso (obtener_indice_knn)
+indice_knn = IndiceKNNIncremental()
+_lock_inicio = threading.Lock()
+_knn_listo = False
+# Estado de la FAQ (filas, secuencia) que refleja el índice; se guarda con la instantánea
+_estado_faq = None
+
+def inicializar_knn(ruta_instantanea=RUTA_INSTANTANEA_KNN):
+    """
+    Prepara el índice KNN. Si hay una instantánea compatible se carga y solo
+    se aplican las preguntas de la FAQ modificadas después; si no (o si los
+    cambios son muchos) se construye completo desde el almacén FAQ.
+    Después el caché crece con agregar_conocimiento() y, en el hilo de
+    compactación, con lo que otros workers escriban en la FAQ.
+    """
+    global _estado_faq
     try:
-        script_dir = os.path.dirname(os.path.abspath(__file__))
-        root_dir = os.path.dirname(script_dir)
-        ruta_faq = os.path.join(root_dir, 'data', 'faq.csv')
-        
-        print(f"🔄 (KNN) Entrenando/Actualizando modelo con datos de: {ruta_faq}")
-
-        df = pd.read_csv(ruta_faq)
-        
-        # Validación básica
-        if 'Pregunta' not in df.columns or 'Respuesta' not in df.columns:
-            print("❌ Error KNN: Columnas faltantes en faq.csv")
-            return
-
-        # Limpieza
-        preguntas_limpias = [limpiar_texto(str(p)) for p in df['Pregunta']]
-        respuestas_knn = df['Respuesta'].tolist()
-
-        # Entrenamiento
-        vectorizer = CountVectorizer()
-        X_dataset = vectorizer.fit_transform(preguntas_limpias)
-
-        knn_model = NearestNeighbors(n_neighbors=1, metric='cosine')
-        knn_model.fit(X_dataset)
-        
-        print(f"✅ Modelo KNN actualizado. Total de conocimientos en caché: {len(respuestas_knn)}")
-
-    except FileNotFoundError:
-        print(f"❌ Error: No se encuentra el archivo {ruta_faq}")
+        inicio = time.perf_counter()
+        # El estado se lee antes que las filas: lo que llegue después se vuelve a aplicar al iniciar
+        filas_faq, secuencia_faq = almacen_faq.estado()
+
+        metadatos = None
+        try:
+            metadatos = indice_knn.cargar_guardado(ruta_instantanea)
+        except Exception as e:
+            print(f"⚠️ Instantánea KNN ilegible, se reconstruye el índice: {e}")
+
+        cambios = None
+        # Instantáneas anteriores guardaban una hora ("marca_faq"), no una secuencia: se reconstruyen
+        if (metadatos and metadatos.get("version_normalizacion") == VERSION_NORMALIZACION
+                and "secuencia_faq" in metadatos and filas_faq >= metadatos.get("filas_faq", 0)):
+            cambios = almacen_faq.modificadas_desde(metadatos["secuencia_faq"])
+            if len(cambios) > MAX_CAMBIOS_INSTANTANEA:
+                cambios = None
+
+        if cambios is None:
+            print(f"🔄 (KNN) Construyendo índice con datos de: {almacen_faq.ruta_db}")
+            cambios = almacen_faq.todas()
+            indice_knn.cargar([p for p, _ in cambios], [r for _, r in cambios])
+            origen = "FAQ completa"
+        else:
+            for pregunta, respuesta in cambios:
+                indice_knn.replace(pregunta, respuesta)
+            origen = f"instantánea + {len(cambios)} cambios"
+
+        _estado_faq = (filas_faq, secuencia_faq)
+        indice_knn.iniciar_compactacion(sincronizar=sincronizar_con_faq)
+        if cambios:
+            guardar_instantanea_knn(ruta_instantanea)
+
+        print(f"✅ Índice KNN listo ({origen}, {time.perf_counter() - inicio:.2f} s). "
+              f"Total de conocimientos en caché: {len(indice_knn)}")
+
     except Exception as e:
         print(f"❌ Error al entrenar KNN: {e}")
 
-# Carga inicial
-inicializar_knn()
+def sincronizar_con_faq():
+    """
+    Aplica al índice las preguntas de la FAQ escritas después de la última
+    sincronización, incluidas las de otros workers (cada uno solo aprende
+    al momento sus propias respuestas). Retorna cuántos cambios aplicó.
+    """
+    global _estado_faq
+    if _estado_faq is None:
+        return 0
+    # Igual que al iniciar: el estado se lee antes que las filas
+    filas_faq, secuencia_faq = almacen_faq.estado()
+    if secuencia_faq <= _estado_faq[1]:
+        return 0
+    cambios = almacen_faq.modificadas_desde(_estado_faq[1])
+    for pregunta, respuesta in cambios:
+        indice_knn.replace(pregunta, respuesta)
+    _estado_faq = (filas_faq, secuencia_faq)
+    return len(cambios)
 
-def obtener_respuesta_knn(pregunta_usuario):
-    global knn_model, vectorizer, respuestas_knn
-    
-    if not knn_model:
-        return None, 1.0
+def guardar_instantanea_knn(ruta_instantanea=RUTA_INSTANTANEA_KNN):
+    """Guarda el índice actual para el próximo arranque (solo si ya se cargó)."""
+    if _estado_faq is None:
+        return
+    try:
+        filas_faq, secuencia_faq = _estado_faq
+        indice_knn.guardar(ruta_instantanea, {
+            "version_normalizacion": VERSION_NORMALIZACION,
+            "filas_faq": filas_faq,
+            "secuencia_faq": secuencia_faq,
+        })
+    except Exception as e:
+        print(f"⚠️ No se pudo guardar la instantánea KNN: {e}")
+
+# Al salir se guarda lo aprendido: el siguiente arranque aplica menos cambios
+atexit.register(guardar_instantanea_knn)
+
+def _reiniciar_tras_fork():
+    """
+    Un worker creado con fork mientras el padre cargaba el índice heredaría
+    _lock_inicio tomado para siempre. Se recrea; si la carga no había
+    terminado (_knn_listo falso), el hijo la repite completa.
+    """
+    global _lock_inicio
+    _lock_inicio = threading.Lock()
+    indice_knn.reiniciar_tras_fork()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reiniciar_tras_fork)
+
+def obtener_indice_knn():
+    """Índice KNN de la aplicación, cargado la primera vez que se pide."""
+    global _knn_listo
+    if not _knn_listo:
+        with _lock_inicio:
+            if not _knn_listo:
+                inicializar_knn()
+                _knn_listo = True
+    return indice_knn
+
+def knn_listo():
+    return _knn_listo
 
+def agregar_conocimiento(pregunta, respuesta):
+    """Agrega una respuesta nueva al caché semántico sin re-entrenar."""
+    obtener_indice_knn().add(pregunta, respuesta)
+
+def reemplazar_conocimiento(pregunta, respuesta):
+    """Actualiza la respuesta guardada para una pregunta del caché."""
+    obtener_indice_knn().replace(pregunta, respuesta)
+
+def obtener_respuestas_knn_lote(preguntas, k=1):
+    """
+    Versión vectorizada de obtener_respuesta_knn para listas de preguntas
+    (evaluaciones offline, pruebas de carga, re-ranking).
+    Retorna (respuestas, distancias) como arreglos NumPy de forma (n, k).
+    """
+    try:
+        return obtener_indice_knn().buscar(preguntas, k=k)
+
+    except Exception as e:
+        print(f"Error KNN batch query: {e}")
+        n = len(preguntas)
+        return np.empty((n, 0), dtype=object), np.empty((n, 0))
+
+def obtener_respuesta_knn(pregunta_usuario):
     try:
         pregunta_usuario_limpia = limpiar_texto(pregunta_usuario)
-        X_usuario = vectorizer.transform([pregunta_usuario_limpia])
-        distancias, indices = knn_model.kneighbors(X_usuario)
-
-        indice_respuesta = indices[0][0]
-        distancia = distancias[0][0]
-        
-        respuesta_encontrada = respuestas_knn[indice_respuesta]
-        return respuesta_encontrada, distancia
+        return obtener_indice_knn().consultar(pregunta_usuario_limpia)
     
     except Exception as e:
         print(f"Error KNN query: {e}")
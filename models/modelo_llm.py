@@ -3,10 +3,14 @@ import os
 from operator import itemgetter
 from dotenv import load_dotenv # <--- NUEVA IMPORTACIÓN
 from langchain_community.vectorstores import Chroma
-from langchain_ollama import OllamaEmbeddings
+from models.modelo_embeddings import obtener_embeddings
 from langchain_groq import ChatGroq
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
+from langchain_core.runnables import RunnableLambda
+from logic.cache_lru import CacheLRU
+from logic.metricas import medir, incrementar, observar
+from logic.normalizacion import normalizar_texto
 
 # --- CARGAR VARIABLES DE ENTORNO ---
 # Esto busca el archivo .env y carga las variables
@@ -16,23 +20,64 @@ load_dotenv()
 CHROMA_PATH = "data/chroma_db_web" 
 MODELO_EMBEDDING = "nomic-embed-text"
 MODELO_GROQ = "openai/gpt-oss-120b"
+# Caché de documentos recuperados por pregunta normalizada
+TAMANO_CACHE_RECUPERACION = 512
+TTL_CACHE_RECUPERACION = 3600  # segundos
 
 # Ahora obtenemos la Key desde el entorno de manera segura
 GROQ_API_KEY = os.getenv("GROQ_API_KEY") 
 
-# Verificación de seguridad (opcional pero recomendada)
-if not GROQ_API_KEY:
-    raise ValueError("Error: No se encontró la GROQ_API_KEY en el archivo .env")
+cache_recuperacion = CacheLRU(max_elementos=TAMANO_CACHE_RECUPERACION, ttl=TTL_CACHE_RECUPERACION)
+
+def version_vector_store():
+    """
+    Versión de la base vectorial: el entrenamiento escribe un valor nuevo en
+    este archivo (ver admin_db.marcar_version_vector_store) y así invalida
+    los cachés, incluso en otros procesos. Se compara el contenido, no la
+    fecha: dos escrituras en el mismo instante del sistema de archivos
+    tendrían la misma fecha de modificación.
+    """
+    try:
+        with open(os.path.join(CHROMA_PATH, '.version'), 'r', encoding='utf-8') as f:
+            return f.read().strip()
+    except OSError:
+        return ""
+
+def crear_recuperador_en_cache(retriever):
+    """
+    Envuelve el retriever: las preguntas equivalentes (misma forma normalizada)
+    reutilizan los documentos ya recuperados y se saltan el embedding y la
+    búsqueda vectorial mientras la base no cambie.
+    """
+    def recuperar(pregunta):
+        clave = normalizar_texto(pregunta) or pregunta.strip().lower()
+        version = version_vector_store()
+        guardado = cache_recuperacion.obtener(clave)
+        if guardado is not None and guardado[0] == version:
+            incrementar('goit_cache_recuperacion_total', resultado='acierto')
+            return guardado[1]
+        incrementar('goit_cache_recuperacion_total', resultado='fallo')
+        with medir('vector_search'):
+            documentos = retriever.invoke(pregunta)
+        cache_recuperacion.guardar(clave, (version, documentos))
+        return documentos
+
+    return RunnableLambda(recuperar)
 
 def obtener_cadena_rag():
+    # Verificación de seguridad: sin clave no hay LLM (el caché semántico sigue funcionando)
+    if not GROQ_API_KEY:
+        raise ValueError("Error: No se encontró la GROQ_API_KEY en el archivo .env")
+
     if not os.path.exists(CHROMA_PATH):
         return None 
 
-    embedding_function = OllamaEmbeddings(model=MODELO_EMBEDDING)
+    # Embeddings con caché: preguntas repetidas no vuelven a pasar por Ollama
+    embedding_function = obtener_embeddings(MODELO_EMBEDDING)
     vectorstore = Chroma(persist_directory=CHROMA_PATH, embedding_function=embedding_function)
     
-    # Configurar el recuperador
-    retriever = vectorstore.as_retriever(search_kwargs={"k": 5})
+    # Configurar el recuperador (con caché de resultados)
+    retriever = crear_recuperador_en_cache(vectorstore.as_retriever(search_kwargs={"k": 5}))
 
     # Template con Historial
     template = """
@@ -57,6 +102,9 @@ def obtener_cadena_rag():
     
     # Pasamos la API Key recuperada
     llm = ChatGroq(model=MODELO_GROQ, api_key=GROQ_API_KEY)
+    # Tiempo de generación (también en streaming: se registra al terminar)
+    llm = llm.with_listeners(on_end=lambda run: observar(
+        'goit_etapa_segundos', (run.end_time - run.start_time).total_seconds(), etapa='llm'))
 
     def format_docs(docs):
         return "\n\n".join(doc.page_content for doc in docs)
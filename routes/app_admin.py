@@ -1,8 +1,11 @@
 import os
 import json
+import functools
 import shutil
 import sys
-from flask import Blueprint, render_template, request, redirect, url_for, session, flash
+import threading
+from datetime import datetime
+from flask import Blueprint, render_template, request, redirect, url_for, session, flash, jsonify, Response
 from werkzeug.utils import secure_filename
 from werkzeug.security import check_password_hash, generate_password_hash
 
@@ -40,15 +43,28 @@ print(f"✅ Carpeta de datos: {DATA_DIR}")
 # ==========================================
 try:
     # Importamos la lógica de base de datos (Entrenamiento)
-    from data.admin_db import actualizar_base_datos_completa
+    from data.admin_db import actualizar_base_datos_completa, eliminar_fuente
     # Importamos la lógica de registro de usuarios (Estadísticas y Logs)
-    from logic.access_tracker import obtener_estadisticas_diarias, obtener_todos_los_registros
+    from logic.access_tracker import obtener_estadisticas_diarias, obtener_registros_paginados
+    # Cola de entrenamientos en segundo plano
+    from logic.tareas_entrenamiento import iniciar_entrenamiento, obtener_trabajo, obtener_ultimo_trabajo
+    # Latencias y aciertos del chat
+    from logic.metricas import metricas, tasa_aciertos_cache
+    # Preguntas frecuentes aprendidas por el chat (caché semántico)
+    from data.almacen_faq import almacen_faq
 except ImportError as e:
     print(f"❌ Error importando módulos locales: {e}")
     # Funciones vacías para evitar caídas si faltan archivos
     def obtener_estadisticas_diarias(): return {}
-    def obtener_todos_los_registros(): return []
-    def actualizar_base_datos_completa(reg): pass
+    def obtener_registros_paginados(limite=50, cursor=None, desde=None, hasta=None, programa=None): return [], None
+    def actualizar_base_datos_completa(reg, progreso=None, leer_registro=None): pass
+    def eliminar_fuente(tipo, clave): return 0
+    def iniciar_entrenamiento(reg, funcion, al_actualizar_fuente=None): return None
+    def obtener_trabajo(id_trabajo): return None
+    def obtener_ultimo_trabajo(): return None
+    almacen_faq = None
+    metricas = None
+    def tasa_aciertos_cache(): return None
 
 admin_bp = Blueprint('admin', __name__, url_prefix='/admin')
 
@@ -65,6 +81,8 @@ if not os.path.exists(REGISTRY_FILE):
 # ==========================================
 ADMIN_USER = os.getenv("ADMIN_USER", "admin")
 ADMIN_PASS_HASH = generate_password_hash(os.getenv("ADMIN_PASS", "admin"))
+# Tamaño máximo de página del registro de accesos
+MAX_REGISTROS_POR_PAGINA = 500
 
 def login_required(f):
     from functools import wraps
@@ -75,6 +93,10 @@ def login_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+# El hilo de entrenamiento escribe el registro mientras las rutas siguen activas:
+# toda lectura-modificación-escritura de registry.json va bajo este lock
+registry_lock = threading.Lock()
+
 def load_registry():
     """Carga el JSON de registro de archivos."""
     try:
@@ -84,9 +106,34 @@ def load_registry():
         return {"pdfs": [], "urls": []}
 
 def save_registry(data):
-    """Guarda cambios en el JSON."""
-    with open(REGISTRY_FILE, 'w', encoding='utf-8') as f:
+    """Guarda cambios en el JSON (archivo temporal + reemplazo: nunca queda a medias)."""
+    temporal = f"{REGISTRY_FILE}.tmp"
+    with open(temporal, 'w', encoding='utf-8') as f:
         json.dump(data, f, indent=4)
+    os.replace(temporal, REGISTRY_FILE)
+
+def _eliminar_de_indice(tipo, clave):
+    """Quita de ChromaDB los fragmentos de una fuente borrada (sin esperar a re-entrenar)."""
+    try:
+        eliminar_fuente(tipo, clave)
+    except Exception as e:
+        print(f"⚠️ No se pudieron borrar los fragmentos de {clave}: {e}")
+
+def registro_vigente():
+    """registry.json tal como está ahora (lo consulta el entrenamiento en curso)."""
+    with registry_lock:
+        return load_registry()
+
+def actualizar_estado_fuente(tipo, clave, estado):
+    """Actualiza en registry.json el estado de una URL o PDF (lo llama el entrenamiento)."""
+    campo_lista, campo_clave = ('urls', 'url') if tipo == 'url' else ('pdfs', 'filename')
+    with registry_lock:
+        registry = load_registry()
+        for item in registry.get(campo_lista, []):
+            if item.get(campo_clave) == clave:
+                item['status'] = estado
+                save_registry(registry)
+                break
 
 # ==========================================
 # 4. RUTAS PRINCIPALES (DASHBOARD)
@@ -115,17 +162,38 @@ def logout():
 def dashboard():
     registry = load_registry()
     
-    # 1. Estadísticas para gráficas (Tarjetas)
+    # Estadísticas para gráficas (Tarjetas): conteos ya agregados, no se lee el CSV.
+    # La tabla detallada (Modal) pide sus páginas a /api/access_logs al abrirse.
     stats = obtener_estadisticas_diarias()
     
-    # 2. Lista completa para la tabla detallada (Modal)
-    access_logs = obtener_todos_los_registros()
-    
     return render_template('admin/dashboard.html', 
                            pdfs=registry.get('pdfs', []), 
                            urls=registry.get('urls', []),
-                           stats=stats,           # <-- Datos para tarjetas
-                           access_logs=access_logs) # <-- Datos para tabla detallada
+                           stats=stats)           # <-- Datos para tarjetas
+
+@admin_bp.route('/api/access_logs', methods=['GET'])
+@login_required
+def api_access_logs():
+    """
+    Registro de accesos paginado (lo más nuevo primero).
+    Parámetros: limit, cursor (de la respuesta anterior), desde/hasta (YYYY-MM-DD) y programa.
+    """
+    try:
+        limite = min(max(int(request.args.get('limit', 50)), 1), MAX_REGISTROS_POR_PAGINA)
+        cursor = request.args.get('cursor') or None
+        desde = request.args.get('desde') or None
+        hasta = request.args.get('hasta') or None
+        for fecha in (desde, hasta):
+            if fecha:
+                datetime.strptime(fecha, '%Y-%m-%d')
+        registros, siguiente = obtener_registros_paginados(
+            limite=limite, cursor=cursor, desde=desde, hasta=hasta,
+            programa=request.args.get('programa') or None
+        )
+    except ValueError:
+        return jsonify({"error": "Parámetros inválidos"}), 400
+
+    return jsonify({"registros": registros, "siguiente_cursor": siguiente})
 
 # ==========================================
 # 5. GESTIÓN DE PDF (SUBIR, BORRAR, EDITAR)
@@ -153,16 +221,19 @@ def upload_pdf():
         # 2. Guardar en JSON (Ruta Relativa para compatibilidad)
         rel_path = os.path.join('data', 'uploads', filename).replace('\\', '/')
         
-        registry = load_registry()
-        if 'pdfs' not in registry: registry['pdfs'] = []
-
-        if not any(c['filename'] == filename for c in registry['pdfs']):
-            registry['pdfs'].append({
-                "filename": filename,
-                "path": rel_path,
-                "status": "En espera" 
-            })
-            save_registry(registry)
+        with registry_lock:
+            registry = load_registry()
+            if 'pdfs' not in registry: registry['pdfs'] = []
+
+            nuevo = not any(c['filename'] == filename for c in registry['pdfs'])
+            if nuevo:
+                registry['pdfs'].append({
+                    "filename": filename,
+                    "path": rel_path,
+                    "status": "En espera" 
+                })
+                save_registry(registry)
+        if nuevo:
             flash('PDF cargado correctamente.', 'success')
         else:
             flash('Este archivo ya existe.', 'warning')
@@ -175,21 +246,26 @@ def upload_pdf():
 @login_required
 def delete_pdf():
     filename = request.form.get('filename')
-    registry = load_registry()
-    
-    original_count = len(registry.get('pdfs', []))
-    registry['pdfs'] = [p for p in registry.get('pdfs', []) if p['filename'] != filename]
-    
-    if len(registry['pdfs']) < original_count:
-        # Borrado físico
-        file_path = os.path.join(UPLOAD_FOLDER, filename)
-        if os.path.exists(file_path):
-            try:
-                os.remove(file_path)
-            except Exception as e:
-                print(f"Error borrando archivo físico: {e}")
+    with registry_lock:
+        registry = load_registry()
         
-        save_registry(registry)
+        original_count = len(registry.get('pdfs', []))
+        registry['pdfs'] = [p for p in registry.get('pdfs', []) if p['filename'] != filename]
+        eliminado = len(registry['pdfs']) < original_count
+        
+        if eliminado:
+            # Borrado físico
+            file_path = os.path.join(UPLOAD_FOLDER, filename)
+            if os.path.exists(file_path):
+                try:
+                    os.remove(file_path)
+                except Exception as e:
+                    print(f"Error borrando archivo físico: {e}")
+            
+            save_registry(registry)
+
+    if eliminado:
+        _eliminar_de_indice('pdf', filename)
         flash(f'PDF "{filename}" eliminado.', 'success')
     else:
         flash('No se encontró el archivo.', 'error')
@@ -211,38 +287,41 @@ def edit_pdf():
         new_name_input += '.pdf'
     new_filename = secure_filename(new_name_input)
     
-    registry = load_registry()
-    found = False
-    
-    # Verificar duplicados
-    if any(p['filename'] == new_filename for p in registry.get('pdfs', [])) and original_name != new_filename:
-        flash('Ya existe un archivo con ese nombre.', 'warning')
-        return redirect(url_for('admin.dashboard'))
+    with registry_lock:
+        registry = load_registry()
+        found = False
+        
+        # Verificar duplicados
+        if any(p['filename'] == new_filename for p in registry.get('pdfs', [])) and original_name != new_filename:
+            flash('Ya existe un archivo con ese nombre.', 'warning')
+            return redirect(url_for('admin.dashboard'))
+
+        for item in registry.get('pdfs', []):
+            if item['filename'] == original_name:
+                # Renombrar físico
+                old_abs_path = os.path.join(UPLOAD_FOLDER, original_name)
+                new_abs_path = os.path.join(UPLOAD_FOLDER, new_filename)
+                
+                try:
+                    if os.path.exists(old_abs_path):
+                        os.rename(old_abs_path, new_abs_path)
+                        
+                        # Actualizar JSON
+                        item['filename'] = new_filename
+                        item['path'] = os.path.join('data', 'uploads', new_filename).replace('\\', '/')
+                        item['status'] = 'En espera'
+                        found = True
+                    else:
+                        flash('El archivo físico original no existe.', 'error')
+                except Exception as e:
+                    print(f"Error renombrando: {e}")
+                    flash('Error del sistema al renombrar.', 'error')
+                break
+                
+        if found:
+            save_registry(registry)
 
-    for item in registry.get('pdfs', []):
-        if item['filename'] == original_name:
-            # Renombrar físico
-            old_abs_path = os.path.join(UPLOAD_FOLDER, original_name)
-            new_abs_path = os.path.join(UPLOAD_FOLDER, new_filename)
-            
-            try:
-                if os.path.exists(old_abs_path):
-                    os.rename(old_abs_path, new_abs_path)
-                    
-                    # Actualizar JSON
-                    item['filename'] = new_filename
-                    item['path'] = os.path.join('data', 'uploads', new_filename).replace('\\', '/')
-                    item['status'] = 'En espera'
-                    found = True
-                else:
-                    flash('El archivo físico original no existe.', 'error')
-            except Exception as e:
-                print(f"Error renombrando: {e}")
-                flash('Error del sistema al renombrar.', 'error')
-            break
-            
     if found:
-        save_registry(registry)
         flash(f'Renombrado a "{new_filename}".', 'success')
     else:
         flash('No se encontró el registro.', 'error')
@@ -260,16 +339,19 @@ def add_url():
     name = request.form.get('name') 
     
     if url and name:
-        registry = load_registry()
-        if 'urls' not in registry: registry['urls'] = []
-
-        if not any(u['url'] == url for u in registry['urls']):
-            registry['urls'].append({
-                "name": name,
-                "url": url,
-                "status": "En espera"
-            })
-            save_registry(registry)
+        with registry_lock:
+            registry = load_registry()
+            if 'urls' not in registry: registry['urls'] = []
+
+            nueva = not any(u['url'] == url for u in registry['urls'])
+            if nueva:
+                registry['urls'].append({
+                    "name": name,
+                    "url": url,
+                    "status": "En espera"
+                })
+                save_registry(registry)
+        if nueva:
             flash('URL agregada.', 'success')
         else:
             flash('Esa URL ya está registrada.', 'warning')
@@ -280,10 +362,12 @@ def add_url():
 @login_required
 def delete_url():
     url_to_delete = request.form.get('url')
-    registry = load_registry()
-    
-    registry['urls'] = [u for u in registry.get('urls', []) if u['url'] != url_to_delete]
-    save_registry(registry)
+    with registry_lock:
+        registry = load_registry()
+        
+        registry['urls'] = [u for u in registry.get('urls', []) if u['url'] != url_to_delete]
+        save_registry(registry)
+    _eliminar_de_indice('url', url_to_delete)
     flash('Enlace eliminado.', 'success')
     return redirect(url_for('admin.dashboard'))
 
@@ -294,19 +378,22 @@ def edit_url():
     new_name = request.form.get('name')
     new_url = request.form.get('url')
     
-    registry = load_registry()
-    found = False
-    
-    for item in registry.get('urls', []):
-        if item['url'] == original_url:
-            item['name'] = new_name
-            item['url'] = new_url
-            item['status'] = 'En espera'
-            found = True
-            break
-            
+    with registry_lock:
+        registry = load_registry()
+        found = False
+        
+        for item in registry.get('urls', []):
+            if item['url'] == original_url:
+                item['name'] = new_name
+                item['url'] = new_url
+                item['status'] = 'En espera'
+                found = True
+                break
+                
+        if found:
+            save_registry(registry)
+
     if found:
-        save_registry(registry)
         flash('Enlace actualizado.', 'success')
     else:
         flash('Error al editar.', 'error')
@@ -319,21 +406,59 @@ def edit_url():
 @admin_bp.route('/train', methods=['POST'])
 @login_required
 def train_model():
+    """Encola el entrenamiento y regresa de inmediato; el avance se consulta en /train/status."""
     try:
         registry = load_registry()
         
-        # Llamamos a tu función de entrenamiento existente
-        actualizar_base_datos_completa(registry)
-        
-        # Si todo sale bien, actualizamos estados a 'Activo'
-        if 'pdfs' in registry:
-            for item in registry['pdfs']: item['status'] = 'Activo'
-        for item in registry['urls']: item['status'] = 'Activo'
-            
-        save_registry(registry)
-        flash('Modelo actualizado con éxito.', 'success')
+        # La función de entrenamiento corre en segundo plano y va marcando cada fuente;
+        # antes de escribir una fuente revisa que no la hayan eliminado mientras tanto
+        entrenar = functools.partial(actualizar_base_datos_completa, leer_registro=registro_vigente)
+        id_trabajo = iniciar_entrenamiento(registry, entrenar,
+                                           al_actualizar_fuente=actualizar_estado_fuente)
+        flash(f'Entrenamiento iniciado en segundo plano (trabajo {str(id_trabajo)[:8]}).', 'success')
     except Exception as e:
         print(f"Error detallado entrenamiento: {e}")
-        flash(f'Error durante el entrenamiento: {str(e)}', 'error')
+        flash(f'Error al iniciar el entrenamiento: {str(e)}', 'error')
         
-    return redirect(url_for('admin.dashboard'))
\ No newline at end of file
+    return redirect(url_for('admin.dashboard'))
+
+@admin_bp.route('/train/status', methods=['GET'])
+@admin_bp.route('/train/status/<id_trabajo>', methods=['GET'])
+@login_required
+def train_status(id_trabajo=None):
+    """Progreso de un entrenamiento (o del más reciente) en JSON."""
+    trabajo = obtener_trabajo(id_trabajo) if id_trabajo else obtener_ultimo_trabajo()
+    if trabajo is None:
+        return jsonify({"error": "No se encontró el trabajo"}), 404
+    return jsonify(trabajo)
+
+# ==========================================
+# 8. PREGUNTAS FRECUENTES (FAQ)
+# ==========================================
+
+@admin_bp.route('/faq/export', methods=['GET'])
+@login_required
+def export_faq():
+    """Descarga la FAQ actual en el mismo formato que el antiguo faq.csv."""
+    if almacen_faq is None:
+        flash('El almacén de FAQ no está disponible.', 'error')
+        return redirect(url_for('admin.dashboard'))
+    return Response(
+        almacen_faq.exportar_csv(),
+        mimetype='text/csv',
+        headers={"Content-Disposition": "attachment; filename=faq.csv"}
+    )
+
+# ==========================================
+# 9. MÉTRICAS DEL CHAT
+# ==========================================
+
+@admin_bp.route('/api/metricas', methods=['GET'])
+@login_required
+def api_metricas():
+    """Latencia por etapa (p50/p95/p99), aciertos del caché y contadores, en JSON."""
+    if metricas is None:
+        return jsonify({"error": "Métricas no disponibles"}), 503
+    datos = metricas.a_dict()
+    datos["tasa_aciertos_cache"] = tasa_aciertos_cache()
+    return jsonify(datos)
@@ -1,9 +1,9 @@
-from flask import Blueprint, render_template, request, jsonify
+from flask import Blueprint, render_template, request, jsonify, Response, stream_with_context, session
 import sys
 import os
-import re
-import csv
-import pandas as pd
+import json
+import uuid
+import threading
 
 # Configuración de rutas
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -12,74 +12,85 @@ template_dir = os.path.join(project_root, 'templates')
 logic_dir = os.path.join(project_root, 'logic') 
 models_dir = os.path.join(project_root, 'models')
 data_dir_chroma = os.path.join(project_root, 'data', 'chroma_db_web')
-csv_path = os.path.join(project_root, 'data', 'faq.csv')
 
 # Imports de lógica
 if project_root not in sys.path: sys.path.append(project_root)
 
-# Importamos el módulo completo de KNN para poder recargarlo
-from models import modelo_knn 
 from models import modelo_llm
 modelo_llm.CHROMA_PATH = data_dir_chroma
 from logic.seleccion_modelo import SelectorDeModelo
+from data.almacen_faq import almacen_faq
 
 # --- NUEVO IMPORT PARA EL REGISTRO DE ACCESOS ---
 from logic.access_tracker import registrar_acceso
+from logic.conversaciones import crear_almacen_conversaciones
+from logic.metricas import medir, observar
+from logic.formato import formatear_texto_html, FormateadorIncremental
 
-# Inicialización
+# Inicialización (liviana: el caché y el LLM se cargan con calentar() o con la primera pregunta)
 selector = None
 try:
     selector = SelectorDeModelo(usar_knn=True, usar_llm=True)
 except Exception as e:
     print(f"Error al iniciar selector: {e}")
 
-chatbot_bp = Blueprint('chatbot', __name__, template_folder=template_dir)
+# Calentar al crear la app (en un hilo): el worker acepta peticiones de inmediato
+# y /ready responde 200 cuando el selector está listo
+CALENTAR_AL_INICIAR = os.getenv("CALENTAR_AL_INICIAR", "1") == "1"
+_calentamiento = {"hilo": None, "pid": None}
+_lock_calentamiento = threading.Lock()
 
-# Variables globales
-historial_conversacion = [] 
-ultima_pregunta = ""
+def calentar():
+    """Hook de arranque: prepara el selector en este proceso (bloquea hasta terminar)."""
+    if selector is not None:
+        selector.calentar()
 
-# --- FUNCIONES AUXILIARES ---
+def calentar_en_segundo_plano():
+    """
+    Lanza calentar() en un hilo, una vez por proceso. Se lleva la cuenta del
+    PID porque un servidor que precarga la app y luego hace fork (gunicorn
+    --preload) no hereda el hilo: cada worker lo vuelve a lanzar con su
+    primera petición (ver _calentar_en_worker).
+    """
+    with _lock_calentamiento:
+        hilo = _calentamiento["hilo"]
+        if selector is None or selector.listo or (
+                hilo is not None and hilo.is_alive() and _calentamiento["pid"] == os.getpid()):
+            return
+        hilo = threading.Thread(target=calentar, name="calentar-selector", daemon=True)
+        _calentamiento.update(hilo=hilo, pid=os.getpid())
+        hilo.start()
 
-def limpiar_texto_markdown(texto):
-    if not texto: return ""
-    texto = re.sub(r'\*\*(.*?)\*\*', r'\1', texto)
-    texto = re.sub(r'\*(.*?)\*', r'\1', texto)
-    texto = re.sub(r'^\s*[\+\-\*]\s+', '• ', texto, flags=re.MULTILINE)
-    texto = re.sub(r'```', '', texto)
-    return texto.strip()
+def _reiniciar_tras_fork():
+    """El worker no hereda el hilo de calentamiento del padre (ni su lock, si estaba tomado)."""
+    global _lock_calentamiento
+    _lock_calentamiento = threading.Lock()
+    _calentamiento.update(hilo=None, pid=None)
 
-def guardar_faq_csv(pregunta, respuesta):
-    """Guarda una NUEVA pregunta (Append)."""
-    try:
-        with open(csv_path, mode='a', newline='', encoding='utf-8') as file:
-            writer = csv.writer(file)
-            writer.writerow([pregunta, respuesta])
-        print(f"💾 Guardado nuevo en CSV.")
-    except Exception as e:
-        print(f"Error guardando CSV: {e}")
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reiniciar_tras_fork)
 
-def reemplazar_faq_csv(pregunta, nueva_respuesta):
-    """Actualiza una respuesta existente en el CSV."""
-    try:
-        df = pd.read_csv(csv_path)
-        mask = df['Pregunta'] == pregunta
-        
-        if mask.any():
-            # Actualizar última coincidencia
-            idx = df[mask].last_valid_index()
-            df.at[idx, 'Respuesta'] = nueva_respuesta
-            df.to_csv(csv_path, index=False)
-            print(f"🔄 CSV Actualizado: Respuesta reemplazada para '{pregunta[:15]}...'")
-            return True
-        else:
-            # Si no existe, guardar como nueva
-            guardar_faq_csv(pregunta, nueva_respuesta)
-            return True
-            
-    except Exception as e:
-        print(f"Error actualizando CSV: {e}")
-        return False
+chatbot_bp = Blueprint('chatbot', __name__, template_folder=template_dir)
+
+@chatbot_bp.before_app_request
+def _calentar_en_worker():
+    """
+    Los hilos no se lanzan en el hook de fork: un worker creado con fork
+    (gunicorn --preload) empieza su calentamiento con la primera petición.
+    """
+    if CALENTAR_AL_INICIAR and selector is not None and not selector.listo:
+        calentar_en_segundo_plano()
+
+# Historial y última pregunta por sesión (cada usuario tiene su propia conversación)
+conversaciones = crear_almacen_conversaciones()
+
+def obtener_id_sesion():
+    """Id de la conversación del usuario (se guarda en la cookie de sesión de Flask)."""
+    if 'chat_id' not in session:
+        session['chat_id'] = uuid.uuid4().hex
+    return session['chat_id']
+
+# --- FUNCIONES AUXILIARES ---
 
 def formatear_historial(lista_historial):
     texto_historial = ""
@@ -88,65 +99,118 @@ def formatear_historial(lista_historial):
         texto_historial += f"{role}: {msj['content']}\n"
     return texto_historial
 
-def formatear_texto_html(texto):
-    """
-    Convierte Markdown a HTML unificando todas las listas a viñetas (•)
-    y corrigiendo el problema del primer elemento con guion.
-    """
-    if not texto: return ""
-    
-    texto = texto.strip()
-
-    # 1. Negritas (**texto**)
-    texto = re.sub(r'\*\*(.*?)\*\*', r'<strong>\1</strong>', texto)
-    
-    # 2. Títulos (### texto)
-    texto = re.sub(r'###\s*(.*?)(?:\n|$)', r'<br><span class="chat-title">\1</span><br>', texto)
-    
-    # --- CORRECCIÓN CLAVE ---
-    # 3. Detectar si hay un guion/viñeta pegado a unos dos puntos (ej: "necesario: - Generar")
-    # Forzamos un salto de línea antes del guion para que la regla de abajo lo detecte.
-    texto = re.sub(r':\s*([\-\*•])', r':\n\1', texto)
-
-    # 4. UNIFICACIÓN DE LISTAS
-    # Detecta guiones (-), asteriscos (*) O viñetas existentes (•) al inicio de una línea
-    # y los transforma TODOS al formato HTML correcto (<br>• ).
-    texto = re.sub(r'(?m)^\s*[\-\*•]\s+(.*)', r'<br>• \1', texto)
-
-    # 5. Listas Numeradas (1. Item)
-    texto = re.sub(r'(?m)^\s*(\d+)\.\s+(.*)', r'<br>\1. \2', texto)
-    
-    # 6. Separación de párrafos (Puntos y aparte)
-    # Agrega espacio extra si hay punto, pero NO si es parte de una lista.
-    texto = re.sub(r'(?<!\d)(?<!•)\.\s+(?=[A-Z¿¡])', '.<br><br>', texto)
-
-    # Limpieza final
-    return texto.strip()
+def _evento_sse(datos, evento=None):
+    prefijo = f"event: {evento}\n" if evento else ""
+    return f"{prefijo}data: {json.dumps(datos, ensure_ascii=False)}\n\n"
 
 # --- RUTAS ---
 
+@chatbot_bp.route('/ready')
+def ready():
+    """Sonda de disponibilidad: 200 cuando el selector terminó de cargar, 503 mientras tanto."""
+    if selector is None:
+        return jsonify({"status": "error"}), 503
+    if not selector.listo:
+        calentar_en_segundo_plano()
+        return jsonify({"status": "iniciando"}), 503
+    return jsonify({"status": "listo", "cache": selector.usar_knn, "llm": selector.usar_llm})
+
 @chatbot_bp.route('/chat')
 def chat():
-    global historial_conversacion
-    historial_conversacion = [] 
+    conversaciones.reiniciar(obtener_id_sesion())
     return render_template('chatbot.html')
 
-@chatbot_bp.route('/api/chat', methods=['POST'])
-def api_chat():
-    global selector, historial_conversacion, ultima_pregunta
+def _registrar_respuesta(id_sesion, estado, modo, pregunta_usuario, respuesta_raw, respuesta_html, fuente):
+    """
+    Guarda la respuesta en el historial de la sesión y actualiza el caché semántico.
+    La FAQ guarda el texto del LLM y su HTML; el caché sirve el HTML tal cual.
+    """
+    historial = estado["historial"]
 
-    data = request.json
-    modo = data.get('mode', 'normal') 
+    # 3. Guardar en Historial Sesión
+    if modo == 'normal':
+        historial.append({"role": "user", "content": pregunta_usuario})
     
-    # 1. Gestión de la pregunta
+    historial.append({"role": "assistant", "content": respuesta_html})
+    conversaciones.guardar(id_sesion, estado)
+
+    # 4. LÓGICA DE ACTUALIZACIÓN DEL SISTEMA (Caché Semántico)
+    if respuesta_html and "Error" not in fuente:
+        
+        if modo == 'regenerate':
+            # A) Reemplazar en la FAQ (upsert por pregunta normalizada, en segundo plano)
+            almacen_faq.upsert(pregunta_usuario, respuesta_raw, respuesta_html)
+            
+            # B) Actualizar Caché Semántico (solo la fila afectada, sin re-entrenar)
+            print("🧠 Actualizando Caché Semántico...")
+            selector.aprender(pregunta_usuario, respuesta_html, reemplazar=True)
+                
+        else:
+            # Si fue respuesta de LLM en modo normal, la guardamos también
+            if "LLM" in fuente:
+                almacen_faq.upsert(pregunta_usuario, respuesta_raw, respuesta_html)
+                # Aprendizaje instantáneo: se agrega al índice en memoria
+                selector.aprender(pregunta_usuario, respuesta_html)
+
+def _responder_stream(id_sesion, estado, modo, pregunta_usuario, contexto_str, forzar_llm):
+    """
+    Respuesta como Server-Sent Events: 'meta' (modelo), eventos con el HTML
+    incremental ('delta') y 'done' con la respuesta final formateada.
+    El HTML de 'done' es la suma de los 'delta': el texto se formatea una sola vez.
+    """
+    fragmentos, fuente = selector.responder_stream(pregunta_usuario, contexto_str, forzar_llm=forzar_llm)
+
+    def generar():
+        yield _evento_sse({"model": fuente}, evento="meta")
+        if "KNN" in fuente:
+            # Acierto del caché: ya es HTML, llega completo en un solo fragmento
+            respuesta_html = "".join(fragmentos)
+            yield _evento_sse({"delta": respuesta_html})
+            _registrar_respuesta(id_sesion, estado, modo, pregunta_usuario, respuesta_html, respuesta_html, fuente)
+            yield _evento_sse({"reply": respuesta_html, "model": fuente}, evento="done")
+            return
+
+        formateador = FormateadorIncremental()
+        try:
+            for fragmento in fragmentos:
+                html = formateador.agregar(fragmento)
+                if html:
+                    yield _evento_sse({"delta": html})
+            html = formateador.terminar()
+            if html:
+                yield _evento_sse({"delta": html})
+        except Exception as e:
+            print(f"Error RAG (stream): {e}")
+            yield _evento_sse({"error": "Error al generar respuesta con IA."}, evento="error")
+            return
+
+        observar('goit_etapa_segundos', formateador.segundos, etapa='html')
+        respuesta_html = formateador.html
+        _registrar_respuesta(id_sesion, estado, modo, pregunta_usuario,
+                             formateador.texto_completo, respuesta_html, fuente)
+        yield _evento_sse({"reply": respuesta_html, "model": fuente}, evento="done")
+
+    return Response(stream_with_context(generar()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+def _preparar_pregunta(data, estado):
+    """
+    Gestión de la pregunta (compartida con el modo async de asgi.py).
+    Retorna (modo, pregunta_usuario, forzar_llm, error); si hay error, la petición es inválida.
+    Modifica `estado`, la copia de trabajo de conversaciones.obtener(): solo
+    se guarda si la respuesta se completa (_registrar_respuesta).
+    """
+    modo = data.get('mode', 'normal')
+    historial = estado["historial"]
+
     if modo == 'regenerate':
-        if not ultima_pregunta:
-            return jsonify({"error": "No hay pregunta anterior"}), 400
-        pregunta_usuario = ultima_pregunta
+        if not estado["ultima_pregunta"]:
+            return modo, None, False, "No hay pregunta anterior"
+        pregunta_usuario = estado["ultima_pregunta"]
         
         # Eliminar respuesta anterior del historial
-        if historial_conversacion and historial_conversacion[-1]['role'] == 'assistant':
-            historial_conversacion.pop()
+        if historial and historial[-1]['role'] == 'assistant':
+            historial.pop()
             
         # Forzar LLM
         forzar_llm = True
@@ -154,47 +218,47 @@ def api_chat():
             
     else:
         pregunta_usuario = data.get('message')
-        ultima_pregunta = pregunta_usuario
+        estado["ultima_pregunta"] = pregunta_usuario
         forzar_llm = False
 
     if not pregunta_usuario:
-        return jsonify({"error": "Mensaje vacío"}), 400
+        return modo, None, False, "Mensaje vacío"
+    return modo, pregunta_usuario, forzar_llm, None
+
+def _respuesta_html(respuesta_raw, fuente):
+    """HTML para el chat. El caché guarda la respuesta ya formateada: no se vuelve a convertir."""
+    if "KNN" in fuente:
+        return respuesta_raw
+    with medir('html'):
+        return formatear_texto_html(respuesta_raw)
+
+@chatbot_bp.route('/api/chat', methods=['POST'])
+def api_chat():
+    data = request.json
+
+    id_sesion = obtener_id_sesion()
+    estado = conversaciones.obtener(id_sesion)
+    
+    # 1. Gestión de la pregunta
+    modo, pregunta_usuario, forzar_llm, error = _preparar_pregunta(data, estado)
+    if error:
+        return jsonify({"error": error}), 400
 
     # 2. Generar respuesta
-    contexto_str = formatear_historial(historial_conversacion)
+    contexto_str = formatear_historial(estado["historial"])
+
+    # Modo streaming: los tokens se envían conforme el LLM los genera
+    if data.get('stream'):
+        return _responder_stream(id_sesion, estado, modo, pregunta_usuario, contexto_str, forzar_llm)
     
     # AQUÍ PASAMOS EL FLAG forzar_llm
     respuesta_raw, fuente = selector.responder(pregunta_usuario, contexto_str, forzar_llm=forzar_llm)
-    
-    respuesta_limpia = formatear_texto_html(respuesta_raw)
+    respuesta_html = _respuesta_html(respuesta_raw, fuente)
 
-    # 3. Guardar en Historial Sesión
-    if modo == 'normal':
-        historial_conversacion.append({"role": "user", "content": pregunta_usuario})
-    
-    historial_conversacion.append({"role": "assistant", "content": respuesta_limpia})
-
-    # 4. LÓGICA DE ACTUALIZACIÓN DEL SISTEMA (Caché Semántico)
-    if respuesta_limpia and "Error" not in fuente:
-        
-        if modo == 'regenerate':
-            # A) Reemplazar en CSV
-            exito_csv = reemplazar_faq_csv(pregunta_usuario, respuesta_limpia)
-            
-            # B) RE-ENTRENAR KNN (Actualizar Caché Semántico)
-            if exito_csv:
-                print("🧠 Actualizando Caché Semántico (KNN)...")
-                modelo_knn.inicializar_knn() # Recarga el modelo en memoria
-                
-        else:
-            # Si fue respuesta de LLM en modo normal, la guardamos también
-            if "LLM" in fuente:
-                guardar_faq_csv(pregunta_usuario, respuesta_limpia)
-                # Opcional: Recargar KNN aquí también si quieres aprendizaje instantáneo en modo normal
-                modelo_knn.inicializar_knn()
+    _registrar_respuesta(id_sesion, estado, modo, pregunta_usuario, respuesta_raw, respuesta_html, fuente)
 
     return jsonify({
-        "reply": respuesta_limpia,
+        "reply": respuesta_html,
         "model": fuente
     })
 
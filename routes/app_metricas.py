@@ -0,0 +1,25 @@
+import os
+import hmac
+from flask import Blueprint, Response, request
+
+from logic.metricas import metricas
+
+# Crear un Blueprint
+metricas_bp = Blueprint('metricas', __name__)
+
+# Con token, /metrics exige "Authorization: Bearer <token>"; sin token solo
+# responde a peticiones locales directas (no a las que llegan por un proxy)
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+DIRECCIONES_LOCALES = ('127.0.0.1', '::1')
+
+def _autorizado():
+    if METRICS_TOKEN:
+        return hmac.compare_digest(request.headers.get('Authorization', ''), f"Bearer {METRICS_TOKEN}")
+    return request.remote_addr in DIRECCIONES_LOCALES and 'X-Forwarded-For' not in request.headers
+
+@metricas_bp.route('/metrics')
+def metrics():
+    """Contadores e histogramas en formato Prometheus."""
+    if not _autorizado():
+        return Response("No autorizado\n", status=401, mimetype='text/plain')
+    return Response(metricas.a_prometheus(), mimetype='text/plain; version=0.0.4; charset=utf-8')
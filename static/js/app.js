@@ -177,19 +177,21 @@ document.addEventListener('DOMContentLoaded', () => {
             const response = await fetch('/api/chat', {
                 method: 'POST',
                 headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({ message: message, mode: mode })
+                body: JSON.stringify({ message: message, mode: mode, stream: true })
             });
+
+            const contentType = response.headers.get('Content-Type') || '';
+            if (contentType.includes('text/event-stream')) {
+                await readStream(response);
+                return;
+            }
             
             const data = await response.json();
             
             if(loadingFace) loadingFace.style.display = 'none';
 
             if (data.error) {
-                const divError = document.createElement('div');
-                divError.classList.add('message', 'bot');
-                divError.style.color = 'red';
-                divError.textContent = "Error: " + data.error;
-                messagesContainer.appendChild(divError);
+                showError(data.error);
             } else {
                 addMessage(data.reply, 'bot');
                 if(btnRegenerate) btnRegenerate.style.display = 'inline-block';
@@ -202,6 +204,70 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     }
 
+    function showError(text) {
+        const divError = document.createElement('div');
+        divError.classList.add('message', 'bot');
+        divError.style.color = 'red';
+        divError.textContent = "Error: " + text;
+        messagesContainer.appendChild(divError);
+    }
+
+    // Lee la respuesta en streaming (Server-Sent Events) y la pinta conforme llega
+    async function readStream(response) {
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        let botDiv = null;
+
+        function handleEvent(rawEvent) {
+            let eventName = 'message';
+            let dataText = '';
+            rawEvent.split('\n').forEach(line => {
+                if (line.startsWith('event:')) eventName = line.slice(6).trim();
+                else if (line.startsWith('data:')) dataText += line.slice(5).trim();
+            });
+            if (!dataText) return;
+            const payload = JSON.parse(dataText);
+
+            if (eventName === 'error') {
+                if(loadingFace) loadingFace.style.display = 'none';
+                if (botDiv) botDiv.remove();
+                showError(payload.error);
+                return;
+            }
+            if (eventName === 'meta') return;
+
+            // Primer contenido: ocultar la carita de carga y crear la burbuja
+            if (!botDiv) {
+                if(loadingFace) loadingFace.style.display = 'none';
+                addMessage('', 'bot');
+                botDiv = messagesContainer.lastElementChild;
+            }
+
+            if (eventName === 'done') {
+                // La versión final formateada reemplaza a la incremental
+                botDiv.innerHTML = payload.reply;
+                if(btnRegenerate) btnRegenerate.style.display = 'inline-block';
+            } else if (payload.delta) {
+                botDiv.innerHTML += payload.delta;
+            }
+            messagesContainer.scrollTop = messagesContainer.scrollHeight;
+        }
+
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+            let separator;
+            while ((separator = buffer.indexOf('\n\n')) !== -1) {
+                handleEvent(buffer.slice(0, separator));
+                buffer = buffer.slice(separator + 2);
+            }
+        }
+        if (buffer.trim()) handleEvent(buffer);
+        if(loadingFace) loadingFace.style.display = 'none';
+    }
+
     // --- 7. EVENTOS DEL CHAT ---
 
     chatForm.addEventListener('submit', (e) => {
@@ -0,0 +1,16 @@
+"""Fixtures compartidas: todo se escribe en directorios temporales, data/ no se toca."""
+import os
+import sys
+
+import pytest
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from models.modelo_embeddings import EmbeddingsFalsos
+
+@pytest.fixture
+def embeddings():
+    """Embeddings deterministas y locales (sin Ollama)."""
+    return EmbeddingsFalsos(dimension=64, por_palabras=True)
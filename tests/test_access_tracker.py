@@ -0,0 +1,120 @@
+"""Registro de accesos (logic/access_tracker.py): rotación, resumen y paginación por cursor."""
+import pytest
+
+from logic.access_tracker import RegistradorAccesos, CABECERAS
+from logic.segmentos_accesos import dia_semana
+
+def _filas(fecha, cantidad, inicio=0):
+    return [[dia_semana(fecha), fecha, f"10:{i // 60:02d}:{i % 60:02d}", f"Programa {i % 3}", "PC", f"10.0.0.{i}"]
+            for i in range(inicio, inicio + cantidad)]
+
+@pytest.fixture
+def registrador(tmp_path):
+    return RegistradorAccesos(
+        ruta_csv=str(tmp_path / "access_log.csv"),
+        ruta_resumen=str(tmp_path / "access_stats.json"),
+        directorio_segmentos=str(tmp_path / "access_logs"),
+    )
+
+def _todas_las_paginas(registrador, limite, **filtros):
+    registros, cursor, paginas = [], None, 0
+    while True:
+        pagina, cursor = registrador.leer_registros(limite=limite, cursor=cursor, **filtros)
+        registros += pagina
+        paginas += 1
+        if cursor is None:
+            return registros, paginas
+        assert paginas < 100
+
+def test_rotacion_diaria_y_resumen(registrador):
+    escritas = _filas("2026-03-01", 30) + _filas("2026-03-02", 25) + _filas("2026-03-03", 10)
+    registrador._escribir(escritas[:30])
+    registrador._escribir(escritas[30:])   # Un lote que cruza la medianoche
+
+    resumen = registrador.resumen()
+    assert resumen["total"] == 65
+    assert len(resumen["segmentos"]) == 2   # Dos días archivados; el tercero sigue activo
+
+def test_paginacion_a_traves_de_segmentos(registrador):
+    escritas = _filas("2026-03-01", 30) + _filas("2026-03-02", 25) + _filas("2026-03-03", 10)
+    registrador._escribir(escritas)
+
+    registros, paginas = _todas_las_paginas(registrador, limite=7)
+    esperados = [dict(zip(CABECERAS, fila)) for fila in reversed(escritas)]
+    assert registros == esperados
+    assert paginas == 10
+
+def test_paginacion_con_filtros(registrador):
+    registrador._escribir(_filas("2026-03-01", 30) + _filas("2026-03-02", 25) + _filas("2026-03-03", 10))
+
+    registros, _ = _todas_las_paginas(registrador, limite=4, desde="2026-03-02", hasta="2026-03-02",
+                                      programa="Programa 1")
+    assert len(registros) == len([i for i in range(25) if i % 3 == 1])
+    assert {(r["Fecha"], r["Programa"]) for r in registros} == {("2026-03-02", "Programa 1")}
+
+def test_cursor_sigue_valido_tras_rotar(registrador):
+    escritas = _filas("2026-03-01", 20) + _filas("2026-03-02", 20)
+    registrador._escribir(escritas)
+    primera, cursor = registrador.leer_registros(limite=15)
+
+    # Llega otro día: el CSV activo se archiva mientras el usuario pagina
+    registrador._escribir(_filas("2026-03-03", 5))
+    resto = []
+    while cursor is not None:
+        pagina, cursor = registrador.leer_registros(limite=15, cursor=cursor)
+        resto += pagina
+
+    assert primera + resto == [dict(zip(CABECERAS, fila)) for fila in reversed(escritas)]
+
+def test_buffer_escribe_en_orden_y_descarta_si_se_llena(tmp_path):
+    import time
+
+    registrador = RegistradorAccesos(
+        ruta_csv=str(tmp_path / "access_log.csv"),
+        ruta_resumen=str(tmp_path / "access_stats.json"),
+        directorio_segmentos=str(tmp_path / "access_logs"),
+        tamano_lote=1, intervalo=0.01, max_cola=2,
+    )
+    filas = _filas("2026-03-01", 5)
+    # Disco "lento": el escritor toma la primera fila y espera el lock del archivo
+    with registrador._lock_archivo:
+        assert registrador.registrar(filas[0])
+        limite = time.monotonic() + 10
+        while registrador._cola.qsize() and time.monotonic() < limite:
+            time.sleep(0.01)
+        aceptadas = [registrador.registrar(fila) for fila in filas[1:]]
+    assert aceptadas == [True, True, False, False]
+
+    registrador.vaciar()
+    assert registrador.estado() == {"pendientes": 0, "escritos": 3, "descartados": 2}
+    with open(tmp_path / "access_log.csv", encoding='utf-8') as f:
+        lineas = f.read().splitlines()
+    assert lineas[0] == ",".join(CABECERAS)
+    assert lineas[1:] == [",".join(fila) for fila in filas[:3]]
+
+def test_resumen_se_pone_al_dia_con_el_csv(registrador, tmp_path):
+    import json
+
+    for fila in _filas("2026-03-01", 4):
+        registrador.registrar(fila)
+    registrador.vaciar()
+    resumen = registrador.resumen()
+    assert resumen["total"] == 4
+    assert resumen["offset"] == (tmp_path / "access_log.csv").stat().st_size
+
+    # Filas que llegaron al CSV sin pasar por el resumen (apagado abrupto): se cuentan solo esas
+    with open(tmp_path / "access_log.csv", "a", encoding='utf-8', newline='') as f:
+        f.write("Sunday,2026-03-01,23:00:00,Programa X,PC,10.0.0.9\n")
+    otro_worker = RegistradorAccesos(
+        ruta_csv=registrador.ruta_csv, ruta_resumen=registrador.ruta_resumen,
+        directorio_segmentos=registrador.directorio_segmentos,
+    )
+    resumen = otro_worker.resumen()
+    assert resumen["total"] == 5
+    assert resumen["por_programa"]["Programa X"] == 1
+    assert resumen["por_hora"]["23"] == 1
+
+    # Un resumen que no corresponde al CSV (reemplazado por uno más corto) se recalcula
+    with open(registrador.ruta_resumen, "w", encoding='utf-8') as f:
+        json.dump({**resumen, "total": 999, "offset": resumen["offset"] + 100}, f)
+    assert registrador.resumen()["total"] == 5
@@ -0,0 +1,158 @@
+"""Ingesta incremental (data/admin_db.py): fuentes sin cambios se omiten, las modificadas se reemplazan."""
+import random
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import pytest
+
+from data import admin_db
+from data.cache_pdfs import CachePDFs
+from logic.tareas_entrenamiento import ProgresoEntrenamiento
+
+PALABRAS = ("estudiante programa inscripción periodo escolar crédito facultad reglamento trámite "
+            "solicitud constancia beca servicio social titulación examen calificación").split()
+
+def _texto(semilla, parrafos=8):
+    rng = random.Random(semilla)
+    return "\n".join(
+        " ".join(" ".join(rng.choice(PALABRAS) for _ in range(12)).capitalize() + "." for _ in range(5))
+        for _ in range(parrafos)
+    )
+
+@pytest.fixture
+def sitio(monkeypatch):
+    """Servidor HTTP local; `paginas` (ruta -> texto) se puede cambiar entre ingestas."""
+    monkeypatch.setenv("NO_PROXY", "127.0.0.1")
+    monkeypatch.setenv("USER_AGENT", "pruebas")
+    paginas = {}
+
+    class Manejador(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path not in paginas:
+                self.send_error(404)
+                return
+            cuerpo = f"<html><body><p>{paginas[self.path]}</p></body></html>".encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('Content-Length', str(len(cuerpo)))
+            self.end_headers()
+            self.wfile.write(cuerpo)
+
+        def log_message(self, *args):
+            pass
+
+    servidor = ThreadingHTTPServer(('127.0.0.1', 0), Manejador)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    yield paginas, f"http://127.0.0.1:{servidor.server_port}"
+    servidor.shutdown()
+    servidor.server_close()
+
+@pytest.fixture
+def base_vectorial(tmp_path, monkeypatch):
+    monkeypatch.setattr(admin_db, 'CHROMA_PATH', str(tmp_path / 'chroma'))
+    monkeypatch.setattr(admin_db, 'cache_pdfs', CachePDFs(str(tmp_path / 'pdf_cache.json')))
+
+def _ingerir(urls, embeddings):
+    progreso = ProgresoEntrenamiento()
+    registry = {'urls': [{'url': url} for url in urls], 'pdfs': []}
+    admin_db.actualizar_base_datos_completa(registry, progreso, embedding_function=embeddings)
+    return progreso
+
+def _ids_por_fuente(embeddings):
+    datos = admin_db._conectar_db(embeddings).get(include=['metadatas'])
+    fuentes = {}
+    for id_frag, metadata in zip(datos['ids'], datos['metadatas']):
+        fuentes.setdefault(metadata['source_id'], set()).add(id_frag)
+    return fuentes
+
+def test_ingesta_incremental(sitio, base_vectorial, embeddings):
+    paginas, raiz = sitio
+    paginas.update({'/a': _texto(1), '/b': _texto(2)})
+    urls = [f"{raiz}/a", f"{raiz}/b"]
+    id_a, id_b = (admin_db.id_fuente('url', url) for url in urls)
+
+    progreso = _ingerir(urls, embeddings)
+    inicial = _ids_por_fuente(embeddings)
+    assert set(inicial) == {id_a, id_b}
+    assert progreso.contadores['fragmentos_escritos'] == len(inicial[id_a]) + len(inicial[id_b])
+    assert progreso.fuentes[id_a] == 'Activo'
+
+    # Sin cambios: no se re-embebe nada
+    progreso = _ingerir(urls, embeddings)
+    assert progreso.contadores['fuentes_sin_cambios'] == 2
+    assert progreso.contadores['fragmentos_escritos'] == 0
+    assert _ids_por_fuente(embeddings) == inicial
+
+    # Una fuente cambia: solo ella se reemplaza, sin dejar fragmentos viejos
+    paginas['/b'] = _texto(3, parrafos=4)
+    progreso = _ingerir(urls, embeddings)
+    assert progreso.contadores['fuentes_sin_cambios'] == 1
+    actual = _ids_por_fuente(embeddings)
+    assert actual[id_a] == inicial[id_a]
+    assert actual[id_b].isdisjoint(inicial[id_b])
+    assert progreso.contadores['fragmentos_escritos'] == len(actual[id_b])
+
+    # Una fuente sale del registro: se borran sus fragmentos
+    _ingerir(urls[:1], embeddings)
+    assert set(_ids_por_fuente(embeddings)) == {id_a}
+
+def test_fuente_con_error_conserva_sus_fragmentos(sitio, base_vectorial, embeddings):
+    paginas, raiz = sitio
+    paginas['/a'] = _texto(4)
+    url = f"{raiz}/a"
+    _ingerir([url], embeddings)
+    antes = _ids_por_fuente(embeddings)
+
+    del paginas['/a']   # 404
+    progreso = _ingerir([url], embeddings)
+    assert progreso.fuentes[admin_db.id_fuente('url', url)] == 'Error'
+    assert _ids_por_fuente(embeddings) == antes
+
+def test_fuente_eliminada_durante_el_entrenamiento(sitio, base_vectorial, embeddings, monkeypatch):
+    paginas, raiz = sitio
+    paginas.update({'/a': _texto(5), '/b': _texto(6), '/c': _texto(7)})
+    url_a, url_b, url_c = (f"{raiz}/{p}" for p in 'abc')
+    _ingerir([url_a, url_b], embeddings)
+    paginas['/b'] = _texto(8)
+
+    # El entrenamiento arranca con a, b y c; mientras corre se eliminan b (antes de
+    # llegar a ella) y c (mientras se escriben sus fragmentos)
+    vigentes = {url_a, url_c}
+    escribir = admin_db._escribir_fragmentos
+
+    def escribir_y_eliminar(vector_db, embedding_function, chunks, progreso, source_id, *args):
+        resultado = escribir(vector_db, embedding_function, chunks, progreso, source_id, *args)
+        if source_id == admin_db.id_fuente('url', url_c):
+            vigentes.discard(url_c)
+        return resultado
+
+    monkeypatch.setattr(admin_db, '_escribir_fragmentos', escribir_y_eliminar)
+    registry = {'urls': [{'url': url} for url in (url_a, url_b, url_c)], 'pdfs': []}
+    progreso = ProgresoEntrenamiento()
+    admin_db.actualizar_base_datos_completa(
+        registry, progreso, embedding_function=embeddings,
+        leer_registro=lambda: {'urls': [{'url': url} for url in sorted(vigentes)], 'pdfs': []})
+
+    assert set(_ids_por_fuente(embeddings)) == {admin_db.id_fuente('url', url_a)}
+    assert progreso.fuentes[admin_db.id_fuente('url', url_b)] == 'Eliminada'
+    assert progreso.fuentes[admin_db.id_fuente('url', url_c)] == 'Eliminada'
+
+def test_pool_de_pdfs_mata_un_proceso_colgado(monkeypatch):
+    import time
+    from concurrent.futures.process import BrokenProcessPool
+
+    monkeypatch.setattr(admin_db, 'PROCESOS_PDF', 1)
+    procesos = admin_db._PoolPDFs()
+    colgado = procesos.submit(time.sleep, 60)
+    # Un PDF colgado lleva TIMEOUT_PDF segundos corriendo: su proceso ya reportó su PID
+    limite = time.monotonic() + 60
+    while procesos._cola_pids.empty() and time.monotonic() < limite:
+        time.sleep(0.05)
+    assert colgado.running()
+
+    inicio = time.monotonic()
+    procesos.terminar()
+    with pytest.raises(BrokenProcessPool):
+        colgado.result(timeout=30)
+    assert time.monotonic() - inicio < 30
+    assert procesos._pids_lectores
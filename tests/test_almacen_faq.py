@@ -0,0 +1,56 @@
+"""Almacén de la FAQ (data/almacen_faq.py): upsert por pregunta normalizada y secuencia de cambios."""
+import sqlite3
+
+from data.almacen_faq import AlmacenFAQ
+
+def _almacen(tmp_path, csv_inicial=None):
+    return AlmacenFAQ(ruta_db=str(tmp_path / "faq.sqlite3"), ruta_csv_inicial=csv_inicial)
+
+def test_upsert_fusiona_por_pregunta_normalizada(tmp_path):
+    almacen = _almacen(tmp_path)
+    almacen.upsert("¿Cuándo son las inscripciones?", "En agosto")
+    almacen.upsert("cuando son las INSCRIPCIONES", "En enero", "<p>En enero</p>")
+    almacen.upsert("¿Hay becas?", "Sí")
+    almacen.vaciar_cola()
+
+    assert almacen.todas() == [("cuando son las INSCRIPCIONES", "<p>En enero</p>"), ("¿Hay becas?", "Sí")]
+    assert almacen.estado()[0] == 2
+
+def test_secuencia_marca_los_cambios(tmp_path):
+    almacen = _almacen(tmp_path)
+    otro_worker = _almacen(tmp_path)
+    almacen.upsert("¿Hay becas?", "Sí")
+    almacen.vaciar_cola()
+    filas, marca = almacen.estado()
+    assert almacen.modificadas_desde(marca) == []
+
+    otro_worker.upsert("¿Dónde está la biblioteca?", "En el campus")
+    otro_worker.vaciar_cola()
+    almacen.upsert("¿Hay becas?", "Cada semestre")
+    almacen.vaciar_cola()
+
+    assert almacen.modificadas_desde(marca) == [
+        ("¿Dónde está la biblioteca?", "En el campus"), ("¿Hay becas?", "Cada semestre")]
+    assert almacen.estado() == (2, marca + 2)
+
+def test_importa_csv_inicial_y_exporta(tmp_path):
+    ruta_csv = tmp_path / "faq.csv"
+    ruta_csv.write_text("Pregunta,Respuesta\n¿Hay becas?,Sí\n¿hay becas,No\n", encoding='utf-8')
+    almacen = _almacen(tmp_path, str(ruta_csv))
+    assert almacen.todas() == [("¿hay becas", "No")]
+    assert almacen.exportar_csv().splitlines() == ["Pregunta,Respuesta", "¿hay becas,No"]
+
+def test_migra_base_sin_secuencia(tmp_path):
+    ruta = str(tmp_path / "faq.sqlite3")
+    conexion = sqlite3.connect(ruta)
+    conexion.execute("CREATE TABLE faq (clave TEXT PRIMARY KEY, pregunta TEXT NOT NULL, "
+                     "respuesta TEXT NOT NULL, actualizado REAL NOT NULL)")
+    conexion.executemany("INSERT INTO faq VALUES (?, ?, ?, ?)",
+                         [("becas", "¿Hay becas?", "Sí", 2.0), ("biblioteca", "¿Biblioteca?", "Campus", 1.0)])
+    conexion.commit()
+    conexion.close()
+
+    almacen = AlmacenFAQ(ruta_db=ruta, ruta_csv_inicial=None)
+    # Las filas viejas se numeran en el orden en que se actualizaron
+    assert almacen.estado() == (2, 2)
+    assert almacen.modificadas_desde(1) == [("¿Hay becas?", "Sí")]
@@ -0,0 +1,32 @@
+"""Acceso a /metrics (routes/app_metricas.py): sin token solo local directo; con token, Bearer."""
+import pytest
+from flask import Flask
+
+from routes import app_metricas
+
+@pytest.fixture
+def cliente():
+    app = Flask(__name__)
+    app.register_blueprint(app_metricas.metricas_bp)
+    return app.test_client()
+
+def test_sin_token_solo_peticiones_locales(cliente, monkeypatch):
+    monkeypatch.setattr(app_metricas, 'METRICS_TOKEN', None)
+    assert cliente.get('/metrics', environ_base={'REMOTE_ADDR': '127.0.0.1'}).status_code == 200
+    assert cliente.get('/metrics', environ_base={'REMOTE_ADDR': '::1'}).status_code == 200
+    assert cliente.get('/metrics', environ_base={'REMOTE_ADDR': '10.0.0.7'}).status_code == 401
+    # Un proxy local reenvía peticiones externas
+    respuesta = cliente.get('/metrics', environ_base={'REMOTE_ADDR': '127.0.0.1'},
+                            headers={'X-Forwarded-For': '203.0.113.5'})
+    assert respuesta.status_code == 401
+
+def test_con_token_exige_bearer(cliente, monkeypatch):
+    monkeypatch.setattr(app_metricas, 'METRICS_TOKEN', 'secreto')
+    local = {'REMOTE_ADDR': '127.0.0.1'}
+    assert cliente.get('/metrics', environ_base=local).status_code == 401
+    assert cliente.get('/metrics', environ_base=local,
+                       headers={'Authorization': 'Bearer otro'}).status_code == 401
+    respuesta = cliente.get('/metrics', environ_base={'REMOTE_ADDR': '10.0.0.7'},
+                            headers={'Authorization': 'Bearer secreto'})
+    assert respuesta.status_code == 200
+    assert respuesta.mimetype == 'text/plain'
@@ -0,0 +1,104 @@
+"""Modo async (asgi.py): /api/chat en streaming y corte del LLM cuando el cliente se desconecta."""
+import asyncio
+import json
+
+import pytest
+
+import asgi
+from routes import app_chatbot
+
+class SelectorFalso:
+    """Responde con `fragmentos`; si `colgar`, el LLM se queda esperando tras el primero."""
+
+    def __init__(self, fragmentos, colgar=False):
+        self.fragmentos = fragmentos
+        self.colgar = colgar
+        self.stream_cerrado = asyncio.Event()
+        self.aprendidas = []
+
+    async def aresponder_stream(self, pregunta, historial="", forzar_llm=False):
+        async def generar():
+            try:
+                for fragmento in self.fragmentos:
+                    yield fragmento
+                if self.colgar:
+                    await asyncio.Event().wait()
+            finally:
+                self.stream_cerrado.set()
+        return generar(), "LLM (Groq)"
+
+    def aprender(self, pregunta, respuesta, reemplazar=False):
+        self.aprendidas.append((pregunta, respuesta))
+
+@pytest.fixture
+def chat(monkeypatch):
+    """Ejecuta POST /api/chat; `desconectar` es un evento que simula el cierre del cliente."""
+    monkeypatch.setattr(app_chatbot, 'almacen_faq', type('FAQ', (), {'upsert': lambda *a: None})())
+
+    def ejecutar(selector, datos, desconectar=None):
+        monkeypatch.setattr(app_chatbot, 'selector', selector)
+        enviados = []
+
+        async def correr():
+            pendientes = [{'type': 'http.request', 'body': json.dumps(datos).encode('utf-8')}]
+
+            async def receive():
+                if pendientes:
+                    return pendientes.pop(0)
+                await (desconectar or asyncio.Event()).wait()
+                return {'type': 'http.disconnect'}
+
+            async def send(mensaje):
+                enviados.append(mensaje)
+                if desconectar is not None and b'"delta"' in mensaje.get('body', b''):
+                    desconectar.set()
+
+            scope = {'type': 'http', 'method': 'POST', 'path': '/api/chat', 'headers': []}
+            await asyncio.wait_for(asgi.app(scope, receive, send), timeout=10)
+
+        return enviados, correr
+
+    return ejecutar
+
+def _eventos(enviados):
+    cuerpo = b''.join(m.get('body', b'') for m in enviados if m['type'] == 'http.response.body')
+    return [bloque for bloque in cuerpo.decode('utf-8').split('\n\n') if bloque]
+
+def test_stream_completo(chat):
+    async def probar():
+        selector = SelectorFalso(["Las inscripciones ", "son en **agosto**."])
+        enviados, correr = chat(selector, {'message': '¿Cuándo me inscribo?', 'stream': True})
+        await correr()
+        return selector, enviados
+
+    selector, enviados = asyncio.run(probar())
+    assert enviados[0]['status'] == 200
+    assert (b'content-type', b'text/event-stream; charset=utf-8') in enviados[0]['headers']
+    assert any(nombre == b'set-cookie' for nombre, _ in enviados[0]['headers'])
+    eventos = _eventos(enviados)
+    assert eventos[0] == 'event: meta\ndata: {"model": "LLM (Groq)"}'
+    assert eventos[-1].startswith('event: done\n')
+    final = json.loads(eventos[-1].split('data: ', 1)[1])
+    assert '<strong>agosto</strong>' in final['reply']
+    assert selector.aprendidas == [('¿Cuándo me inscribo?', final['reply'])]
+    assert enviados[-1] == {'type': 'http.response.body', 'body': b''}
+
+def test_desconexion_cierra_el_stream_del_llm(chat):
+    async def probar():
+        selector = SelectorFalso(["Primera parte.\n\n"], colgar=True)
+        enviados, correr = chat(selector, {'message': '¿Hay becas?', 'stream': True},
+                                desconectar=asyncio.Event())
+        await correr()
+        return selector, enviados
+
+    selector, enviados = asyncio.run(probar())
+    # El LLM deja de generar y no se registra una respuesta a medias
+    assert selector.stream_cerrado.is_set()
+    assert selector.aprendidas == []
+    assert not any(e.startswith('event: done') for e in _eventos(enviados))
+
+def test_json_invalido(chat):
+    enviados, correr = chat(SelectorFalso([]), ['no', 'es', 'un', 'objeto'])
+    asyncio.run(correr())
+    assert enviados[0]['status'] == 400
+    assert json.loads(enviados[1]['body']) == {"error": "JSON inválido"}
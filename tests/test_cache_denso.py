@@ -0,0 +1,22 @@
+"""Caché semántico denso (models/cache_denso.py) con EmbeddingsFalsos."""
+from models.cache_denso import IndiceDensoIncremental
+
+def test_agregar_reemplazar_y_buscar(embeddings):
+    indice = IndiceDensoIncremental(embeddings, capacidad_inicial=2)
+    indice.cargar(["¿Cuándo son las inscripciones?", "¿Hay becas?"], ["agosto", "sí"])
+    indice.add("¿Dónde está la biblioteca?", "en el campus")   # Duplica la capacidad
+    indice.replace("¿hay BECAS?", "cada semestre")
+    assert len(indice) == 3
+
+    respuestas, distancias = indice.buscar(["¿Hay becas?", "¿Dónde está la biblioteca?"], k=1)
+    assert list(respuestas[:, 0]) == ["cada semestre", "en el campus"]
+    assert distancias.max() < 1e-5
+
+def test_instantanea_anterior_no_cambia(embeddings):
+    indice = IndiceDensoIncremental(embeddings, capacidad_inicial=2)
+    indice.cargar(["¿Hay becas?", "¿Cuándo son las inscripciones?"], ["sí", "agosto"])
+    anterior = indice._instantanea
+    indice.add("¿Hay becas?", "no")
+    indice.add("¿Dónde está la biblioteca?", "en el campus")
+    assert anterior.n == 2
+    assert anterior.respuestas[:anterior.n] == ["sí", "agosto"]
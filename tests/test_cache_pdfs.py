@@ -0,0 +1,54 @@
+"""Caché de texto de PDFs (data/cache_pdfs.py): sin cambios no se re-parsea; renombrado se encuentra por hash."""
+import os
+
+from langchain_core.documents import Document
+
+from data.cache_pdfs import CachePDFs
+
+def _pdf(ruta, contenido):
+    with open(ruta, 'wb') as f:
+        f.write(contenido)
+    return str(ruta)
+
+def _paginas(*textos):
+    return [Document(page_content=t, metadata={'page': i, 'objeto': object()}) for i, t in enumerate(textos)]
+
+def test_obtener_guardar_y_persistir(tmp_path):
+    ruta_cache = str(tmp_path / 'pdf_cache.json')
+    pdf = _pdf(tmp_path / 'estatuto.pdf', b'%PDF-1.4 estatuto')
+    cache = CachePDFs(ruta_cache)
+    assert cache.obtener(pdf) is None
+
+    cache.guardar(pdf, _paginas("Capítulo I", "Capítulo II"))
+    cache.persistir()
+
+    # Otro proceso (caché nuevo) lo encuentra en disco; los metadatos no escalares se descartan
+    documentos = CachePDFs(ruta_cache).obtener(pdf)
+    assert [d.page_content for d in documentos] == ["Capítulo I", "Capítulo II"]
+    assert documentos[0].metadata == {'page': 0, 'source': pdf}
+
+def test_renombrado_y_modificado(tmp_path):
+    cache = CachePDFs(str(tmp_path / 'pdf_cache.json'))
+    pdf = _pdf(tmp_path / 'a.pdf', b'%PDF-1.4 contenido')
+    cache.guardar(pdf, _paginas("Texto"))
+
+    renombrado = str(tmp_path / 'b.pdf')
+    os.rename(pdf, renombrado)
+    assert [d.page_content for d in cache.obtener(renombrado)] == ["Texto"]
+
+    _pdf(renombrado, b'%PDF-1.4 contenido nuevo')
+    assert cache.obtener(renombrado) is None
+
+def test_persistir_descarta_archivos_borrados(tmp_path):
+    ruta_cache = str(tmp_path / 'pdf_cache.json')
+    cache = CachePDFs(ruta_cache)
+    conservado = _pdf(tmp_path / 'a.pdf', b'%PDF-1.4 a')
+    borrado = _pdf(tmp_path / 'b.pdf', b'%PDF-1.4 b')
+    cache.guardar(conservado, _paginas("A"))
+    cache.guardar(borrado, _paginas("B"))
+    os.remove(borrado)
+    cache.persistir()
+
+    datos = CachePDFs(ruta_cache)._cargar()
+    assert list(datos['indice']) == [conservado]
+    assert len(datos['archivos']) == 1
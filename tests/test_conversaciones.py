@@ -0,0 +1,45 @@
+"""Conversaciones por sesión (logic/conversaciones.py), con ambos backends."""
+import pytest
+
+from logic.conversaciones import AlmacenConversaciones, BackendMemoria, BackendSQLite
+
+@pytest.fixture(params=['memoria', 'sqlite'])
+def conversaciones(request, tmp_path):
+    if request.param == 'sqlite':
+        return AlmacenConversaciones(BackendSQLite(str(tmp_path / "conversaciones.sqlite3")), max_mensajes=4)
+    return AlmacenConversaciones(BackendMemoria(), max_mensajes=4)
+
+def _conversar(conversaciones, id_sesion, pregunta):
+    estado = conversaciones.obtener(id_sesion)
+    estado["ultima_pregunta"] = pregunta
+    estado["historial"] += [{"role": "user", "content": pregunta},
+                            {"role": "assistant", "content": f"respuesta a {pregunta}"}]
+    conversaciones.guardar(id_sesion, estado)
+
+def test_sesiones_aisladas(conversaciones):
+    _conversar(conversaciones, "ana", "¿Hay becas?")
+    _conversar(conversaciones, "luis", "¿Cuándo son las inscripciones?")
+
+    ana, luis = conversaciones.obtener("ana"), conversaciones.obtener("luis")
+    assert ana["ultima_pregunta"] == "¿Hay becas?"
+    assert luis["ultima_pregunta"] == "¿Cuándo son las inscripciones?"
+    assert [m["content"] for m in ana["historial"]] == ["¿Hay becas?", "respuesta a ¿Hay becas?"]
+    assert conversaciones.obtener("nueva") == {"historial": [], "ultima_pregunta": ""}
+
+def test_cambios_sin_guardar_no_cuentan(conversaciones):
+    _conversar(conversaciones, "ana", "¿Hay becas?")
+    estado = conversaciones.obtener("ana")
+    estado["historial"].pop()          # p. ej. un "regenerar" cuya respuesta falla
+    estado["ultima_pregunta"] = None
+    assert len(conversaciones.obtener("ana")["historial"]) == 2
+    assert conversaciones.obtener("ana")["ultima_pregunta"] == "¿Hay becas?"
+
+def test_historial_recortado_y_reinicio(conversaciones):
+    for i in range(5):
+        _conversar(conversaciones, "ana", f"pregunta {i}")
+    historial = conversaciones.obtener("ana")["historial"]
+    assert [m["content"] for m in historial][0] == "pregunta 3"
+    assert len(historial) == 4
+
+    conversaciones.reiniciar("ana")
+    assert conversaciones.obtener("ana")["historial"] == []
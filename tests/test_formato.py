@@ -0,0 +1,52 @@
+"""Formateador incremental (logic/formato.py): el streaming entrega lo mismo que la conversión de una vez."""
+import random
+
+import pytest
+
+from logic.formato import FormateadorIncremental, formatear_texto_html
+
+RESPUESTAS = [
+    "Hola. Las inscripciones abren en **agosto** y cierran en septiembre.\nRequisitos necesarios: - Acta de nacimiento\n- CURP\n- Certificado de bachillerato",
+    "### Becas disponibles\n1. Beca de excelencia: promedio mínimo de 9.\n2. Beca deportiva.\n\n\nPara más información visita la oficina.",
+    "El costo es de $1,500 <b>por semestre</b>.\n* Incluye credencial\n* Incluye seguro\nTermina aquí. Otra oración sigue en el mismo renglón. Y otra más.",
+    "   Espacios al inicio   \n\n• Viñeta con punto medio\n**Negrita sin cerrar y texto largo que continúa por varias palabras más",
+    "",
+]
+
+def _trozos(texto, semilla):
+    """Parte el texto como lo haría el LLM: tokens de 1 a 8 caracteres."""
+    azar = random.Random(semilla)
+    trozos, i = [], 0
+    while i < len(texto):
+        n = azar.randint(1, 8)
+        trozos.append(texto[i:i + n])
+        i += n
+    return trozos
+
+@pytest.mark.parametrize("texto", RESPUESTAS)
+@pytest.mark.parametrize("semilla", range(20))
+def test_stream_igual_a_una_sola_vez(texto, semilla):
+    formateador = FormateadorIncremental()
+    salida = ''.join(formateador.agregar(t) for t in _trozos(texto, semilla)) + formateador.terminar()
+    assert salida == formatear_texto_html(texto)
+    assert formateador.html == salida
+    assert formateador.texto_completo == texto
+
+def test_texto_aleatorio(semilla=7):
+    azar = random.Random(semilla)
+    piezas = ["Hola", " ", "\n", ".", ":", "**", "###", "- ", "* ", "• ", "1. ", "Beca", "agosto", "<i>", "¿Qué", "¡Sí!"]
+    for _ in range(300):
+        texto = ''.join(azar.choice(piezas) for _ in range(azar.randint(0, 40)))
+        formateador = FormateadorIncremental()
+        salida = ''.join(formateador.agregar(t) for t in _trozos(texto, azar.random())) + formateador.terminar()
+        assert salida == formatear_texto_html(texto), repr(texto)
+
+def test_parrafo_sin_salto_se_entrega_antes_de_terminar():
+    texto = "Las inscripciones para el próximo semestre abren en agosto y cierran a mediados de septiembre"
+    formateador = FormateadorIncremental()
+    adelantado = ''.join(formateador.agregar(t) for t in _trozos(texto, 0))
+    assert adelantado
+    assert adelantado + formateador.terminar() == formatear_texto_html(texto)
+
+def test_escapa_html():
+    assert "<b>" not in formatear_texto_html("Texto <b>peligroso</b>")
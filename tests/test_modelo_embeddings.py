@@ -0,0 +1,39 @@
+"""Caché de embeddings (models/modelo_embeddings.py): un texto ya visto no vuelve al modelo."""
+import pytest
+
+from models.modelo_embeddings import EmbeddingsEnCache, EmbeddingsFalsos
+
+class EmbeddingsContados(EmbeddingsFalsos):
+    def __init__(self):
+        super().__init__(dimension=16)
+        self.calculados = []
+
+    def embed_documents(self, texts):
+        self.calculados.extend(texts)
+        return super().embed_documents(texts)
+
+def test_memoria_disco_y_modelo(tmp_path):
+    ruta = str(tmp_path / 'embeddings.sqlite3')
+    base = EmbeddingsContados()
+    cache = EmbeddingsEnCache(base, 'falso', ruta_db=ruta)
+
+    vectores = cache.embed_documents(["beca", "servicio social", "beca"])
+    assert base.calculados == ["beca", "servicio social"]   # El duplicado se calcula una vez
+    assert vectores[0] == vectores[2]
+    assert cache.embed_documents(["servicio social"]) == [vectores[1]]
+    assert len(base.calculados) == 2
+
+    # Otro proceso (caché nuevo, misma base SQLite) los encuentra en disco
+    otro_base = EmbeddingsContados()
+    otro = EmbeddingsEnCache(otro_base, 'falso', ruta_db=ruta)
+    recuperados = otro.embed_documents(["beca", "titulación"])
+    assert otro_base.calculados == ["titulación"]
+    assert recuperados[0] == pytest.approx(vectores[0], abs=1e-6)   # Se guardan en float32
+
+def test_consulta_y_modelo_no_comparten_claves(tmp_path):
+    ruta = str(tmp_path / 'embeddings.sqlite3')
+    base = EmbeddingsContados()
+    EmbeddingsEnCache(base, 'modelo-a', ruta_db=ruta).embed_documents(["beca"])
+    EmbeddingsEnCache(base, 'modelo-b', ruta_db=ruta).embed_documents(["beca"])
+    EmbeddingsEnCache(base, 'modelo-a', ruta_db=ruta).embed_query("beca")
+    assert base.calculados == ["beca", "beca", "beca"]
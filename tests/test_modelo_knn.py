@@ -0,0 +1,128 @@
+"""Índice KNN incremental (models/modelo_knn.py): agregar, reemplazar e instantánea en disco."""
+import pytest
+
+from models.modelo_knn import IndiceKNNIncremental
+
+PREGUNTAS = [
+    "¿Cuándo son las inscripciones?",
+    "¿Cómo tramito mi servicio social?",
+    "¿Dónde consulto mi kárdex?",
+]
+RESPUESTAS = ["Inscripciones en agosto", "Servicio social en la coordinación", "Kárdex en el portal"]
+
+def _respuesta(indice, pregunta):
+    respuestas, distancias = indice.buscar([pregunta], k=1)
+    return respuestas[0, 0], float(distancias[0, 0])
+
+def _indice():
+    indice = IndiceKNNIncremental()
+    indice.cargar(PREGUNTAS, RESPUESTAS)
+    return indice
+
+def test_cargar_y_buscar():
+    indice = _indice()
+    assert len(indice) == 3
+    respuesta, distancia = _respuesta(indice, "cuando son las inscripciones")
+    assert respuesta == "Inscripciones en agosto"
+    assert distancia < 1e-6
+
+def test_agregar_y_reemplazar():
+    indice = _indice()
+    indice.add("¿Cuánto cuesta la titulación?", "Titulación: consulta aranceles")
+    assert len(indice) == 4
+    assert _respuesta(indice, "cuanto cuesta la titulacion")[0] == "Titulación: consulta aranceles"
+
+    # La misma pregunta normalizada no agrega filas: actualiza la respuesta
+    indice.add("cuándo son las INSCRIPCIONES", "Inscripciones en enero")
+    indice.replace("¿Dónde consulto mi kárdex?", "Kárdex en la secretaría")
+    assert len(indice) == 4
+    assert _respuesta(indice, "cuando son las inscripciones")[0] == "Inscripciones en enero"
+    assert _respuesta(indice, "donde consulto mi kardex")[0] == "Kárdex en la secretaría"
+
+    # Compactar no cambia las respuestas
+    indice.compactar()
+    assert len(indice) == 4
+    assert _respuesta(indice, "donde consulto mi kardex")[0] == "Kárdex en la secretaría"
+    assert _respuesta(indice, "cuanto cuesta la titulacion")[0] == "Titulación: consulta aranceles"
+
+def test_instantanea_anterior_no_cambia():
+    indice = _indice()
+    anterior = indice._instantanea
+    indice.add("¿Hay becas?", "Sí, cada semestre")
+    indice.replace(PREGUNTAS[0], "Inscripciones en enero")
+    assert len(anterior) == 3
+    assert anterior.respuesta(0) == "Inscripciones en agosto"
+
+def test_instantanea_en_disco(tmp_path):
+    ruta = str(tmp_path / "knn.npz")
+    indice = _indice()
+    indice.add("¿Hay becas?", "Sí, cada semestre")
+    indice.replace(PREGUNTAS[1], "Servicio social en línea")
+    indice.guardar(ruta, {"secuencia_faq": 7})
+
+    cargado = IndiceKNNIncremental()
+    metadatos = cargado.cargar_guardado(ruta)
+    assert metadatos["secuencia_faq"] == 7
+    assert len(cargado) == len(indice) == 4
+    for pregunta in PREGUNTAS + ["¿Hay becas?"]:
+        assert _respuesta(cargado, pregunta) == _respuesta(indice, pregunta)
+
+    # Después de cargar, las preguntas guardadas se siguen reconociendo al reemplazar
+    cargado.replace("¿Hay becas?", "Solo en primavera")
+    assert len(cargado) == 4
+    assert _respuesta(cargado, "hay becas")[0] == "Solo en primavera"
+
+def test_instantanea_incompatible(tmp_path):
+    ruta = str(tmp_path / "knn.npz")
+    _indice().guardar(ruta, {})
+    assert IndiceKNNIncremental(n_features=2 ** 10).cargar_guardado(ruta) is None
+    assert IndiceKNNIncremental().cargar_guardado(str(tmp_path / "no_existe.npz")) is None
+
+def test_sincroniza_lo_que_escriben_otros_workers(tmp_path, monkeypatch):
+    from data.almacen_faq import AlmacenFAQ
+    from models import modelo_knn
+
+    ruta_db = str(tmp_path / "faq.sqlite3")
+    propio = AlmacenFAQ(ruta_db=ruta_db, ruta_csv_inicial=None)
+    otro_worker = AlmacenFAQ(ruta_db=ruta_db, ruta_csv_inicial=None)
+    propio.upsert(PREGUNTAS[0], RESPUESTAS[0])
+    propio.vaciar_cola()
+
+    monkeypatch.setattr(modelo_knn, "almacen_faq", propio)
+    monkeypatch.setattr(modelo_knn, "indice_knn", IndiceKNNIncremental())
+    monkeypatch.setattr(modelo_knn, "_estado_faq", None)
+    modelo_knn.inicializar_knn(str(tmp_path / "knn.npz"))
+    assert len(modelo_knn.indice_knn) == 1
+
+    otro_worker.upsert(PREGUNTAS[1], RESPUESTAS[1])
+    otro_worker.upsert(PREGUNTAS[0], "Inscripciones en enero")
+    otro_worker.vaciar_cola()
+    assert modelo_knn.sincronizar_con_faq() == 2
+    assert modelo_knn.sincronizar_con_faq() == 0
+
+    indice = modelo_knn.indice_knn
+    assert len(indice) == 2
+    assert _respuesta(indice, "cuando son las inscripciones")[0] == "Inscripciones en enero"
+    assert _respuesta(indice, "como tramito mi servicio social")[0] == RESPUESTAS[1]
+    assert modelo_knn._estado_faq == otro_worker.estado()
+
+def test_consultar_lote_igual_a_consultas_individuales():
+    indice = _indice()
+    indice.add("¿Cuánto cuesta la titulación?", "Titulación: consulta aranceles")   # Fila pendiente
+    consultas = ["cuando son las inscripciones", "costo de la titulacion", "kardex", "biblioteca"]
+
+    respuestas, distancias = indice.consultar_lote(consultas, k=2)
+    assert respuestas.shape == distancias.shape == (4, 2)
+    assert (distancias[:, 0] <= distancias[:, 1]).all()
+    for fila, consulta in enumerate(consultas):
+        respuesta, distancia = indice.consultar(consulta)
+        assert respuestas[fila, 0] == respuesta
+        assert distancias[fila, 0] == pytest.approx(distancia)
+
+def test_consultar_lote_limites():
+    indice = _indice()
+    respuestas, distancias = indice.consultar_lote(["inscripciones"], k=10)
+    assert respuestas.shape == (1, 3)
+    assert sorted(respuestas[0]) == sorted(RESPUESTAS)
+    assert indice.consultar_lote([], k=3)[0].shape == (0, 0)
+    assert IndiceKNNIncremental().consultar("inscripciones") == (None, 1.0)
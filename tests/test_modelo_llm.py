@@ -0,0 +1,43 @@
+"""Caché de recuperación del RAG (models/modelo_llm.py): se invalida cuando el entrenamiento cambia la base."""
+import os
+
+import pytest
+from langchain_core.runnables import RunnableLambda
+
+from data import admin_db
+from models import modelo_llm
+from logic.cache_lru import CacheLRU
+
+@pytest.fixture
+def recuperador(tmp_path, monkeypatch):
+    ruta = str(tmp_path / 'chroma')
+    monkeypatch.setattr(modelo_llm, 'CHROMA_PATH', ruta)
+    monkeypatch.setattr(admin_db, 'CHROMA_PATH', ruta)
+    monkeypatch.setattr(modelo_llm, 'cache_recuperacion', CacheLRU(max_elementos=8, ttl=60))
+    llamadas = []
+
+    def buscar(pregunta):
+        llamadas.append(pregunta)
+        return [f"documentos {len(llamadas)}"]
+
+    return modelo_llm.crear_recuperador_en_cache(RunnableLambda(buscar)), llamadas
+
+def test_preguntas_equivalentes_comparten_resultado(recuperador):
+    recuperar, llamadas = recuperador
+    assert recuperar.invoke("¿Cuándo son las inscripciones?") == ["documentos 1"]
+    assert recuperar.invoke("cuando son las INSCRIPCIONES") == ["documentos 1"]
+    assert len(llamadas) == 1
+
+def test_entrenar_invalida_aunque_no_cambie_la_fecha(recuperador):
+    recuperar, llamadas = recuperador
+    admin_db.marcar_version_vector_store()
+    recuperar.invoke("¿Hay becas?")
+    ruta = os.path.join(modelo_llm.CHROMA_PATH, '.version')
+    fecha = os.stat(ruta).st_mtime_ns
+
+    # Un sistema de archivos con fecha gruesa: la segunda escritura conserva la misma fecha
+    admin_db.marcar_version_vector_store()
+    os.utime(ruta, ns=(fecha, fecha))
+    assert recuperar.invoke("¿Hay becas?") == ["documentos 2"]
+    assert recuperar.invoke("¿Hay becas?") == ["documentos 2"]
+    assert len(llamadas) == 2
@@ -0,0 +1,41 @@
+"""Normalización de preguntas (logic/normalizacion.py): una pasada con str.translate y acentos plegados."""
+import random
+import re
+import unicodedata
+
+import pytest
+
+from logic.normalizacion import normalizar_texto, plegar_acentos, obtener_stopwords, _LIMITE_TABLA
+
+def _referencia(texto):
+    """La limpieza anterior (regex) más el plegado de acentos, con stopwords plegadas."""
+    texto = re.sub(r'[^\w\s]', '', texto.lower())
+    texto = ''.join(c if c in 'ñ' else ''.join(x for x in unicodedata.normalize('NFD', c)
+                                                   if not unicodedata.combining(x))
+                    for c in texto)
+    return ' '.join(p for p in texto.split() if p not in obtener_stopwords())
+
+@pytest.mark.parametrize("texto, esperado", [
+    ("¿Cuándo son las INSCRIPCIONES?", "inscripciones"),
+    ("¿Qué es el kárdex?", "kardex"),
+    ("Año   de   ingreso\t\n(2026)", "año ingreso 2026"),
+    ("Pingüino: ¡sí!", "pinguino"),
+    ("ＡＢＣ ﬁnanzas 🎓 ™", "abc finanzas"),
+    ("", ""),
+])
+def test_casos(texto, esperado):
+    assert normalizar_texto(texto) == esperado
+
+def test_no_texto():
+    assert normalizar_texto(None) == ""
+    assert normalizar_texto(3.5) == ""
+
+def test_igual_a_la_limpieza_anterior_dentro_de_la_tabla():
+    azar = random.Random(18)
+    alfabeto = [chr(c) for c in range(_LIMITE_TABLA)] + list("áéíóúñ ") * 40
+    for _ in range(500):
+        texto = ''.join(azar.choice(alfabeto) for _ in range(azar.randint(0, 30)))
+        assert normalizar_texto(texto) == _referencia(texto), repr(texto)
+
+def test_fuera_de_la_tabla_se_pliega_o_se_quita():
+    assert plegar_acentos("Ｍｉｘ🙂　x") == "mix x"
@@ -0,0 +1,91 @@
+"""Cola de entrenamientos (logic/tareas_entrenamiento.py): estado en disco y un entrenamiento a la vez entre procesos."""
+import json
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+from logic import tareas_entrenamiento as tareas
+
+@pytest.fixture
+def rutas(tmp_path, monkeypatch):
+    monkeypatch.setattr(tareas, 'RUTA_TRABAJOS', str(tmp_path / 'entrenamientos.json'))
+    monkeypatch.setattr(tareas, 'RUTA_BLOQUEO_ENTRENAMIENTO', str(tmp_path / 'entrenamiento.lock'))
+    return tmp_path
+
+def _esperar(id_trabajo, estado, limite=10):
+    fin = time.monotonic() + limite
+    while time.monotonic() < fin:
+        trabajo = tareas.obtener_trabajo(id_trabajo)
+        if trabajo and trabajo['estado'] == estado:
+            return trabajo
+        time.sleep(0.05)
+    raise AssertionError(f"{id_trabajo} no llegó a '{estado}': {tareas.obtener_trabajo(id_trabajo)}")
+
+def _leer_en_otro_proceso(rutas, id_trabajo):
+    """Lo que respondería /train/status/<id> desde otro worker."""
+    codigo = (
+        "import json, sys\n"
+        "from logic import tareas_entrenamiento as t\n"
+        f"t.RUTA_TRABAJOS = {str(rutas / 'entrenamientos.json')!r}\n"
+        f"print(json.dumps(t.obtener_trabajo({id_trabajo!r})))\n"
+    )
+    salida = subprocess.run([sys.executable, '-c', codigo], capture_output=True, text=True,
+                            cwd=tareas.project_root, check=True).stdout
+    return json.loads(salida.strip().splitlines()[-1])
+
+def test_estado_visible_desde_otro_proceso(rutas):
+    soltar = threading.Event()
+
+    def entrenar(registry, progreso):
+        progreso.marcar_fuente('url', 'https://ejemplo', 'Procesando')
+        progreso.sumar('fragmentos_escritos', 3)
+        soltar.wait(10)
+        progreso.resumen = {"fragmentos_escritos": 3}
+
+    id_trabajo = tareas.iniciar_entrenamiento({}, entrenar)
+    _esperar(id_trabajo, 'En proceso')
+    assert _leer_en_otro_proceso(rutas, id_trabajo)['estado'] == 'En proceso'
+
+    soltar.set()
+    trabajo = _esperar(id_trabajo, 'Completado')
+    assert trabajo['contadores']['fragmentos_escritos'] == 3
+    assert trabajo['fuentes'] == {'url:https://ejemplo': 'Procesando'}
+    otro = _leer_en_otro_proceso(rutas, id_trabajo)
+    assert otro['estado'] == 'Completado' and otro['resumen'] == {"fragmentos_escritos": 3}
+    assert tareas.obtener_ultimo_trabajo()['id'] == id_trabajo
+
+def test_espera_al_entrenamiento_de_otro_proceso(rutas):
+    # Otro worker tiene el lock de entrenamiento hasta que se le cierre la entrada
+    codigo = (
+        "import sys\n"
+        "from logic.bloqueo_archivo import BloqueoArchivo\n"
+        f"with BloqueoArchivo({str(rutas / 'entrenamiento.lock')!r}):\n"
+        "    print('listo', flush=True)\n"
+        "    sys.stdin.read()\n"
+    )
+    otro = subprocess.Popen([sys.executable, '-c', codigo], stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                            text=True, cwd=tareas.project_root)
+    try:
+        assert otro.stdout.readline().strip() == 'listo'
+        id_trabajo = tareas.iniciar_entrenamiento({}, lambda registry, progreso: None)
+        time.sleep(0.5)
+        assert tareas.obtener_trabajo(id_trabajo)['estado'] == 'En cola'
+    finally:
+        otro.stdin.close()
+        otro.wait(10)
+    _esperar(id_trabajo, 'Completado')
+
+def test_trabajo_de_un_proceso_muerto(rutas):
+    proceso = subprocess.run([sys.executable, '-c', 'import os; print(os.getpid())'],
+                             capture_output=True, text=True, check=True)
+    huerfano = tareas.ProgresoEntrenamiento()
+    huerfano.pid = int(proceso.stdout)
+    huerfano.estado = 'En proceso'
+    tareas._guardar_trabajo(huerfano.a_dict())
+
+    trabajo = tareas.obtener_trabajo(huerfano.id)
+    assert trabajo['estado'] == 'Error'
+    assert tareas.obtener_trabajo('no-existe') is None